@@ -1,23 +1,85 @@
-from flask import Flask
-from flask_cors import CORS
+import os
+
+# (module, blueprint attribute, url prefix). Flask and the route modules are
+# imported inside create_app, so importing app.services.* stays cheap.
+BLUEPRINTS = [
+    ("app.routes.business", "business_bp", "/api/business"),
+    ("app.routes.news", "news_bp", "/api/news"),
+    ("app.routes.content", "content_bp", "/api/content"),
+    ("app.routes.planner", "planner_bp", "/api/weekly-planner"),
+    ("app.routes.facebook", "facebook_bp", "/api/facebook"),
+    ("app.routes.pipeline", "pipeline_bp", "/api/pipeline"),
+    ("app.routes.llm", "llm_bp", "/api/llm"),
+    ("app.routes.metrics", "metrics_bp", ""),
+]
+
+
+def install_timing(app):
+    """
+    Time every request: record it in the request histogram and send the
+    stages it went through in a Server-Timing header.
+    """
+    import time
+    from flask import request, g
+    from app.services.instrumentation import start_request, request_seconds, server_timing_header
+
+    @app.before_request
+    def start_timing():
+        g.started_at = time.perf_counter()
+        start_request()
+
+    @app.after_request
+    def finish_timing(response):
+        started_at = g.get("started_at")
+        if started_at is None:
+            return response
+        elapsed = time.perf_counter() - started_at
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        request_seconds.observe((request.method, route, str(response.status_code)), elapsed)
+        response.headers["Server-Timing"] = server_timing_header(elapsed)
+        # The frontend is served from another origin
+        response.headers["Timing-Allow-Origin"] = "*"
+        return response
+
 
 def create_app():
+    """
+    Application factory used by run.py, WSGI servers and scripts.
+    """
+    import logging
+    from importlib import import_module
+    from dotenv import load_dotenv
+    from flask import Flask
+    from flask_cors import CORS
+    from app.responses import install_responses
+
+    # Load .env before the services read their settings from the environment
+    load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), "../.env"))
+
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "INFO").upper(),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    # The Groq SDK's HTTP client logs every call at INFO
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
     app = Flask(__name__)
-    CORS(app)
-
-    # Register blueprints
-    from app.routes.business import business_bp
-    from app.routes.news import news_bp
-    from app.routes.content import content_bp
-    # from app.routes.planner import planner_bp
-    # from app.routes.post_manager import post_bp
-    # from app.routes.facebook import fb_bp
-
-    app.register_blueprint(business_bp, url_prefix="/api/business")
-    app.register_blueprint(news_bp, url_prefix="/api/news")
-    app.register_blueprint(content_bp, url_prefix="/api/content")
-    # app.register_blueprint(planner_bp, url_prefix="/api/plan")
-    # app.register_blueprint(post_bp, url_prefix="/api/posts")
-    # app.register_blueprint(fb_bp, url_prefix="/api/facebook")
+    # Enable CORS - adjust origins for production if needed; the frontend
+    # reads ETags for conditional requests
+    CORS(app, expose_headers=["ETag"])
+
+    install_timing(app)
+    # Registered after timing so compression is timed too (after_request
+    # hooks run in reverse order)
+    install_responses(app)
+
+    # Register Blueprints
+    for module, name, prefix in BLUEPRINTS:
+        app.register_blueprint(getattr(import_module(module), name), url_prefix=prefix)
+
+    # Publish scheduled posts automatically when they are due
+    if os.environ.get("AUTO_PUBLISH") == "1":
+        from app.services.dispatcher import get_dispatcher
+        get_dispatcher().start()
 
     return app
@@ -0,0 +1,168 @@
+import os
+import gzip
+import hashlib
+import decimal
+import threading
+import datetime
+
+import orjson
+from flask import current_app, request, jsonify
+from flask.json.provider import JSONProvider
+from werkzeug.http import http_date
+
+from app.services.instrumentation import stage
+
+try:
+    import zstandard
+except ImportError:  # gzip only
+    zstandard = None
+
+# Bodies smaller than this are sent uncompressed; the headers would eat the gain
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", 1024))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", 6))
+ZSTD_LEVEL = int(os.getenv("ZSTD_LEVEL", 3))
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+# zstd compressors must not be shared between threads
+_local = threading.local()
+
+
+def _default(obj):
+    # Same conversions as Flask's default provider for what orjson leaves over
+    if isinstance(obj, datetime.date):
+        return http_date(obj)
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if hasattr(obj, "__html__"):
+        return str(obj.__html__())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class OrjsonProvider(JSONProvider):
+    """
+    jsonify() and request.get_json() through orjson. Output matches Flask's
+    default provider (sorted keys, HTTP dates), only compact.
+    """
+
+    sort_keys = True
+
+    def _options(self):
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        return options | orjson.OPT_SORT_KEYS if self.sort_keys else options
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_default, option=self._options()).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=_default, option=self._options())
+        return self._app.response_class(body, mimetype="application/json")
+
+
+def make_etag(kind, version, *scope):
+    """
+    ETag value for `version` of a resource, or None when it has no version.
+    `scope` (tenant, cache key, ...) keeps tags of different resources apart.
+    """
+    if version is None:
+        return None
+    # Hashed, since tenants and cache keys may hold characters ETags can't
+    digest = hashlib.sha1("\0".join(str(part) for part in scope).encode("utf-8")).hexdigest()[:12]
+    return f"{kind}-{version}-{digest}" if scope else f"{kind}-{version}"
+
+
+def not_modified(etag, vary=()):
+    """
+    A 304 response if the request's If-None-Match already names `etag`,
+    else None. Call it before loading or serializing the resource.
+    """
+    if etag is None or not request.if_none_match.contains_weak(etag):
+        return None
+    response = current_app.response_class(status=304)
+    _tag(response, etag, vary)
+    return response
+
+
+def json_response(payload, status=200, etag=None, vary=()):
+    """
+    jsonify(payload) with an ETag. Clients must revalidate before reusing it.
+    """
+    response = jsonify(payload)
+    response.status_code = status
+    if etag is not None:
+        _tag(response, etag, vary)
+    return response
+
+
+def conditional_json(etag, build, vary=()):
+    """
+    304 if the client has `etag`, else a 200 with the payload from `build()`.
+    """
+    return not_modified(etag, vary) or json_response(build(), etag=etag, vary=vary)
+
+
+def _tag(response, etag, vary):
+    # Weak: the same tag covers the gzip, zstd and identity encodings
+    response.set_etag(etag, weak=True)
+    response.headers["Cache-Control"] = "no-cache"
+    # Also on 304s, which must carry the Vary of the full response
+    response.vary.add("Accept-Encoding")
+    for header in vary:
+        response.vary.add(header)
+
+
+def choose_encoding(accept_encodings):
+    """
+    Best content coding the client accepts: zstd, then gzip; None for identity.
+    """
+    best, best_quality = None, 0
+    for encoding in ("zstd", "gzip"):
+        if encoding == "zstd" and zstandard is None:
+            continue
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(data, encoding):
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    compressor = getattr(_local, "zstd", None)
+    if compressor is None:
+        compressor = _local.zstd = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+    return compressor.compress(data)
+
+
+def install_responses(app):
+    """
+    Serialize JSON with orjson and compress large bodies with zstd or gzip,
+    as negotiated through Accept-Encoding.
+    """
+    app.json = OrjsonProvider(app)
+
+    @app.after_request
+    def compress_response(response):
+        if (
+            response.status_code < 200
+            or response.status_code in (204, 304)
+            or response.direct_passthrough
+            or response.is_streamed
+            or "Content-Encoding" in response.headers
+            or not (response.mimetype or "").startswith(COMPRESSIBLE_TYPES)
+        ):
+            return response
+        response.vary.add("Accept-Encoding")
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_BYTES:
+            return response
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+        with stage("compress"):
+            response.set_data(compress(data, encoding))
+        response.headers["Content-Encoding"] = encoding
+        return response
@@ -1,12 +1,35 @@
-from flask import Blueprint, request, jsonify
-from app.services.scraper import fetch_html, extract_visible_content, fetch_html_title, analyze_website_business_profile
+import os
+import json
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from app.services.scraper import build_business_profile, profile_cache, latest_profile, latest_profile_version
+from app.services.jobs import profile_jobs, QueueFullError, SUCCEEDED, FINISHED_STATES
+from app.services.deadline import time_left
+from app.responses import make_etag, not_modified, json_response
+from app.routes.deadlines import with_deadline
 
 
 business_bp = Blueprint("business", __name__)
 
+# Default time budget of the synchronous route when the client sends no
+# X-Request-Timeout; the job's fetches and LLM calls are bounded by it too
+PROFILE_SYNC_TIMEOUT = float(os.getenv("PROFILE_SYNC_TIMEOUT", 120))
+# Seconds a client should wait before retrying when the job queue is full
+RETRY_AFTER_SECONDS = 5
+
+
+def queue_full_response(error):
+    response = jsonify({"error": str(error)})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(RETRY_AFTER_SECONDS)
+    return response
+
 
 @business_bp.route("/profile", methods=["POST"])
+@with_deadline(PROFILE_SYNC_TIMEOUT)
 def generate_business_profile():
+    """
+    Synchronous profile: submits a profile job and waits for it to finish.
+    """
     data = request.get_json()
     url = data.get("website_url")
 
@@ -14,11 +37,107 @@ def generate_business_profile():
         return jsonify({"error": "Missing 'url' parameter"}), 400
 
     try:
-        html = fetch_html(url)
-        text_content = extract_visible_content(html)
-        title = fetch_html_title(html)
-        profile = analyze_website_business_profile(text_content, title=title)
-        return jsonify({"profile": profile}), 200
-
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        job = profile_jobs.submit(build_business_profile, url)
+    except QueueFullError as e:
+        return queue_full_response(e)
+
+    job = profile_jobs.wait(job.id, timeout=time_left())
+    if not job.finished or (job.status != SUCCEEDED and job.timed_out):
+        return jsonify({"error": "Timed out building profile", "status": "timed_out", "job_id": job.id}), 504
+    if job.status != SUCCEEDED:
+        return jsonify({"error": job.error}), 500
+    etag = make_etag("profile", latest_profile_version(url), url)
+    return json_response({"profile": job.result}, etag=etag)
+
+
+@business_bp.route("/profile", methods=["GET"])
+def get_business_profile():
+    """
+    GET /api/business/profile?website_url=...
+    The last profile built for the site (404 if none is cached), with an
+    ETag from its cache entry for conditional polling.
+    """
+    url = request.args.get("website_url")
+    if not url:
+        return jsonify({"error": "Missing 'website_url' parameter"}), 400
+
+    etag = make_etag("profile", latest_profile_version(url), url)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    profile = latest_profile(url)
+    if profile is None:
+        return jsonify({"error": "No profile has been built for this website yet."}), 404
+    return json_response({"profile": profile}, etag=etag)
+
+
+@business_bp.route("/profile/jobs", methods=["POST"])
+def submit_profile_job():
+    """
+    POST /api/business/profile/jobs { "website_url": "..." }
+    Queues a profile job and returns its id immediately (202).
+    """
+    data = request.get_json() or {}
+    url = data.get("website_url")
+
+    if not url:
+        return jsonify({"error": "Missing 'url' parameter"}), 400
+
+    try:
+        job = profile_jobs.submit(build_business_profile, url)
+    except QueueFullError as e:
+        return queue_full_response(e)
+
+    return jsonify({
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"{request.base_url}/{job.id}",
+        "events_url": f"{request.base_url}/{job.id}/events",
+    }), 202
+
+
+@business_bp.route("/profile/jobs/<job_id>", methods=["GET"])
+def get_profile_job(job_id):
+    job = profile_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job '{job_id}'"}), 404
+    # Read before the snapshot, so a change in between only costs a refetch
+    etag = make_etag("job", job.version, job_id)
+    return not_modified(etag) or json_response(job.to_dict(), etag=etag)
+
+
+@business_bp.route("/profile/jobs/<job_id>/events", methods=["GET"])
+def profile_job_events(job_id):
+    """
+    Server-sent events: one "status" event per stage change, ending with a
+    "done" event that carries the final job state.
+    """
+    if profile_jobs.get(job_id) is None:
+        return jsonify({"error": f"Unknown job '{job_id}'"}), 404
+
+    def events():
+        version = -1
+        while True:
+            snapshot, version = profile_jobs.wait_for_change(job_id, version, timeout=15)
+            if snapshot is None:
+                return
+            finished = snapshot["status"] in FINISHED_STATES
+            yield f"event: {'done' if finished else 'status'}\ndata: {json.dumps(snapshot)}\n\n"
+            if finished:
+                return
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@business_bp.route("/profile/jobs/stats", methods=["GET"])
+def profile_job_stats():
+    return jsonify(profile_jobs.stats()), 200
+
+
+@business_bp.route("/profile/cache-stats", methods=["GET"])
+def profile_cache_stats():
+    return jsonify(profile_cache.stats()), 200
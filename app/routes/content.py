@@ -1,21 +1,114 @@
-from flask import Blueprint, request, jsonify
-from app.services.generator import generate_social_media_posts
+import os
+import json
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from app.services.generator import (
+    generate_social_media_posts, generate_posts_bulk, stream_social_media_posts
+)
+from app.services.deadline import deadline, time_left
+from app.routes.planner import explicit_tenant
+from app.routes.deadlines import with_deadline
 
 content_bp = Blueprint("content", __name__)
 
+# Upper bound on jobs accepted by one bulk request
+MAX_BULK_JOBS = 1000
+# Default time budgets (seconds) when the client sends no X-Request-Timeout
+GENERATION_DEADLINE = float(os.getenv("GENERATION_DEADLINE_SECONDS", 60))
+BULK_GENERATION_DEADLINE = float(os.getenv("BULK_GENERATION_DEADLINE_SECONDS", 300))
+
+
+def parse_generation_job(data):
+    """
+    Turn a generate-posts request body into generate_social_media_posts arguments.
+    """
+    return {
+        "business_profile": {
+            "name": data["name"],
+            "industry": data["industry"]
+        },
+        "preferences": {
+            "tone": data["tone"],
+            "post_type": data["post_type"]
+        },
+        "news": data.get("news", []),
+        "count": int(data.get("count", 5)),
+        "page_id": data.get("page_id"),
+    }
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def wants_stream(data):
+    return bool(data.get("stream")) or "text/event-stream" in request.headers.get("Accept", "")
+
 @content_bp.route("/generate-posts", methods=["POST"])
+@with_deadline(GENERATION_DEADLINE)
 def generate_posts():
+    """
+    POST /api/content/generate-posts
+    With "stream": true (or Accept: text/event-stream) the posts are sent as
+    server-sent events: one "post" event per post as soon as it is complete,
+    then a "done" event, or an "error" event if generation fails.
+    """
     data = request.get_json()
-    business_profile = {
-        "name": data["name"],
-        "industry": data["industry"]
-    }
-    preferences = {
-        "tone": data["tone"],
-        "post_type": data["post_type"]
-    }
-    news = data.get("news", [])
-    count = int(data.get("count", 5))
-    posts = generate_social_media_posts(business_profile, news, preferences, count)
-    return jsonify({"posts": posts})
+    job = parse_generation_job(data)
+    # Posts that repeat the history of a page the request names are replaced;
+    # requests without one keep using the completion cache
+    tenant = job["page_id"] or explicit_tenant()
+    if not wants_stream(data):
+        posts = generate_social_media_posts(
+            job["business_profile"], job["news"], job["preferences"], job["count"], tenant=tenant
+        )
+        return jsonify({"posts": posts})
+
+    # The stream is produced after this view returns, outside its deadline
+    budget = time_left()
+
+    def events():
+        count = 0
+        try:
+            with deadline(budget):
+                for post in stream_social_media_posts(
+                    job["business_profile"], job["news"], job["preferences"], job["count"], tenant=tenant
+                ):
+                    yield sse_event("post", {"index": count, "post": post})
+                    count += 1
+            yield sse_event("done", {"count": count})
+        except Exception as e:
+            yield sse_event("error", {"error": str(e)})
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@content_bp.route("/generate-posts/bulk", methods=["POST"])
+@with_deadline(BULK_GENERATION_DEADLINE)
+def generate_posts_bulk_route():
+    """
+    POST /api/content/generate-posts/bulk { "jobs": [ {<generate-posts body>}, ... ] }
+    Returns { "results": [ {"posts": [...]} | {"error": "..."}, ... ] } in job order.
+    Jobs not done by the deadline are returned as errors with
+    "status": "timed_out"; the others keep their posts.
+    """
+    data = request.get_json() or {}
+    raw_jobs = data.get("jobs")
+    if not isinstance(raw_jobs, list) or not raw_jobs:
+        return jsonify({"error": "Jobs must be a non-empty list"}), 400
+    if len(raw_jobs) > MAX_BULK_JOBS:
+        return jsonify({"error": f"At most {MAX_BULK_JOBS} jobs per request"}), 400
+
+    # Malformed jobs get their error in place; the rest still run
+    results = [None] * len(raw_jobs)
+    valid_jobs, positions = [], []
+    for i, raw in enumerate(raw_jobs):
+        try:
+            valid_jobs.append(parse_generation_job(raw))
+            positions.append(i)
+        except (KeyError, TypeError, ValueError) as e:
+            results[i] = {"error": f"Invalid job: {e}"}
 
+    for i, result in zip(positions, generate_posts_bulk(valid_jobs)):
+        results[i] = result
+    return jsonify({"results": results}), 200
@@ -0,0 +1,44 @@
+import os
+import functools
+from flask import request, jsonify
+
+from app.services.deadline import deadline, is_timeout
+
+# Header in which a client states how long it will wait, in seconds
+DEADLINE_HEADER = "X-Request-Timeout"
+# Upper bound on a client-supplied budget
+MAX_REQUEST_SECONDS = float(os.getenv("MAX_REQUEST_SECONDS", 300))
+
+
+def request_budget(default):
+    """
+    Seconds the current request may take: the client's X-Request-Timeout
+    when it is a positive number (capped at MAX_REQUEST_SECONDS), else
+    `default`.
+    """
+    try:
+        budget = float(request.headers.get(DEADLINE_HEADER, ""))
+    except ValueError:
+        return default
+    return min(budget, MAX_REQUEST_SECONDS) if budget > 0 else default
+
+
+def with_deadline(default_seconds):
+    """
+    Route decorator: run the view under a deadline (see request_budget),
+    which the services read to bound their upstream calls. A timeout that
+    escapes the view (DeadlineExceeded, or an upstream call timing out)
+    becomes a 504 with status "timed_out"; other errors propagate.
+    """
+    def decorate(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            with deadline(request_budget(default_seconds)):
+                try:
+                    return view(*args, **kwargs)
+                except Exception as e:
+                    if not is_timeout(e):
+                        raise
+                    return jsonify({"error": str(e), "status": "timed_out"}), 504
+        return wrapper
+    return decorate
@@ -1,11 +1,16 @@
+import logging
 from flask import Blueprint, request, jsonify
 from app.services.facebook import (
     connect_facebook_page, publish_to_facebook,
     save_fb_credentials, load_fb_credentials
 )
 from app.services.scheduler import WeeklyScheduler
+from app.services.dispatcher import get_dispatcher
+from app.services.fb_publisher import PublishError
+from app.routes.planner import request_tenant
 
 facebook_bp = Blueprint("facebook", __name__)
+logger = logging.getLogger(__name__)
 
 @facebook_bp.route("/connect", methods=["GET", "POST"])
 def fb_connect():
@@ -41,7 +46,7 @@ def fb_publish():
     if not page_id or not token:
         return jsonify({"error": "Facebook page not connected"}), 400
 
-    scheduler = WeeklyScheduler()
+    scheduler = WeeklyScheduler(request_tenant())
     schedule = scheduler.get_schedule()
     if not day:
         return jsonify({"error": "Missing 'day' parameter"}), 400
@@ -49,6 +54,22 @@ def fb_publish():
         return jsonify({"error": f"No scheduled post for '{day}'"}), 404
 
     message = override_msg or schedule[day]
-    result = publish_to_facebook(message, page_id, token)
-    print(result)
+    try:
+        result = publish_to_facebook(message, page_id, token)
+    except PublishError as e:
+        return jsonify({"success": False, "error": str(e), "code": e.code}), 502
+    scheduler.record_published(message)
+    logger.info("Published %s to page %s", result.get("post_id"), page_id)
     return jsonify(result), 200
+
+@facebook_bp.route("/publications", methods=["GET"])
+def fb_publications():
+    """
+    GET /api/facebook/publications[?page_id=...]
+    Recent automatic publications for a page and the dispatcher's state.
+    """
+    scheduler = WeeklyScheduler(request_tenant())
+    return jsonify({
+        "dispatcher": get_dispatcher().stats(),
+        "publications": scheduler.store.publications(scheduler.tenant),
+    }), 200
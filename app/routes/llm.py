@@ -0,0 +1,13 @@
+from flask import Blueprint, jsonify
+from app.services.llm_gateway import get_gateway
+
+llm_bp = Blueprint("llm", __name__)
+
+@llm_bp.route("/status", methods=["GET"])
+def llm_status():
+    """
+    GET /api/llm/status
+    LLM gateway budgets, usage in the current window, queue depth per
+    priority and recent wait times.
+    """
+    return jsonify(get_gateway().stats()), 200
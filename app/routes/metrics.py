@@ -0,0 +1,12 @@
+from flask import Blueprint, Response
+from app.services.instrumentation import render_metrics
+
+metrics_bp = Blueprint("metrics", __name__)
+
+@metrics_bp.route("/metrics", methods=["GET"])
+def metrics():
+    """
+    GET /metrics
+    Stage and request latency histograms in the Prometheus text format.
+    """
+    return Response(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,9 +1,20 @@
+import os
 from flask import Blueprint, request, jsonify
-from app.services.news_scraper import fetch_industry_news
+from app.services.news_scraper import (
+    fetch_industry_news, fetch_industry_news_batch, news_cache, normalize_news_query
+)
+from app.services.deadline import DeadlineExceeded
+from app.responses import make_etag, conditional_json
+from app.routes.deadlines import with_deadline
 
 news_bp = Blueprint('news', __name__)
 
+# Default time budgets (seconds) when the client sends no X-Request-Timeout
+NEWS_DEADLINE = float(os.getenv("NEWS_DEADLINE_SECONDS", 10))
+NEWS_BATCH_DEADLINE = float(os.getenv("NEWS_BATCH_DEADLINE_SECONDS", 30))
+
 @news_bp.route('/industry-news', methods=['POST'])
+@with_deadline(NEWS_DEADLINE)
 def industry_news():
     data = request.get_json()
     industry = data.get('industry')
@@ -14,5 +25,46 @@ def industry_news():
     try:
         headlines = fetch_industry_news(industry)
         return jsonify({'news': headlines}), 200
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@news_bp.route('/industry-news', methods=['GET'])
+@with_deadline(NEWS_DEADLINE)
+def industry_news_conditional():
+    """
+    GET /industry-news?industry=...
+    Same headlines as the POST route, with an ETag from the news cache entry
+    so polling clients get a 304 while the headlines are unchanged.
+    """
+    industry = request.args.get('industry')
+
+    if not industry:
+        return jsonify({'error': 'Industry parameter is required'}), 400
+
+    try:
+        headlines = fetch_industry_news(industry)
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    query = normalize_news_query(industry)
+    etag = make_etag('news', news_cache.version(query), query)
+    return conditional_json(etag, lambda: {'news': headlines})
+
+@news_bp.route('/industry-news/batch', methods=['POST'])
+@with_deadline(NEWS_BATCH_DEADLINE)
+def industry_news_batch():
+    data = request.get_json() or {}
+    industries = data.get('industries')
+
+    if not isinstance(industries, list) or not industries:
+        return jsonify({'error': 'Industries must be a non-empty list'}), 400
+
+    try:
+        news, errors = fetch_industry_news_batch([str(i) for i in industries])
+        return jsonify({'news': news, 'errors': errors}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
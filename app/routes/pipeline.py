@@ -0,0 +1,119 @@
+import os
+import json
+import queue
+import threading
+import contextvars
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from app.services.pipeline import run_dag, build_onboarding_stages, DONE, TIMED_OUT
+from app.services.scheduler import WEEKDAYS
+from app.routes.planner import scheduler_for_request
+from app.routes.deadlines import with_deadline
+
+pipeline_bp = Blueprint("pipeline", __name__)
+
+# Default time budget (seconds) when the client sends no X-Request-Timeout
+ONBOARD_DEADLINE = float(os.getenv("ONBOARD_DEADLINE_SECONDS", 90))
+
+# Stage results returned to the client, keyed by the name used in the response
+PUBLIC_STAGES = {"profile": "profile", "news": "news", "posts": "posts", "schedule": "schedule"}
+
+
+def parse_onboarding_request(data):
+    url = data.get("website_url")
+    if not url:
+        raise ValueError("Missing 'website_url' parameter")
+    preferred_days = data.get("preferred_days", ["Mon", "Wed", "Fri"])
+    if not isinstance(preferred_days, list):
+        raise ValueError("Preferred days must be a list.")
+    post_frequency = int(data.get("post_frequency", 3))
+    # Reject bad schedule input before any fetch or LLM work is started
+    if post_frequency > len([day for day in WEEKDAYS if day in preferred_days]):
+        raise ValueError("Post frequency exceeds number of preferred days.")
+    return {
+        "url": url,
+        "preferences": {
+            "tone": data.get("tone", "informative"),
+            "post_type": data.get("post_type", "general"),
+        },
+        "count": int(data.get("count", 3)),
+        "post_frequency": post_frequency,
+        "preferred_days": preferred_days,
+        "include_news": bool(data.get("include_news", True)),
+    }
+
+
+def combined_result(results, report):
+    """
+    Response body: the public stage results, the stage report and a status,
+    "ok" when every stage is done, "timed_out" when the deadline cut some
+    short, "partial" otherwise.
+    """
+    body = {key: results.get(stage) for stage, key in PUBLIC_STAGES.items()}
+    body["stages"] = report
+    statuses = [r["status"] for r in report.values()]
+    if all(status == DONE for status in statuses):
+        body["status"] = "ok"
+    elif TIMED_OUT in statuses:
+        body["status"] = "timed_out"
+    else:
+        body["status"] = "partial"
+    return body
+
+
+@pipeline_bp.route("/onboard", methods=["POST"])
+@with_deadline(ONBOARD_DEADLINE)
+def onboard():
+    """
+    POST /api/pipeline/onboard
+    { "website_url", "tone", "post_type", "count", "post_frequency",
+      "preferred_days", "include_news", "stream" }
+
+    Runs profile -> news -> generation -> scheduling in one request, with
+    independent stages overlapped. Returns the combined result, or with
+    "stream": true, one SSE "stage" event per finished stage and a final
+    "done" event with the combined result. When the deadline comes first,
+    the stages done by then are returned with status "timed_out".
+    """
+    data = request.get_json() or {}
+    try:
+        params = parse_onboarding_request(data)
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    stages = build_onboarding_stages(
+        params["url"], params["preferences"], params["count"],
+        params["post_frequency"], params["preferred_days"], scheduler_for_request(),
+        include_news=params["include_news"],
+    )
+
+    if not data.get("stream"):
+        results, report = run_dag(stages)
+        return jsonify(combined_result(results, report)), 200
+
+    events = queue.Queue()
+
+    def run():
+        try:
+            results, report = run_dag(stages, on_event=events.put)
+            events.put({"done": combined_result(results, report)})
+        except Exception as e:
+            events.put({"done": {"status": "error", "error": str(e)}})
+
+    # The run outlives this view; it keeps the request's deadline
+    threading.Thread(target=contextvars.copy_context().run, args=(run,), daemon=True).start()
+
+    def stream():
+        while True:
+            event = events.get()
+            if "done" in event:
+                yield f"event: done\ndata: {json.dumps(event['done'])}\n\n"
+                return
+            if event["stage"] not in PUBLIC_STAGES:
+                event.pop("result", None)
+            yield f"event: stage\ndata: {json.dumps(event)}\n\n"
+
+    return Response(
+        stream_with_context(stream()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
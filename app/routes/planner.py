@@ -1,10 +1,37 @@
 # routes/planner.py
 
 from flask import Blueprint, request, jsonify
-from app.services.scheduler import WeeklyScheduler
+from app.services.scheduler import WeeklyScheduler, POST_TEMPLATES
+from app.services.bulk_planner import plan_pages
+from app.services.schedule_store import DEFAULT_TENANT
+from app.services.post_index import NearDuplicateError
+from app.responses import make_etag, not_modified, json_response
 
 planner_bp = Blueprint("planner", __name__)
-scheduler = WeeklyScheduler()
+
+# Largest number of pages one bulk planning request may carry
+MAX_BULK_PAGES = 20000
+# The tenant may come from a header, so cached responses depend on it
+TENANT_VARY = ("X-Page-Id",)
+
+
+def explicit_tenant():
+    """
+    Tenant (Facebook page id) named by the request: ?page_id=..., then the
+    X-Page-Id header. None when it names neither.
+    """
+    return request.args.get("page_id") or request.headers.get("X-Page-Id")
+
+
+def request_tenant():
+    """
+    Tenant a request acts on: the one it names, else the default tenant.
+    """
+    return explicit_tenant() or DEFAULT_TENANT
+
+
+def scheduler_for_request():
+    return WeeklyScheduler(request_tenant())
 
 # 1. Generate schedule
 @planner_bp.route("/", methods=["POST"])
@@ -17,40 +44,89 @@ def generate_schedule():
         if not isinstance(preferred_days, list):
             raise ValueError("Preferred days must be a list.")
 
-        schedule = scheduler.generate_schedule(post_frequency, preferred_days)
+        schedule = scheduler_for_request().generate_schedule(post_frequency, preferred_days)
         return jsonify(schedule), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
-# 2. Get current schedule
+# 2. Get current schedule (conditional: ETag from the tenant's version)
 @planner_bp.route("/", methods=["GET"])
 def get_schedule():
-    schedule = scheduler.get_schedule()
+    scheduler = scheduler_for_request()
+    cached = not_modified(make_etag("schedule", scheduler.version, scheduler.tenant), vary=TENANT_VARY)
+    if cached:
+        return cached
+    version, schedule = scheduler.get_versioned_schedule()
     if not schedule:
         return jsonify({"error": "No schedule has been generated yet."}), 404
-    return jsonify(schedule), 200
+    return json_response(schedule, etag=make_etag("schedule", version, scheduler.tenant), vary=TENANT_VARY)
+
+# 3. Update several posts at once
+@planner_bp.route("/", methods=["PUT"])
+def bulk_update_posts():
+    try:
+        data = request.json
+        posts = data.get("posts")
+        if not isinstance(posts, dict) or not posts:
+            raise ValueError("Posts must be a non-empty {day: content} object.")
+
+        updated_schedule = scheduler_for_request().bulk_update(posts)
+        return jsonify(updated_schedule), 200
+
+    except NearDuplicateError as e:
+        return jsonify({"error": str(e), "duplicates": e.duplicates}), 409
+    except KeyError as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
 
-# 3. Update post
+# 4. Update post
 @planner_bp.route("/<day>", methods=["PUT"])
 def update_post(day):
     try:
         data = request.json
         new_content = data.get("content")
 
-        updated_schedule = scheduler.update_post(day, new_content)
+        updated_schedule = scheduler_for_request().update_post(day, new_content)
         return jsonify(updated_schedule), 200
 
+    except NearDuplicateError as e:
+        return jsonify({"error": str(e), "duplicates": e.duplicates}), 409
     except KeyError as e:
         return jsonify({"error": str(e)}), 404
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
-# 4. Delete post
+# 5. Set publishing time of a post
+@planner_bp.route("/<day>/time", methods=["PUT"])
+def set_post_time(day):
+    try:
+        data = request.json
+        post_times = scheduler_for_request().set_post_time(
+            day, data.get("time", ""), data.get("timezone", "UTC")
+        )
+        return jsonify(post_times), 200
+
+    except KeyError as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+# 6. Get publishing times (conditional, like the schedule)
+@planner_bp.route("/times", methods=["GET"])
+def get_post_times():
+    scheduler = scheduler_for_request()
+    etag = make_etag("times", scheduler.version, scheduler.tenant)
+    return not_modified(etag, vary=TENANT_VARY) or json_response(
+        scheduler.get_post_times(), etag=etag, vary=TENANT_VARY
+    )
+
+# 7. Delete post
 @planner_bp.route("/<day>", methods=["DELETE"])
 def delete_post(day):
     try:
-        updated_schedule = scheduler.delete_post(day)
+        updated_schedule = scheduler_for_request().delete_post(day)
         return jsonify(updated_schedule), 200
 
     except KeyError as e:
@@ -58,8 +134,38 @@ def delete_post(day):
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
-# 5. Reset entire schedule
+# 8. Reset entire schedule
 @planner_bp.route("/reset", methods=["DELETE"])
 def reset_schedule():
-    scheduler.reset_schedule()
+    scheduler_for_request().reset_schedule()
     return jsonify({"message": "Schedule reset successfully."}), 200
+
+# 9. Plan many pages at once
+@planner_bp.route("/bulk", methods=["POST"])
+def bulk_plan():
+    """
+    POST /bulk
+    {"pages": [{"page_id": ..., "post_frequency": ..., "preferred_days": [...],
+                "window_start": "HH:MM", "window_end": "HH:MM", "timezone": ...,
+                "min_gap_hours": ..., "templates": [...]}, ...],
+     "templates": [...], "dry_run": false, "include_plans": false}
+    Replaces the schedule of every listed page. Plans are returned for dry
+    runs or when include_plans is set.
+    """
+    try:
+        data = request.json
+        pages = data.get("pages")
+        if not isinstance(pages, list) or not pages:
+            raise ValueError("Pages must be a non-empty list.")
+        if len(pages) > MAX_BULK_PAGES:
+            raise ValueError(f"At most {MAX_BULK_PAGES} pages per request.")
+
+        dry_run = bool(data.get("dry_run", False))
+        result = plan_pages(pages, data.get("templates") or POST_TEMPLATES, dry_run=dry_run)
+        if not (dry_run or data.get("include_plans")):
+            del result["plans"]
+        result["dry_run"] = dry_run
+        return jsonify(result), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
@@ -0,0 +1,223 @@
+import zlib
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from app.services.schedule_store import WEEKDAYS, DEFAULT_TIMEZONE, get_schedule_store
+from app.services.dispatcher import get_dispatcher, parse_post_time
+from app.services.instrumentation import stage
+
+# Defaults for constraints a page does not set
+DEFAULT_FREQUENCY = 3
+DEFAULT_WINDOW = ("09:00", "18:00")
+# Posting times are picked on this grid inside each page's window
+SLOT_MINUTES = 15
+
+DAY_INDEX = {day: i for i, day in enumerate(WEEKDAYS)}
+_DAY_NAMES = np.array(WEEKDAYS, dtype=object)
+_TIME_LABELS = np.array([f"{m // 60:02d}:{m % 60:02d}" for m in range(24 * 60)], dtype=object)
+
+
+def _minutes(value, page_id):
+    try:
+        hours, minutes = parse_post_time(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Page {page_id}: invalid time '{value}', expected HH:MM")
+    return hours * 60 + minutes
+
+
+class PageConstraints:
+    """
+    Column-wise constraints of many pages, parsed from request dicts:
+
+        {"page_id": "123", "post_frequency": 3, "preferred_days": ["Mon", ...],
+         "window_start": "09:00", "window_end": "18:00", "timezone": "Asia/Kolkata",
+         "min_gap_hours": 36, "templates": ["...", ...]}
+
+    Only page_id is required. The window is in the page's time zone, and
+    `templates` overrides the shared template pool for that page.
+    """
+
+    def __init__(self, pages, templates):
+        if not templates:
+            raise ValueError("At least one template is required.")
+        count = len(pages)
+        self.page_ids = np.empty(count, dtype=object)
+        self.timezones = np.empty(count, dtype=object)
+        frequency = np.empty(count, dtype=np.int64)
+        day_masks = np.empty(count, dtype=np.int64)
+        start = np.empty(count, dtype=np.int64)
+        end = np.empty(count, dtype=np.int64)
+        min_gap = np.empty(count, dtype=np.float64)
+        page_hash = np.empty(count, dtype=np.int64)
+
+        pools = [list(templates)]
+        pool_index = np.zeros(count, dtype=np.int64)
+        known_zones = set()
+        seen = set()
+        for i, page in enumerate(pages):
+            if not isinstance(page, dict) or not page.get("page_id"):
+                raise ValueError(f"Page #{i}: 'page_id' is required.")
+            page_id = str(page["page_id"])
+            if page_id in seen:
+                raise ValueError(f"Page {page_id} is listed more than once.")
+            seen.add(page_id)
+
+            days = page.get("preferred_days", WEEKDAYS)
+            try:
+                day_masks[i] = sum(1 << DAY_INDEX[day] for day in set(days))
+            except (KeyError, TypeError):
+                raise ValueError(f"Page {page_id}: preferred_days must be a list of {', '.join(WEEKDAYS)}")
+            frequency[i] = int(page.get("post_frequency", DEFAULT_FREQUENCY))
+            if not 0 <= frequency[i] <= 7:
+                raise ValueError(f"Page {page_id}: post_frequency must be between 0 and 7")
+            start[i] = _minutes(page.get("window_start", DEFAULT_WINDOW[0]), page_id)
+            end[i] = _minutes(page.get("window_end", DEFAULT_WINDOW[1]), page_id)
+            if end[i] < start[i]:
+                raise ValueError(f"Page {page_id}: window_end is before window_start")
+            min_gap[i] = float(page.get("min_gap_hours", 0))
+
+            timezone = page.get("timezone", DEFAULT_TIMEZONE)
+            if timezone not in known_zones:
+                try:
+                    ZoneInfo(timezone)
+                except Exception:
+                    raise ValueError(f"Page {page_id}: unknown time zone '{timezone}'")
+                known_zones.add(timezone)
+            if page.get("templates"):
+                pool_index[i] = len(pools)
+                pools.append([str(t) for t in page["templates"]])
+
+            self.page_ids[i] = page_id
+            self.timezones[i] = timezone
+            # Stable per page, so a page keeps its slot and weekday phase from week to week
+            page_hash[i] = zlib.crc32(page_id.encode("utf-8"))
+
+        self.frequency = frequency
+        self.allowed = ((day_masks[:, None] >> np.arange(7)) & 1).astype(bool)
+        self.window_start = start
+        self.window_end = end
+        self.min_gap_hours = min_gap
+        self.page_hash = page_hash
+
+        # All template pools in one flat array; a page's pool is a slice of it
+        sizes = np.array([len(pool) for pool in pools], dtype=np.int64)
+        offsets = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        self.templates = np.array([t for pool in pools for t in pool], dtype=object)
+        self.pool_offset = offsets[pool_index]
+        self.pool_size = sizes[pool_index]
+
+    def __len__(self):
+        return len(self.page_ids)
+
+
+def _select_days(allowed, frequency, phase):
+    """
+    Pick `frequency` of each page's allowed days, spread as evenly as
+    possible (Bresenham over the allowed days, rotated by `phase`).
+    """
+    available = allowed.sum(axis=1)
+    k = np.maximum(available, 1)[:, None]
+    f = np.minimum(frequency, available)[:, None]
+    rank = (np.cumsum(allowed, axis=1) - 1 + phase[:, None]) % k
+    return allowed & ((rank + 1) * f // k > rank * f // k)
+
+
+def _min_gap_days(chosen):
+    """
+    Smallest distance in days between consecutive chosen days of each page,
+    wrapping into the next week (7 for a single post, 99 for none).
+    """
+    doubled = np.concatenate([chosen, chosen], axis=1)
+    positions = np.where(doubled, np.arange(14), 99)
+    # Index of the next chosen day at or after each position
+    next_at = np.minimum.accumulate(positions[:, ::-1], axis=1)[:, ::-1]
+    gaps = np.where(chosen, next_at[:, 1:8] - np.arange(7), 99)
+    return gaps.min(axis=1)
+
+
+def plan_week(constraints, cursors):
+    """
+    Plan one week for every page at once.
+
+    Days are spread evenly over each page's preferred days, with the phase
+    varying by page so the load spreads over the week. A page whose posts
+    would come closer together than its min_gap_hours posts less often.
+    Each page posts at one slot inside its window, picked per page so posts
+    spread over the window. Content rotates through the page's template
+    pool from its cursor, so a template comes back only after the whole
+    pool has been used. Since the cursor carries over, this holds across
+    weeks too.
+
+    Args:
+        constraints (PageConstraints): The pages.
+        cursors (np.ndarray): Rotation position of each page's pool.
+
+    Returns:
+        dict: Arrays "page" and "day" (one entry per post, grouped by page
+        in weekday order), "minute" (local minute of day), "template"
+        (index into constraints.templates) and "frequency" (posts per
+        page after spacing).
+    """
+    phase = constraints.page_hash % 7
+    frequency = np.minimum(constraints.frequency, constraints.allowed.sum(axis=1))
+    # Spacing: lower the frequency of pages that violate it. Each pass is
+    # vectorized; at most 7 are needed.
+    for _ in range(7):
+        chosen = _select_days(constraints.allowed, frequency, phase)
+        too_close = (frequency > 1) & (_min_gap_days(chosen) * 24 < constraints.min_gap_hours)
+        if not too_close.any():
+            break
+        frequency = frequency - too_close
+
+    slots = (constraints.window_end - constraints.window_start) // SLOT_MINUTES + 1
+    minute = constraints.window_start + (constraints.page_hash // 7 % slots) * SLOT_MINUTES
+
+    page, day = np.nonzero(chosen)
+    nth = (np.cumsum(chosen, axis=1) - 1)[page, day]
+    template = constraints.pool_offset[page] + (cursors[page] + nth) % constraints.pool_size[page]
+    return {"page": page, "day": day, "minute": minute[page], "template": template, "frequency": frequency}
+
+
+def plan_pages(pages, templates, dry_run=False, store=None):
+    """
+    Plan and (unless `dry_run`) save the weekly schedules of many pages in
+    one call. Each page's schedule is replaced, and its template rotation
+    cursor advances, in a single transaction for all pages.
+
+    Args:
+        pages (list[dict]): Page constraints (see PageConstraints).
+        templates (list[str]): Shared template pool.
+        dry_run (bool): Only compute the plan.
+        store (ScheduleStore): Defaults to the shared store.
+
+    Returns:
+        dict: {"pages", "posts", "plans": {page_id: [{"day", "time",
+        "timezone", "content"}, ...]}}
+    """
+    store = store or get_schedule_store()
+    constraints = PageConstraints(pages, templates)
+    with stage("bulk_plan"):
+        known = store.template_cursors()
+        cursors = np.array([known.get(page_id, 0) for page_id in constraints.page_ids], dtype=np.int64)
+        plan = plan_week(constraints, cursors)
+
+    page = plan["page"]
+    rows = list(zip(
+        constraints.page_ids[page].tolist(),
+        _DAY_NAMES[plan["day"]].tolist(),
+        constraints.templates[plan["template"]].tolist(),
+        _TIME_LABELS[plan["minute"]].tolist(),
+        constraints.timezones[page].tolist(),
+    ))
+    if not dry_run:
+        new_cursors = (cursors + plan["frequency"]).tolist()
+        store.replace_many(constraints.page_ids.tolist(), rows, new_cursors)
+        dispatcher = get_dispatcher()
+        if dispatcher.running:
+            dispatcher.load()
+
+    plans = {page_id: [] for page_id in constraints.page_ids.tolist()}
+    for page_id, day, content, post_time, timezone in rows:
+        plans[page_id].append({"day": day, "time": post_time, "timezone": timezone, "content": content})
+    return {"pages": len(constraints), "posts": len(rows), "plans": plans}
@@ -0,0 +1,222 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+class MemoryBackend:
+    """
+    In-process backend. Keeps entries in an OrderedDict in LRU order.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, value, expires_at, version=0):
+        with self._lock:
+            self._entries[key] = (value, expires_at, version)
+            self._entries.move_to_end(key)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def evict(self, max_entries):
+        with self._lock:
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+
+    def purge_expired(self, now):
+        with self._lock:
+            for key in [k for k, (_, exp, _) in self._entries.items() if exp <= now]:
+                del self._entries[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteBackend:
+    """
+    Persistent backend shared by every process that opens the same file.
+    Values are stored as JSON; recency is tracked in an indexed column.
+    """
+
+    def __init__(self, path, table="cache"):
+        self.path = path
+        self.table = table
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._conn() as conn:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_accessed ON {table}(accessed_at)")
+            columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+            if "version" not in columns:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+
+    def _conn(self):
+        # sqlite3 connections cannot be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self._conn()
+        row = conn.execute(
+            f"SELECT value, expires_at, version FROM {self.table} WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        with conn:
+            conn.execute(
+                f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (time.time(), key)
+            )
+        return json.loads(row[0]), row[1], row[2]
+
+    def set(self, key, value, expires_at, version=0):
+        with self._conn() as conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, accessed_at, version) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps(value), expires_at, time.time(), version),
+            )
+
+    def delete(self, key):
+        with self._conn() as conn:
+            conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def evict(self, max_entries):
+        with self._conn() as conn:
+            conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                f"SELECT key FROM {self.table} ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (max_entries,),
+            )
+
+    def purge_expired(self, now):
+        with self._conn() as conn:
+            conn.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (now,))
+
+    def __len__(self):
+        return self._conn().execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def clear(self):
+        with self._conn() as conn:
+            conn.execute(f"DELETE FROM {self.table}")
+
+
+class TTLCache:
+    """
+    Key/value cache with a time-to-live, LRU eviction and hit/miss counters.
+
+    Storage is delegated to a backend (MemoryBackend or SQLiteBackend), so the
+    same cache can live in-process or be shared between workers.
+
+    Every entry carries a version that changes whenever its value is
+    rewritten, which the routes use as an HTTP ETag. Versions are write
+    times in microseconds, so they agree between processes sharing a
+    SQLite backend and never repeat after an entry is evicted.
+    """
+
+    def __init__(self, backend=None, ttl=3600, max_entries=1000):
+        # Not `backend or ...`: an empty backend has len() 0
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._last_version = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        entry = self.backend.get(key)
+        if entry is not None and entry[1] > time.time():
+            with self._lock:
+                self.hits += 1
+            return entry[0]
+        if entry is not None:
+            self.backend.delete(key)
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def set(self, key, value, ttl=None, version=None):
+        """
+        Store `value` under `key`. Pass the entry's current `version` to keep
+        it when the value is known to be unchanged (e.g. refreshed after a
+        304 from upstream); by default every write gets a new version.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            if version is None:
+                version = self._last_version = max(self._last_version + 1, time.time_ns() // 1000)
+        self.backend.set(key, value, time.time() + ttl, version)
+        with self._lock:
+            self._writes += 1
+            # Sweeping is cheap but not free; do it every so often, not per write
+            sweep = self._writes % 100 == 0
+        if sweep:
+            self.backend.purge_expired(time.time())
+        self.backend.evict(self.max_entries)
+
+    def version(self, key):
+        """
+        Version of the live entry for `key`, or None if there is none.
+        """
+        entry = self.backend.get(key)
+        if entry is None or entry[1] <= time.time():
+            return None
+        return entry[2]
+
+    def delete(self, key):
+        self.backend.delete(key)
+
+    def clear(self):
+        self.backend.clear()
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "size": len(self.backend),
+        }
+
+
+def make_backend(kind: str, path: str = None, table: str = "cache"):
+    """
+    Build a cache backend from a config string: "memory" or "sqlite".
+    """
+    kind = (kind or "memory").lower()
+    if kind == "memory":
+        return MemoryBackend()
+    if kind == "sqlite":
+        if not path:
+            raise ValueError("The sqlite cache backend needs a database path.")
+        return SQLiteBackend(path, table=table)
+    raise ValueError(f"Unknown cache backend '{kind}'. Use 'memory' or 'sqlite'.")
@@ -0,0 +1,307 @@
+import os
+import time
+import asyncio
+import logging
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urldefrag, urlsplit
+from urllib.robotparser import RobotFileParser
+
+from app.services.page_cache import page_cache
+from app.services.html_extractor import extract_page_content, DEFAULT_TEXT_BUDGET
+from app.services.instrumentation import timed
+from app.services.single_flight import SingleFlight, normalize_url
+from app.services.deadline import call_timeout
+
+logger = logging.getLogger(__name__)
+
+# Pages fetched per site, the home page included
+CRAWL_MAX_PAGES = int(os.getenv("CRAWL_MAX_PAGES", 6))
+# Bytes read per site, over all pages; a page cut short is still parsed
+CRAWL_MAX_BYTES = int(os.getenv("CRAWL_MAX_BYTES", 3 * 1024 * 1024))
+# Open connections per host
+CRAWL_PER_HOST = int(os.getenv("CRAWL_PER_HOST", 4))
+# Wall-clock limit for a whole crawl; pages still loading are dropped
+CRAWL_TIMEOUT = float(os.getenv("CRAWL_TIMEOUT", 15))
+# Limit for each request
+PAGE_TIMEOUT = float(os.getenv("CRAWL_PAGE_TIMEOUT", 10))
+# Name matched against robots.txt rules, and the User-Agent sent
+CRAWLER_NAME = "AISocialMediaManager"
+USER_AGENT = f"Mozilla/5.0 (compatible; {CRAWLER_NAME}/1.0)"
+# Visible text kept from each page other than the home page
+SUBPAGE_TEXT_BUDGET = 20000
+
+# Link path/anchor words that point to pages describing the business
+LINK_KEYWORDS = {
+    "about": 5, "about-us": 5, "our-story": 4, "story": 3, "who-we-are": 4, "what-we-do": 4,
+    "services": 4, "service": 3, "menu": 4, "products": 3, "solutions": 3, "offerings": 3,
+    "company": 2, "mission": 2, "team": 1, "pricing": 1, "contact": 1,
+}
+# Links never worth fetching for a profile
+SKIP_WORDS = ("login", "signin", "sign-in", "signup", "register", "account", "cart", "checkout", "basket",
+              "privacy", "terms", "cookie", "legal", "wp-admin", "wp-login", "feed", "search")
+SKIP_EXTENSIONS = (".pdf", ".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".zip", ".mp4", ".mp3",
+                   ".css", ".js", ".xml", ".json", ".ico", ".doc", ".docx", ".xls", ".xlsx")
+
+# Concurrent crawls of the same site, and crawls of different pages of one
+# host asking for its robots.txt, share the upstream requests. Within the
+# process only: neither result is cached where other processes can read it.
+crawl_flight = SingleFlight("crawl", lease_path="")
+robots_flight = SingleFlight("robots", lease_path="")
+
+
+class _LinkParser(HTMLParser):
+    """
+    Collects (href, anchor text) pairs from a page.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.links = []
+        self._href = None
+        self._text = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a":
+            self._href = dict(attrs).get("href")
+            self._text = []
+
+    def handle_data(self, data):
+        if self._href is not None:
+            self._text.append(data)
+
+    def handle_endtag(self, tag):
+        if tag == "a" and self._href is not None:
+            self.links.append((self._href, " ".join("".join(self._text).split())))
+            self._href = None
+
+
+def _site(url):
+    host = urlsplit(url).hostname or ""
+    return host[4:] if host.startswith("www.") else host
+
+
+def discover_links(html: str, base_url: str, limit: int):
+    """
+    Pick the links of a page most likely to describe the business (About,
+    Services, Menu, ...), same site only.
+
+    Args:
+        html (str): The page.
+        base_url (str): Its final URL, for resolving relative links.
+        limit (int): Maximum links to return.
+
+    Returns:
+        list[str]: Absolute URLs, best first.
+    """
+    parser = _LinkParser()
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception:
+        pass
+
+    home = urldefrag(base_url)[0].rstrip("/")
+    scores = {}
+    for href, text in parser.links:
+        if not href or href.startswith(("mailto:", "tel:", "javascript:", "#")):
+            continue
+        url = urldefrag(urljoin(base_url, href))[0]
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or _site(url) != _site(base_url):
+            continue
+        path = parts.path.lower()
+        if url.rstrip("/") == home or path.endswith(SKIP_EXTENSIONS) or parts.query:
+            continue
+        words = path.replace("_", "-").strip("/").split("/")
+        if any(skip in path for skip in SKIP_WORDS) or len(words) > 2:
+            continue
+        anchor = text.lower().replace(" ", "-")
+        score = max((weight for word, weight in LINK_KEYWORDS.items()
+                     if word in words or word == anchor or word in words[-1].split("-")), default=0)
+        if score:
+            # Shallow pages are overviews, deeper ones tend to be single items
+            scores[url] = max(scores.get(url, 0), score - 0.5 * (len(words) - 1))
+    return sorted(scores, key=lambda u: -scores[u])[:limit]
+
+
+class _Budget:
+    """
+    Bytes a crawl may still read, shared by its concurrent fetches.
+    """
+
+    def __init__(self, max_bytes):
+        self.remaining = max_bytes
+
+
+async def _fetch(session, url, budget, use_cache=True):
+    """
+    GET one page, revalidating against the page cache. Returns (final URL,
+    HTML) or raises. Reads at most the remaining byte budget.
+    """
+    headers = {"User-Agent": USER_AGENT}
+    # The page cache does blocking SQLite and file I/O; keep it off the event loop
+    cached = await asyncio.to_thread(page_cache.lookup, url) if use_cache else None
+    if cached:
+        headers.update(page_cache.conditional_headers(cached))
+
+    async with session.get(url, headers=headers) as response:
+        if response.status == 304 and cached:
+            body = await asyncio.to_thread(page_cache.read, url)
+            if body is not None:
+                await asyncio.to_thread(
+                    page_cache.revalidated, url, response.headers.get("ETag"), response.headers.get("Last-Modified")
+                )
+                return str(response.url), body
+            return await _fetch(session, url, budget, use_cache=False)
+        if response.status != 200:
+            raise Exception(f"Failed to fetch URL {url} — Status code: {response.status}")
+
+        parts, truncated = [], False
+        async for data in response.content.iter_chunked(64 * 1024):
+            if len(data) > budget.remaining:
+                parts.append(data[:max(0, budget.remaining)])
+                budget.remaining = 0
+                truncated = True
+                break
+            budget.remaining -= len(data)
+            parts.append(data)
+        try:
+            body = b"".join(parts).decode(response.get_encoding(), errors="replace")
+        except LookupError:
+            body = b"".join(parts).decode("utf-8", errors="replace")
+
+        if not truncated:
+            await asyncio.to_thread(
+                page_cache.store, url, body,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+            )
+        return str(response.url), body
+
+
+def _robots_key(url):
+    parts = urlsplit(normalize_url(url))
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+async def _robots(session, url):
+    """
+    Parsed robots.txt of the site, allowing everything when it is missing
+    or unreachable and nothing when access to it is denied.
+    """
+    parts = urlsplit(url)
+    robots = RobotFileParser(f"{parts.scheme}://{parts.netloc}/robots.txt")
+    try:
+        async with session.get(robots.url, headers={"User-Agent": USER_AGENT}) as response:
+            if response.status in (401, 403):
+                robots.disallow_all = True
+            elif response.status == 200:
+                robots.parse((await response.text(errors="replace")).splitlines())
+            else:
+                robots.allow_all = True
+    except Exception:
+        robots.allow_all = True
+    return robots
+
+
+async def _crawl(url, max_pages, max_bytes, timeout):
+    import aiohttp
+
+    deadline = time.monotonic() + timeout
+    budget = _Budget(max_bytes)
+    connector = aiohttp.TCPConnector(limit_per_host=CRAWL_PER_HOST, ttl_dns_cache=300)
+    async with aiohttp.ClientSession(
+        connector=connector, timeout=aiohttp.ClientTimeout(total=min(PAGE_TIMEOUT, timeout))
+    ) as session:
+        # robots.txt only gates discovered pages, so it loads alongside the home page
+        robots_task = asyncio.ensure_future(robots_flight.do_async(_robots_key(url), _robots, session, url))
+        try:
+            home_url, home = await asyncio.wait_for(_fetch(session, url, budget), timeout)
+        except BaseException:
+            robots_task.cancel()
+            raise
+        pages = [(home_url, home)]
+        robots = await robots_task
+
+        links = [
+            link for link in discover_links(home, home_url, limit=max_pages * 2)
+            if robots.can_fetch(CRAWLER_NAME, link)
+        ][:max_pages - 1]
+        if not links or budget.remaining <= 0:
+            return pages
+
+        # Sites asking for a crawl delay get one request at a time
+        delay = robots.crawl_delay(CRAWLER_NAME) or 0
+        gate = asyncio.Semaphore(1 if delay else len(links))
+
+        async def fetch_subpage(link):
+            async with gate:
+                if budget.remaining <= 0:
+                    return None
+                if delay:
+                    await asyncio.sleep(delay)
+                return await _fetch(session, link, budget)
+
+        tasks = [asyncio.ensure_future(fetch_subpage(link)) for link in links]
+        done, pending = await asyncio.wait(tasks, timeout=max(0, deadline - time.monotonic()))
+        for task in pending:
+            task.cancel()
+        # Keep the discovery order (best links first)
+        for task, link in zip(tasks, links):
+            if task in done and task.exception() is None:
+                if task.result() and task.result()[1]:
+                    pages.append(task.result())
+            elif task in done:
+                logger.info("Crawler skipped %s: %s", link, task.exception())
+        return pages
+
+
+@timed("fetch")
+def crawl_site(url: str, max_pages: int = CRAWL_MAX_PAGES, max_bytes: int = CRAWL_MAX_BYTES,
+               timeout: float = CRAWL_TIMEOUT):
+    """
+    Fetch a site's home page and its most telling pages (About, Services,
+    Menu, ...). The other pages are fetched concurrently, so a crawl takes
+    about two request round trips however many pages it reads.
+
+    Pages disallowed by robots.txt are skipped. Failed or slow pages other
+    than the home page are dropped. Concurrent crawls of the same URL with
+    the same limits share one crawl (and its result list, which callers
+    must not modify).
+
+    Args:
+        url (str): Home page.
+        max_pages (int): Pages to fetch, the home page included.
+        max_bytes (int): Bytes to read over all pages.
+        timeout (float): Seconds for the whole crawl; less if the request's
+            deadline is closer.
+
+    Returns:
+        list[tuple[str, str]]: (url, html) pairs, home page first.
+
+    Raises:
+        Exception: If the home page cannot be fetched.
+    """
+    timeout = call_timeout(timeout, "Crawl")
+    key = f"{normalize_url(url)} {max_pages} {max_bytes}"
+    return crawl_flight.do(key, lambda: asyncio.run(_crawl(url, max_pages, max_bytes, timeout)))
+
+
+def merge_site_content(pages):
+    """
+    Extract and merge the visible text of crawled pages.
+
+    Args:
+        pages (list[tuple[str, str]]): (url, html) pairs, home page first.
+
+    Returns:
+        tuple[str, str]: (home page title, merged visible text)
+    """
+    title, texts = "", []
+    for i, (_, html) in enumerate(pages):
+        page_title, text = extract_page_content(html, text_budget=DEFAULT_TEXT_BUDGET if i == 0 else SUBPAGE_TEXT_BUDGET)
+        if i == 0:
+            title = page_title
+        if text:
+            texts.append(text)
+    return title, "\n".join(texts)
@@ -0,0 +1,103 @@
+import time
+import contextvars
+from contextlib import contextmanager
+
+import requests
+from urllib3.exceptions import TimeoutError as URLLibTimeout
+
+# time.monotonic() by which the current request must be answered, if any.
+# Thread pools and jobs that copy the caller's context inherit it.
+_deadline = contextvars.ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """
+    Raised when the current deadline has passed, or when work cannot be
+    started because it could not finish in the time left.
+    """
+
+
+@contextmanager
+def deadline(seconds):
+    """
+    Run the enclosed block with a deadline `seconds` from now. A deadline
+    already in effect wins when it is earlier. None runs without one.
+    """
+    current = _deadline.get()
+    if seconds is None:
+        at = current
+    else:
+        at = time.monotonic() + seconds
+        at = at if current is None else min(current, at)
+    token = _deadline.set(at)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def time_left():
+    """
+    Seconds left before the current deadline (0 once it has passed), or
+    None when there is no deadline.
+    """
+    at = _deadline.get()
+    if at is None:
+        return None
+    return max(0.0, at - time.monotonic())
+
+
+def has_time(seconds) -> bool:
+    """
+    Whether at least `seconds` are left (always True without a deadline).
+    """
+    left = time_left()
+    return left is None or left >= seconds
+
+
+def deadline_passed() -> bool:
+    """
+    Whether a deadline is set and has passed; errors raised then (e.g. an
+    upstream timeout shortened to fit) are the deadline's doing.
+    """
+    return time_left() == 0
+
+
+def call_timeout(limit, what="Request"):
+    """
+    Timeout for one blocking call: `limit`, or the time left if shorter.
+
+    Raises:
+        DeadlineExceeded: If the deadline has already passed.
+    """
+    left = time_left()
+    if left is None:
+        return limit
+    if left <= 0:
+        raise DeadlineExceeded(f"{what}: deadline exceeded")
+    return left if limit is None else min(limit, left)
+
+
+def check_deadline(what="Request"):
+    """
+    Raise DeadlineExceeded if the deadline has passed.
+    """
+    call_timeout(None, what)
+
+
+def is_timeout(error) -> bool:
+    """
+    Whether `error`, or an exception it was raised from, is a timeout:
+    DeadlineExceeded or another TimeoutError, a requests or urllib3
+    timeout, or an API client's APITimeoutError (Groq, OpenAI).
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, (TimeoutError, requests.Timeout, URLLibTimeout)):
+            return True
+        # Matched by name so the SDKs need not be imported here
+        if type(error).__name__ == "APITimeoutError":
+            return True
+        error = error.__cause__ or error.__context__
+    return False
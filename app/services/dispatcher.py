@@ -0,0 +1,309 @@
+import os
+import time
+import heapq
+import itertools
+import threading
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.schedule_store import DAY_ORDER, DEFAULT_TENANT, get_schedule_store
+from app.services.facebook import publish_to_facebook, load_fb_credentials
+from app.services.post_index import get_post_index, POST_DEDUPE, PUBLISHED
+
+# Posts whose time passed less than this long ago (e.g. during a restart)
+# are still published; older ones wait for next week
+CATCH_UP_SECONDS = int(os.getenv("DISPATCH_CATCH_UP_SECONDS", 15 * 60))
+# How often the heap is rebuilt from the store to pick up edits made by
+# other processes
+REFRESH_SECONDS = int(os.getenv("DISPATCH_REFRESH_SECONDS", 300))
+PUBLISH_WORKERS = int(os.getenv("DISPATCH_PUBLISH_WORKERS", 4))
+
+
+def parse_post_time(post_time: str):
+    """
+    Parse "HH:MM" into (hour, minute). Raises ValueError when invalid.
+    """
+    hour, _, minute = post_time.partition(":")
+    hour, minute = int(hour), int(minute or 0)
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        raise ValueError(f"Invalid post time '{post_time}', expected HH:MM")
+    return hour, minute
+
+
+def next_occurrence(day: str, post_time: str, timezone: str, after: float) -> float:
+    """
+    Epoch seconds of the first `day` at `post_time` (local time in
+    `timezone`) strictly after `after`.
+    """
+    tz = ZoneInfo(timezone)
+    hour, minute = parse_post_time(post_time)
+    local = datetime.fromtimestamp(after, tz)
+    days_ahead = (DAY_ORDER[day] - local.weekday()) % 7
+    candidate_date = local.date() + timedelta(days=days_ahead)
+    for week in range(3):
+        candidate = datetime(
+            candidate_date.year, candidate_date.month, candidate_date.day, hour, minute, tzinfo=tz
+        ) + timedelta(weeks=week)
+        if candidate.timestamp() > after:
+            return candidate.timestamp()
+    raise ValueError("Could not compute next occurrence")
+
+
+class SystemClock:
+    def now(self):
+        return time.time()
+
+
+class SimulatedClock:
+    """
+    Manually advanced clock for tests and dry runs. Use with
+    Dispatcher.run_until() instead of the background thread.
+    """
+
+    def __init__(self, start=None):
+        self.current = time.time() if start is None else start
+
+    def now(self):
+        return self.current
+
+    def advance(self, seconds):
+        self.current += seconds
+        return self.current
+
+
+def default_credentials(tenant):
+    """
+    Page id and token for a tenant, from the connected page credentials.
+    """
+    creds = load_fb_credentials()
+    page_id, token = creds.get("fb_page_id"), creds.get("access_token")
+    if page_id and token and tenant in (DEFAULT_TENANT, page_id):
+        return page_id, token
+    return None
+
+
+class Dispatcher:
+    """
+    Publishes scheduled posts when they are due.
+
+    Upcoming occurrences sit in a min-heap ordered by due time, so adding or
+    firing one costs O(log n) and the thread sleeps until exactly the next
+    due post (or until woken by a schedule change). Heap entries are checked
+    against the store when they fire, so edited or deleted posts are never
+    published from stale data. Each occurrence is claimed in the store's
+    publications table before publishing; a claim that already exists (after
+    a restart, or from another worker process) is skipped, so an occurrence
+    is published at most once.
+    """
+
+    def __init__(self, store=None, clock=None, publish=publish_to_facebook,
+                 credentials=default_credentials, publish_workers=PUBLISH_WORKERS):
+        self.store = store or get_schedule_store()
+        self.clock = clock or SystemClock()
+        self.publish = publish
+        self.credentials = credentials
+        self.publish_workers = publish_workers
+        self._heap = []
+        # (tenant, day, due_at) of every heap entry, so re-queuing a tenant
+        # never creates duplicates
+        self._queued = set()
+        self._seq = itertools.count()
+        self._wakeup = threading.Condition()
+        self._thread = None
+        self._running = False
+        self._pool = None
+        self.published = 0
+        self.failed = 0
+
+    # --- heap management -------------------------------------------------
+
+    def _push(self, due_at, tenant, day):
+        key = (tenant, day, int(due_at))
+        if key not in self._queued:
+            self._queued.add(key)
+            heapq.heappush(self._heap, (due_at, next(self._seq), tenant, day))
+
+    def load(self):
+        """
+        Rebuild the heap from every scheduled post in the store.
+        """
+        after = self.clock.now() - CATCH_UP_SECONDS
+        entries = []
+        for tenant, day, post_time, timezone in self.store.iter_timed_posts():
+            try:
+                entries.append((next_occurrence(day, post_time, timezone, after), next(self._seq), tenant, day))
+            except (ValueError, KeyError):
+                continue
+        heapq.heapify(entries)
+        with self._wakeup:
+            self._heap = entries
+            self._queued = {(tenant, day, int(due_at)) for due_at, _, tenant, day in entries}
+            self._wakeup.notify()
+
+    def schedule_tenant(self, tenant):
+        """
+        Queue a tenant's posts after its schedule changed. Entries that no
+        longer match the store are dropped when they come due.
+        """
+        after = self.clock.now()
+        with self._wakeup:
+            for _, day, post_time, timezone in self.store.iter_timed_posts(tenant):
+                try:
+                    self._push(next_occurrence(day, post_time, timezone, after), tenant, day)
+                except (ValueError, KeyError):
+                    continue
+            self._wakeup.notify()
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    @property
+    def pending(self):
+        return len(self._heap)
+
+    def next_due(self):
+        with self._wakeup:
+            return self._heap[0][0] if self._heap else None
+
+    # --- firing ----------------------------------------------------------
+
+    def _pop_due(self, now):
+        with self._wakeup:
+            if self._heap and self._heap[0][0] <= now:
+                entry = heapq.heappop(self._heap)
+                self._queued.discard((entry[2], entry[3], int(entry[0])))
+                return entry
+        return None
+
+    def _fire(self, due_at, tenant, day):
+        post = self.store.timed_post(tenant, day)
+        if post is None:
+            return None
+        content, post_time, timezone = post
+        try:
+            expected = next_occurrence(day, post_time, timezone, due_at - 1)
+        except (ValueError, KeyError):
+            return None
+        if int(expected) != int(due_at):
+            # Time changed since this entry was queued; a newer entry exists
+            return None
+
+        # Always queue next week's occurrence, whatever happens to this one
+        with self._wakeup:
+            self._push(next_occurrence(day, post_time, timezone, due_at), tenant, day)
+
+        if not self.store.claim_publication(tenant, day, due_at):
+            return None
+
+        creds = self.credentials(tenant)
+        if not creds:
+            self.store.finish_publication(tenant, day, due_at, "failed", error="Facebook page not connected")
+            self.failed += 1
+            return "failed"
+        try:
+            result = self.publish(content, creds[0], creds[1])
+            self.store.finish_publication(tenant, day, due_at, "published", post_id=result.get("post_id"))
+        except Exception as e:
+            self.store.finish_publication(tenant, day, due_at, "failed", error=str(e))
+            self.failed += 1
+            return "failed"
+        self.published += 1
+        if POST_DEDUPE:
+            get_post_index().add(tenant, [content], PUBLISHED)
+        return "published"
+
+    def run_pending(self):
+        """
+        Publish everything due at the clock's current time. Returns the
+        number of occurrences handled.
+        """
+        handled = 0
+        while True:
+            entry = self._pop_due(self.clock.now())
+            if entry is None:
+                return handled
+            due_at, _, tenant, day = entry
+            if self._pool:
+                self._pool.submit(self._fire, due_at, tenant, day)
+            else:
+                self._fire(due_at, tenant, day)
+            handled += 1
+
+    def run_until(self, until):
+        """
+        Simulated-clock mode: step the clock from due time to due time up to
+        `until`, publishing synchronously. Returns the number handled.
+        """
+        handled = 0
+        while True:
+            due = self.next_due()
+            if due is None or due > until:
+                break
+            if due > self.clock.now():
+                self.clock.current = due
+            handled += self.run_pending()
+        self.clock.current = max(self.clock.now(), until)
+        return handled
+
+    # --- background thread -------------------------------------------------
+
+    def start(self):
+        if self._thread:
+            return
+        self._running = True
+        self._pool = ThreadPoolExecutor(max_workers=self.publish_workers, thread_name_prefix="publish")
+        self.load()
+        self._thread = threading.Thread(target=self._loop, name="post-dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._wakeup:
+            self._running = False
+            self._wakeup.notify()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        if self._pool:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def _loop(self):
+        next_refresh = self.clock.now() + REFRESH_SECONDS
+        while self._running:
+            self.run_pending()
+            now = self.clock.now()
+            if now >= next_refresh:
+                self.load()
+                next_refresh = now + REFRESH_SECONDS
+            with self._wakeup:
+                if not self._running:
+                    break
+                due = self._heap[0][0] if self._heap else next_refresh
+                self._wakeup.wait(max(0.0, min(due, next_refresh) - self.clock.now()))
+
+    def stats(self):
+        return {
+            "running": self.running,
+            "pending": self.pending,
+            "next_due": self.next_due(),
+            "published": self.published,
+            "failed": self.failed,
+        }
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher():
+    """
+    Process-wide Dispatcher (not started until start() is called).
+    """
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                _dispatcher = Dispatcher()
+    return _dispatcher
@@ -1,8 +1,12 @@
 import os
 import json
-import requests
+
+from app.services.instrumentation import timed
 
 FB_CREDENTIALS_FILE = "fb_credentials.json"
+# "mock" returns fake post ids; "live" publishes through the Graph API.
+# Pointing GRAPH_API_URL somewhere (e.g. the local stand-in) implies live.
+FB_PUBLISH_MODE = os.getenv("FB_PUBLISH_MODE") or ("live" if os.getenv("GRAPH_API_URL") else "mock")
 
 def connect_facebook_page():
     """
@@ -32,11 +36,19 @@ def load_fb_credentials():
             return json.load(f)
     return {}
 
+@timed("publish")
 def publish_to_facebook(post_message: str, fb_page_id: str, access_token: str):
     """
-    Publish a message to the Facebook Page (mocked).
+    Publish a message to the Facebook Page.
+    Mocked unless FB_PUBLISH_MODE is "live"; live posts go through the
+    batching, rate-limited publisher in fb_publisher.
     Returns a structure with post_id and post_link.
     """
+    if FB_PUBLISH_MODE == "live":
+        from app.services.fb_publisher import get_publisher
+        result = get_publisher().publish(post_message, fb_page_id, access_token)
+        return {"success": True, **result}
+
     post_id = f"mock_post_{abs(hash(post_message)) % 1_000_000}"
     post_link = f"https://facebook.com/{fb_page_id}/posts/{post_id}"
     return {
@@ -44,11 +56,3 @@ def publish_to_facebook(post_message: str, fb_page_id: str, access_token: str):
         "post_id": post_id,
         "post_link": post_link
     }
-
-    # ---- Uncomment for actual Facebook API integration ----
-    # url = f"https://graph.facebook.com/{fb_page_id}/feed"
-    # payload = {"message": post_message, "access_token": access_token}
-    # resp = requests.post(url, data=payload)
-    # resp.raise_for_status()
-    # data = resp.json()
-    # return {"success": True, "post_id": data["id"], "post_link": data["id"]}
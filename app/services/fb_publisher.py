@@ -0,0 +1,424 @@
+import os
+import json
+import time
+import random
+import logging
+import threading
+from urllib.parse import urlencode
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+from app.services.deadline import call_timeout
+
+logger = logging.getLogger(__name__)
+
+GRAPH_API_URL = os.getenv("GRAPH_API_URL", "https://graph.facebook.com/v19.0")
+# Graph API accepts at most 50 operations per batch request
+MAX_BATCH_SIZE = 50
+# How long the batcher waits for more posts before sending a partial batch
+BATCH_WINDOW_SECONDS = float(os.getenv("FB_BATCH_WINDOW_MS", 50)) / 1000
+# Steady-state request budgets (calls per second)
+APP_RATE = float(os.getenv("FB_APP_RATE", 50))
+PAGE_RATE = float(os.getenv("FB_PAGE_RATE", 2))
+MAX_RETRIES = int(os.getenv("FB_MAX_RETRIES", 5))
+# Seconds a caller waits for its post (less under a shorter request deadline)
+PUBLISH_TIMEOUT = float(os.getenv("FB_PUBLISH_TIMEOUT", 300))
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_CAP_SECONDS = 30
+# Start slowing down once Graph reports this much of a quota used (percent)
+USAGE_SLOWDOWN_THRESHOLD = 75
+# Graph error codes that mean "throttled, retry later". Posting is not
+# idempotent, so only these (the call was refused, not run) are retried;
+# server errors may come after the post was made.
+RETRYABLE_ERROR_CODES = {4, 17, 32, 341, 613, 80001}
+
+
+class PublishError(Exception):
+    def __init__(self, message, code=None, retryable=False):
+        super().__init__(message)
+        self.code = code
+        self.retryable = retryable
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter. `rate` tokens are added per second up to
+    `capacity`; take() blocks until enough tokens are available. The rate
+    can be lowered at runtime, and the bucket can be paused until a time.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.base_rate = rate
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.paused_until = 0.0
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, n=1):
+        n = min(n, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.paused_until and self.tokens >= n:
+                    self.tokens -= n
+                    return
+                wait = max(self.paused_until - now, (n - self.tokens) / self.rate)
+            time.sleep(min(wait, 1.0))
+
+    def try_take(self, n=1):
+        """
+        Take `n` tokens without blocking. Returns 0 on success, otherwise
+        the number of seconds until they would be available.
+        """
+        n = min(n, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now >= self.paused_until and self.tokens >= n:
+                self.tokens -= n
+                return 0
+            return max(self.paused_until - now, (n - self.tokens) / self.rate)
+
+    def set_usage(self, percent):
+        """
+        Scale the rate down as reported quota usage approaches 100%.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            if percent <= USAGE_SLOWDOWN_THRESHOLD:
+                self.rate = self.base_rate
+            else:
+                headroom = max(0.0, 100 - percent) / (100 - USAGE_SLOWDOWN_THRESHOLD)
+                self.rate = max(self.base_rate * 0.05, self.base_rate * headroom)
+
+    def pause(self, seconds):
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+
+def backoff_delay(attempt):
+    """
+    Exponential backoff with full jitter.
+    """
+    return random.uniform(0, min(BACKOFF_CAP_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt)))
+
+
+def _max_usage(header_value):
+    """
+    Highest percentage found in an X-App-Usage / X-Page-Usage /
+    X-Business-Use-Case-Usage header, plus any regain-access wait (seconds).
+    """
+    try:
+        data = json.loads(header_value)
+    except (TypeError, ValueError):
+        return 0, 0
+    entries = []
+    if isinstance(data, dict) and any(isinstance(v, list) for v in data.values()):
+        for value in data.values():
+            entries.extend(value if isinstance(value, list) else [])
+    else:
+        entries.append(data)
+
+    percent, wait = 0, 0
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        for key in ("call_count", "total_cputime", "total_time"):
+            percent = max(percent, float(entry.get(key) or 0))
+        wait = max(wait, float(entry.get("estimated_time_to_regain_access") or 0) * 60)
+    return percent, wait
+
+
+class FacebookPublisher:
+    """
+    Publishes page posts through the Graph API.
+
+    Posts submitted from any thread are collected for up to
+    BATCH_WINDOW_SECONDS and sent as Graph batch requests of up to 50
+    operations over one pooled session. Requests pass through an app-wide
+    and a per-page token bucket whose rates follow the usage headers Graph
+    returns. Throttling errors and transient failures are retried with
+    jittered exponential backoff; operations are retried individually, so
+    one throttled page does not hold back a whole batch. Only operations
+    Graph certainly did not run are retried (see RETRYABLE_ERROR_CODES),
+    so a post is never made twice; the others fail.
+    """
+
+    def __init__(self, base_url=GRAPH_API_URL, app_rate=APP_RATE, page_rate=PAGE_RATE,
+                 max_retries=MAX_RETRIES, batch_window=BATCH_WINDOW_SECONDS):
+        self.base_url = base_url.rstrip("/")
+        self.page_rate = page_rate
+        self.max_retries = max_retries
+        self.batch_window = batch_window
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_maxsize=16))
+        self.session.mount("http://", HTTPAdapter(pool_maxsize=16))
+        self.app_bucket = TokenBucket(app_rate)
+        self._page_buckets = {}
+        self._pending = []
+        self._pending_lock = threading.Condition()
+        self._flusher = None
+        self.stats = {"requests": 0, "published": 0, "failed": 0, "retries": 0, "throttled": 0}
+
+    def _page_bucket(self, page_id):
+        bucket = self._page_buckets.get(page_id)
+        if bucket is None:
+            bucket = self._page_buckets.setdefault(page_id, TokenBucket(self.page_rate))
+        return bucket
+
+    # --- public API --------------------------------------------------------
+
+    def submit(self, message, page_id, access_token) -> Future:
+        """
+        Queue one post for the next batch. The Future resolves to
+        {"post_id", "post_link"} or raises PublishError.
+        """
+        future = Future()
+        with self._pending_lock:
+            self._pending.append({"message": message, "page_id": page_id,
+                                  "token": access_token, "future": future, "attempt": 0})
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(target=self._flush_loop, name="fb-batcher", daemon=True)
+                self._flusher.start()
+            self._pending_lock.notify()
+        return future
+
+    def _result(self, future, timeout):
+        try:
+            return future.result(timeout=max(0.0, timeout))
+        except FutureTimeout:
+            # A post not yet sent is withdrawn; one in flight may still appear
+            if future.cancel():
+                raise PublishError("Timed out waiting to publish; the post was not sent") from None
+            raise PublishError("Timed out waiting for the Graph API; the post may still be published") from None
+
+    def publish(self, message, page_id, access_token):
+        """
+        Publish one post and wait for it, at most PUBLISH_TIMEOUT seconds
+        or until the current deadline. Returns {"post_id", "post_link"}.
+
+        Raises:
+            PublishError: If Graph rejected the post or it timed out.
+        """
+        timeout = call_timeout(PUBLISH_TIMEOUT, "Publish")
+        return self._result(self.submit(message, page_id, access_token), timeout)
+
+    def publish_many(self, posts):
+        """
+        Publish [(message, page_id, token), ...]. Returns one result per post
+        in order: {"success": True, ...} or {"success": False, "error": ...}.
+        All posts share one PUBLISH_TIMEOUT (or the current deadline).
+        """
+        until = time.monotonic() + call_timeout(PUBLISH_TIMEOUT, "Publish")
+        futures = [self.submit(*post) for post in posts]
+        results = []
+        for future in futures:
+            try:
+                results.append(dict(success=True, **self._result(future, until - time.monotonic())))
+            except Exception as e:
+                results.append({"success": False, "error": str(e)})
+        return results
+
+    # --- batching ----------------------------------------------------------
+
+    def _next_batch(self):
+        """
+        Wait for the next batch of up to MAX_BATCH_SIZE operations whose
+        pages have budget, and mark their futures running.
+        """
+        with self._pending_lock:
+            while True:
+                while not self._pending:
+                    self._pending_lock.wait()
+                # Give concurrent submitters a moment to join this batch
+                deadline = time.monotonic() + self.batch_window
+                while len(self._pending) < MAX_BATCH_SIZE and time.monotonic() < deadline:
+                    self._pending_lock.wait(deadline - time.monotonic())
+                # Drop posts whose callers gave up (cancelled futures)
+                self._pending = [op for op in self._pending if not op["future"].done()]
+                batch, now = [], time.monotonic()
+                for op in self._pending:
+                    if len(batch) == MAX_BATCH_SIZE:
+                        break
+                    if op.get("not_before", 0) > now:
+                        continue
+                    # A page that is out of budget only delays its own posts
+                    wait = self._page_bucket(op["page_id"]).try_take()
+                    if wait:
+                        op["not_before"] = now + wait
+                    else:
+                        batch.append(op)
+                taken = {id(op) for op in batch}
+                self._pending = [op for op in self._pending if id(op) not in taken]
+                # From here on a caller timing out can no longer withdraw the post
+                batch = [op for op in batch
+                         if op["future"].running() or op["future"].set_running_or_notify_cancel()]
+                if batch:
+                    return batch
+                if self._pending:
+                    wait = min(op.get("not_before", 0) for op in self._pending) - time.monotonic()
+                    self._pending_lock.wait(max(0.001, wait))
+
+    def _flush_loop(self):
+        batch = []
+        try:
+            while True:
+                batch = self._next_batch()
+                try:
+                    self._send_batch(batch)
+                except Exception as e:
+                    # The batch may have run; failing is safer than posting twice
+                    logger.exception("Graph batch failed")
+                    for op in batch:
+                        self._retry_or_fail(op, PublishError(f"Batch failed: {e}"))
+        except BaseException as e:
+            logger.exception("Facebook publisher stopped")
+            # Nothing would ever resolve what is queued; submit() starts a new flusher
+            with self._pending_lock:
+                pending, self._pending = self._pending, []
+            for op in batch + pending:
+                self._retry_or_fail(op, PublishError(f"Publisher stopped: {e}"))
+            raise
+
+    def _retry_or_fail(self, op, error):
+        if op["future"].done():
+            # Already resolved (or withdrawn by its caller)
+            return
+        if error.retryable and op["attempt"] < self.max_retries:
+            op["attempt"] += 1
+            op["not_before"] = time.monotonic() + backoff_delay(op["attempt"])
+            self.stats["retries"] += 1
+            with self._pending_lock:
+                self._pending.append(op)
+                self._pending_lock.notify()
+        else:
+            self.stats["failed"] += 1
+            op["future"].set_exception(error)
+
+    def _apply_usage(self, headers, page_ids):
+        percent, wait = _max_usage(headers.get("X-App-Usage"))
+        self.app_bucket.set_usage(percent)
+        if wait:
+            self.app_bucket.pause(wait)
+        for name in ("X-Page-Usage", "X-Business-Use-Case-Usage"):
+            percent, wait = _max_usage(headers.get(name))
+            for page_id in page_ids:
+                bucket = self._page_bucket(page_id)
+                bucket.set_usage(percent)
+                if wait:
+                    bucket.pause(wait)
+
+    def _send_batch(self, batch):
+        # Every operation in a batch counts as a call against the app quota
+        self.app_bucket.take(len(batch))
+
+        operations = [{
+            "method": "POST",
+            "relative_url": f"{op['page_id']}/feed",
+            "body": urlencode({"message": op["message"], "access_token": op["token"]}),
+        } for op in batch]
+        self.stats["requests"] += 1
+        try:
+            response = self.session.post(
+                f"{self.base_url}/",
+                data={"access_token": batch[0]["token"], "batch": json.dumps(operations)},
+                timeout=(5, 60),
+            )
+        except requests.RequestException as e:
+            # Only a connection that was never made means nothing was posted
+            error = PublishError(f"Graph API request failed: {e}", retryable=_not_sent(e))
+            for op in batch:
+                self._retry_or_fail(op, error)
+            return
+        self._apply_usage(response.headers, {op["page_id"] for op in batch})
+
+        if response.status_code == 429:
+            self.stats["throttled"] += 1
+            for op in batch:
+                self._retry_or_fail(op, PublishError("Graph API returned 429", retryable=True))
+            return
+        if response.status_code != 200:
+            error = self._graph_error(response.status_code, response.text)
+            for op in batch:
+                self._retry_or_fail(op, error)
+            return
+
+        items = response.json()
+        for i, op in enumerate(batch):
+            try:
+                if i >= len(items):
+                    raise ValueError("missing from the batch response")
+                self._handle_item(op, items[i])
+            except Exception as e:
+                logger.warning("Unreadable result for a post to page %s: %s", op["page_id"], e)
+                self._retry_or_fail(op, PublishError(f"Unreadable Graph API response: {e}"))
+
+    def _handle_item(self, op, item):
+        if item is None:
+            # Graph did not get to this operation (batch timeout); retry it
+            return self._retry_or_fail(op, PublishError("Batch operation not processed", retryable=True))
+
+        headers = {h["name"]: h["value"] for h in item.get("headers") or []}
+        if headers:
+            self._apply_usage(headers, {op["page_id"]})
+        if item.get("code") == 200:
+            # Published, whatever the body says; never retry it
+            try:
+                post_id = json.loads(item.get("body") or "{}").get("id")
+            except (ValueError, AttributeError):
+                logger.warning("Published to page %s, but the response has no post id", op["page_id"])
+                post_id = None
+            self.stats["published"] += 1
+            op["future"].set_result({
+                "post_id": post_id,
+                "post_link": f"https://facebook.com/{post_id}" if post_id else None,
+            })
+            return
+        error = self._graph_error(item.get("code"), item.get("body"))
+        if error.retryable:
+            self.stats["throttled"] += 1
+        self._retry_or_fail(op, error)
+
+    def _graph_error(self, status, body):
+        try:
+            error = json.loads(body or "{}").get("error", {})
+        except (TypeError, ValueError, AttributeError):
+            error = {}
+        code = error.get("code")
+        retryable = code in RETRYABLE_ERROR_CODES or status == 429
+        return PublishError(error.get("message") or f"Graph API error {status}", code=code, retryable=retryable)
+
+
+def _not_sent(error):
+    """
+    Whether a failed request certainly never reached the server: the
+    connection could not be opened.
+    """
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(error, requests.ConnectionError) and isinstance(reason, NewConnectionError)
+
+
+_publisher = None
+_publisher_lock = threading.Lock()
+
+
+def get_publisher():
+    global _publisher
+    if _publisher is None:
+        with _publisher_lock:
+            if _publisher is None:
+                _publisher = FacebookPublisher()
+    return _publisher
@@ -1,31 +1,62 @@
 import os
 import re
+import json
+import hashlib
 import requests
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 
-# Load GROQ API key from environment
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-if not GROQ_API_KEY:
-    raise ValueError("GROQ_API_KEY must be set in your environment.")
+from app.services.cache import TTLCache, make_backend
+from app.services.llm_gateway import get_gateway, get_api_key, INTERACTIVE, BULK, LLM_TIMEOUT
+from app.services.deadline import call_timeout, is_timeout
+from app.services.post_index import get_post_index, POST_DEDUPE
 
-# GROQ API endpoint and model
-GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
+# GROQ API endpoint and model (any OpenAI-compatible endpoint works, e.g. the
+# local stub in benchmarks/stubs/llm_stub.py)
+GROQ_API_URL = os.getenv("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions")
 MODEL = "llama-3.1-8b-instant"
 
+# Opt-in cache of raw completions per prompt. 0 disables it; N > 0 keeps up
+# to N different completions per prompt and rotates through them once all N
+# have been generated, so "regenerate" still shows varied output. Unused
+# when posts are deduplicated against a tenant's history: a cached variant
+# repeats posts already in it, and would only be rejected and regenerated.
+GENERATION_CACHE_VARIANTS = int(os.getenv("GENERATION_CACHE_VARIANTS", 0))
 
-def generate_social_media_posts(business_profile, news, preferences, count=5):
-    """
-    Generates a list of ready-to-publish social media post captions.
+completion_cache = TTLCache(
+    backend=make_backend(
+        os.getenv("GENERATION_CACHE_BACKEND", "memory"),
+        path=os.getenv(
+            "GENERATION_CACHE_PATH",
+            os.path.join(os.path.dirname(__file__), "../storage/completion_cache.sqlite3")
+        ),
+        table="completions",
+    ),
+    ttl=int(os.getenv("GENERATION_CACHE_TTL", 24 * 3600)),
+    max_entries=int(os.getenv("GENERATION_CACHE_MAX_ENTRIES", 5000)),
+)
 
-    Args:
-        business_profile (dict): Should include keys like 'name', 'industry', etc.
-        news (list): List of trending news headlines or topics (strings).
-        preferences (dict): Dict with 'tone' (str), 'post_type' (str).
-        count (int): Number of posts to generate.
+# Extra LLM round trips allowed to replace posts that repeat a tenant's history
+DEDUPE_MAX_ROUNDS = int(os.getenv("DEDUPE_MAX_ROUNDS", 2))
+# Rejected posts quoted back to the model so it steers away from them
+AVOID_EXAMPLES = 5
 
-    Returns:
-        list of post strings.
-    """
+# Concurrency for bulk generation; also sizes the keep-alive connection pool
+BULK_MAX_WORKERS = int(os.getenv("GENERATION_BULK_WORKERS", 8))
+
+# One shared session so calls reuse TCP/TLS connections instead of opening
+# a new one per request
+session = requests.Session()
+session.mount("https://", HTTPAdapter(pool_maxsize=BULK_MAX_WORKERS))
+session.mount("http://", HTTPAdapter(pool_maxsize=BULK_MAX_WORKERS))
 
+
+def build_post_payload(business_profile, news, preferences, count=5, avoid=None):
+    """
+    Build the chat-completions payload for a post generation request.
+    `avoid` lists earlier posts the model should not repeat.
+    """
     name = business_profile.get("name", "Your Business")
     industry = business_profile.get("industry", "your industry")
     tone = preferences.get("tone", "informative").lower()
@@ -52,8 +83,13 @@ def generate_social_media_posts(business_profile, news, preferences, count=5):
         "Avoid emojis, markdown symbols like **, and any unicode escape characters. "
         "Return plain text only. Number each post or separate posts by newlines."
     )
+    if avoid:
+        prompt_intro += (
+            " Do not repeat or closely paraphrase these earlier posts: "
+            + " | ".join(avoid[:AVOID_EXAMPLES])
+        )
 
-    payload = {
+    return {
         "model": MODEL,
         "messages": [
             {"role": "system", "content": "You're a helpful assistant that writes catchy social media content."},
@@ -62,24 +98,325 @@ def generate_social_media_posts(business_profile, news, preferences, count=5):
         "temperature": 0.6,
     }
 
-    headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-        "Content-Type": "application/json",
-    }
 
-    response = requests.post(GROQ_API_URL, json=payload, headers=headers)
-    response.raise_for_status()
-    raw_output = response.json()["choices"][0]["message"]["content"]
+# Posts are separated by newlines, optionally followed by "1." / "-" / "•" markers
+POST_SEPARATOR = re.compile(r'\n\d+\.\s*|\n-\s*|\n•\s*|\n')
 
-    # Clean and split generated posts
-    split_posts = re.split(r'\n\d+\.\s*|\n-\s*|\n•\s*|\n', raw_output)
+
+def clean_post(post):
+    """
+    Strip markdown, unicode escapes and non-printable characters from a post.
+    """
+    clean = post.strip()
+    clean = re.sub(r"\*+", "", clean)
+    clean = re.sub(r"\\u[\da-fA-F]{4}", "", clean)
+    clean = re.sub(r"[^\x20-\x7E#]", "", clean)
+    return clean
+
+
+def split_posts(raw_output, count):
+    """
+    Clean and split a raw completion into at most `count` posts.
+    """
+    split_posts = POST_SEPARATOR.split(raw_output)
     cleaned_posts = []
     for post in split_posts:
-        clean = post.strip()
-        clean = re.sub(r"\*+", "", clean)
-        clean = re.sub(r"\\u[\da-fA-F]{4}", "", clean)
-        clean = re.sub(r"[^\x20-\x7E#]", "", clean)
+        clean = clean_post(post)
         if clean:
             cleaned_posts.append(clean)
 
     return cleaned_posts[:count]
+
+
+class PostSplitter:
+    """
+    Incremental version of split_posts for streamed completions.
+
+    Text is fed as it arrives; a post is emitted as soon as the separator
+    that ends it has been received. The last separator in the buffer (which
+    may still grow with the next chunk) is kept back with the text after it,
+    so the posts produced are the same as split_posts on the full text.
+    """
+
+    def __init__(self, count):
+        self.count = count
+        self.emitted = 0
+        self._buffer = ""
+
+    @property
+    def done(self):
+        return self.emitted >= self.count
+
+    def _emit(self, text):
+        posts = []
+        for post in POST_SEPARATOR.split(text):
+            clean = clean_post(post)
+            if clean and not self.done:
+                posts.append(clean)
+                self.emitted += 1
+        return posts
+
+    def feed(self, text):
+        self._buffer += text
+        cut = 0
+        for match in POST_SEPARATOR.finditer(self._buffer):
+            cut = match.start()
+        if cut == 0:
+            return []
+        complete, self._buffer = self._buffer[:cut], self._buffer[cut:]
+        return self._emit(complete)
+
+    def close(self):
+        text, self._buffer = self._buffer, ""
+        return self._emit(text)
+
+
+def completion_cache_key(payload):
+    """
+    Hash of the canonical (key-sorted) JSON form of a completion payload.
+    """
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def cached_completion(payload):
+    """
+    Return a cached raw completion for `payload`, or None when a new one
+    should be generated (cache disabled, or fewer than N variants stored).
+    """
+    if GENERATION_CACHE_VARIANTS <= 0:
+        return None
+    key = completion_cache_key(payload)
+    entry = completion_cache.get(key)
+    if not entry or len(entry["completions"]) < GENERATION_CACHE_VARIANTS:
+        return None
+    raw_output = entry["completions"][entry["served"] % len(entry["completions"])]
+    entry["served"] += 1
+    completion_cache.set(key, entry)
+    return raw_output
+
+
+def remember_completion(payload, raw_output):
+    """
+    Add a freshly generated completion to the prompt's variants.
+    """
+    if GENERATION_CACHE_VARIANTS <= 0:
+        return
+    key = completion_cache_key(payload)
+    entry = completion_cache.get(key) or {"completions": [], "served": 0}
+    if len(entry["completions"]) < GENERATION_CACHE_VARIANTS:
+        entry["completions"].append(raw_output)
+        completion_cache.set(key, entry)
+
+
+def expected_completion_tokens(count):
+    """
+    Rough completion size of `count` posts, for the gateway's token budget.
+    """
+    return 80 * count
+
+
+def post_completion(payload, priority=INTERACTIVE, stream=False, completion_tokens=None):
+    """
+    Send a chat-completions request through the LLM gateway.
+
+    Returns the parsed JSON body, or with stream=True the open streaming
+    response (use it as a context manager).
+    """
+    headers = {
+        "Authorization": f"Bearer {get_api_key()}",
+        "Content-Type": "application/json",
+    }
+
+    def send():
+        response = session.post(
+            GROQ_API_URL, json=dict(payload, stream=True) if stream else payload,
+            headers=headers, stream=stream, timeout=call_timeout(LLM_TIMEOUT, "Post generation"),
+        )
+        if not response.ok:
+            response.close()
+        response.raise_for_status()
+        return response if stream else response.json()
+
+    return get_gateway().call(
+        send,
+        payload["messages"],
+        priority=priority,
+        completion_tokens=completion_tokens or expected_completion_tokens(5),
+        usage=None if stream else (lambda body: body["usage"]["total_tokens"]),
+    )
+
+
+def _complete_posts(business_profile, news, preferences, count, priority, avoid=None, use_cache=True):
+    payload = build_post_payload(business_profile, news, preferences, count, avoid)
+    raw_output = cached_completion(payload) if use_cache else None
+    if raw_output is not None:
+        return split_posts(raw_output, count)
+
+    body = post_completion(payload, priority, completion_tokens=expected_completion_tokens(count))
+    raw_output = body["choices"][0]["message"]["content"]
+    if use_cache:
+        remember_completion(payload, raw_output)
+
+    # Clean and split generated posts
+    return split_posts(raw_output, count)
+
+
+def _top_up(business_profile, news, preferences, count, priority, tenant, accepted, rejected):
+    """
+    Ask the model for the posts still missing after near-duplicates were
+    dropped, recording the new ones in the tenant's history. Returns the
+    additional posts.
+    """
+    index = get_post_index()
+    added = []
+    for _ in range(DEDUPE_MAX_ROUNDS):
+        missing = count - len(accepted) - len(added)
+        if missing <= 0:
+            break
+        # Replacements must differ from the rejected posts, so no cache here
+        batch = _complete_posts(business_profile, news, preferences, missing, priority,
+                                avoid=rejected, use_cache=False)
+        fresh, repeated = index.filter_new(tenant, batch)
+        index.add(tenant, fresh)
+        added.extend(fresh)
+        rejected.extend(repeated)
+    return added
+
+
+def generate_social_media_posts(business_profile, news, preferences, count=5, priority=INTERACTIVE,
+                                tenant=None):
+    """
+    Generates a list of ready-to-publish social media post captions.
+
+    Args:
+        business_profile (dict): Should include keys like 'name', 'industry', etc.
+        news (list): List of trending news headlines or topics (strings).
+        preferences (dict): Dict with 'tone' (str), 'post_type' (str).
+        count (int): Number of posts to generate.
+        priority (int): LLM gateway priority, INTERACTIVE or BULK.
+        tenant (str): Optional page id. Posts that nearly repeat the page's
+            earlier posts are dropped and only the shortfall is requested
+            again (up to DEDUPE_MAX_ROUNDS times); new posts are added to
+            its history. The completion cache is not used then.
+
+    Returns:
+        list of post strings.
+    """
+    if tenant is None or not POST_DEDUPE:
+        return _complete_posts(business_profile, news, preferences, count, priority)
+
+    index = get_post_index()
+    posts = _complete_posts(business_profile, news, preferences, count, priority, use_cache=False)
+    accepted, rejected = index.filter_new(tenant, posts)
+    index.add(tenant, accepted)
+    return accepted + _top_up(business_profile, news, preferences, count, priority, tenant, accepted, rejected)
+
+
+def _iter_stream_deltas(response):
+    """
+    Yield content deltas from an OpenAI-compatible server-sent event stream.
+    """
+    for line in response.iter_lines(decode_unicode=True):
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            break
+        choices = json.loads(data).get("choices") or []
+        if choices:
+            delta = choices[0].get("delta", {}).get("content")
+            if delta:
+                yield delta
+
+
+def stream_social_media_posts(business_profile, news, preferences, count=5, priority=INTERACTIVE,
+                              tenant=None):
+    """
+    Streaming variant of generate_social_media_posts.
+
+    Uses the streaming chat-completions API and yields each cleaned post as
+    soon as it is complete, so callers can show the first post long before
+    the whole completion has been generated. With a tenant, repeated posts
+    are skipped and the shortfall is generated after the stream ends.
+    """
+    if tenant is None or not POST_DEDUPE:
+        yield from _stream_posts(business_profile, news, preferences, count, priority)
+        return
+
+    index = get_post_index()
+    accepted, rejected = [], []
+    for post in _stream_posts(business_profile, news, preferences, count, priority, use_cache=False):
+        fresh, repeated = index.filter_new(tenant, [post])
+        if fresh:
+            index.add(tenant, fresh)
+            accepted.append(post)
+            yield post
+        else:
+            rejected.extend(repeated)
+    yield from _top_up(business_profile, news, preferences, count, priority, tenant, accepted, rejected)
+
+
+def _stream_posts(business_profile, news, preferences, count, priority, use_cache=True):
+    payload = build_post_payload(business_profile, news, preferences, count)
+    raw_output = cached_completion(payload) if use_cache else None
+    if raw_output is not None:
+        yield from split_posts(raw_output, count)
+        return
+
+    received = []
+    response = post_completion(payload, priority, stream=True, completion_tokens=expected_completion_tokens(count))
+    with response:
+        splitter = PostSplitter(count)
+        for delta in _iter_stream_deltas(response):
+            received.append(delta)
+            yield from splitter.feed(delta)
+            if splitter.done:
+                # Enough posts; stop reading and let the connection close
+                break
+        else:
+            yield from splitter.close()
+    if use_cache:
+        remember_completion(payload, "".join(received))
+
+
+def generate_posts_bulk(jobs, max_workers=BULK_MAX_WORKERS):
+    """
+    Run many post generation jobs with bounded concurrency over the shared
+    keep-alive session. Jobs queue behind interactive requests in the LLM
+    gateway.
+
+    Args:
+        jobs (list of dict): Each job has 'business_profile', 'preferences'
+            and optionally 'news', 'count' and 'page_id' (the tenant), i.e.
+            the arguments of generate_social_media_posts.
+        max_workers (int): Maximum number of requests in flight.
+
+    Returns:
+        list of dict: One result per job, in job order. Each is either
+        {"posts": [...]} or {"error": "..."}; a failing job does not affect
+        the others. Jobs cut short by the caller's deadline also carry
+        "status": "timed_out".
+    """
+    def run(job):
+        try:
+            posts = generate_social_media_posts(
+                job["business_profile"],
+                job.get("news") or [],
+                job["preferences"],
+                int(job.get("count", 5)),
+                priority=BULK,
+                tenant=job.get("page_id"),
+            )
+            return {"posts": posts}
+        except Exception as e:
+            if is_timeout(e):
+                return {"error": str(e), "status": "timed_out"}
+            return {"error": str(e)}
+
+    if not jobs:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(jobs)))) as pool:
+        # Each job sees the caller's context (e.g. its request's deadline)
+        futures = [pool.submit(contextvars.copy_context().run, run, job) for job in jobs]
+        return [future.result() for future in futures]
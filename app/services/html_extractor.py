@@ -0,0 +1,165 @@
+from html.parser import HTMLParser
+
+from app.services.instrumentation import timed
+
+# Tags whose text we keep, same set extract_visible_content looks at
+TEXT_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6", "p", "ul", "ol", "li"}
+# Tags that end an open <p> when they start, as in browsers (which also
+# close <li> at the next <li> of the same list)
+P_CLOSERS = {
+    "address", "article", "aside", "blockquote", "details", "div", "dl", "fieldset", "figcaption",
+    "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "main", "menu",
+    "nav", "ol", "p", "pre", "section", "table", "ul",
+}
+LISTS = {"ul", "ol"}
+# Tags whose contents are never visible text
+SKIP_TAGS = {"script", "style", "noscript", "iframe", "template", "svg"}
+# Default amount of text to collect. The profile prompt builder picks the
+# most relevant part of it, so text far down the page can still be used.
+DEFAULT_TEXT_BUDGET = 60000
+# Size of the slices fed to the parser when given a whole document
+FEED_CHUNK_SIZE = 64 * 1024
+
+
+class _BudgetReached(Exception):
+    pass
+
+
+class PageExtractor(HTMLParser):
+    """
+    Incremental, single-pass extractor for a page's title and visible text.
+
+    Text is collected from headings, paragraphs and list items while script,
+    style and similar tags are skipped. Paragraphs and list items left
+    unclosed end where a browser would end them. No DOM is built: besides
+    the input, only the collected text is kept, and parsing stops as soon
+    as `text_budget` characters have been gathered.
+    """
+
+    def __init__(self, text_budget=DEFAULT_TEXT_BUDGET):
+        super().__init__(convert_charrefs=True)
+        self.text_budget = text_budget
+        self.title = ""
+        self.chunks = []
+        self.text_length = 0
+        self.done = False
+        self._in_title = False
+        self._title_parts = []
+        self._skip_depth = 0
+        # Open text tags, innermost last
+        self._open = []
+        self._current = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+        elif self._skip_depth:
+            return
+        elif tag == "title" and not self.title:
+            self._in_title = True
+        else:
+            if tag in P_CLOSERS:
+                self._close_implied("p")
+            if tag == "li":
+                self._close_implied("li")
+            if tag in TEXT_TAGS:
+                # A nested block (e.g. <li> inside <ul>) starts a new chunk, so list
+                # text is emitted once per item instead of once per level
+                self._flush()
+                self._open.append(tag)
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag == "title" and self._in_title:
+            self._in_title = False
+            self.title = "".join(self._title_parts).strip()
+        elif tag in TEXT_TAGS and tag in self._open:
+            # Also ends text tags left open inside it (e.g. </ul> ends its <li>s)
+            self._flush()
+            del self._open[len(self._open) - 1 - self._open[::-1].index(tag):]
+
+    def _close_implied(self, tag):
+        """
+        End the innermost open `tag` if the tag starting now implicitly
+        closes it: any <p>, but an <li> only within the same list.
+        """
+        for i in range(len(self._open) - 1, -1, -1):
+            if self._open[i] == tag:
+                self._flush()
+                del self._open[i:]
+                return
+            if tag == "li" and self._open[i] in LISTS:
+                return
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        if self._in_title:
+            self._title_parts.append(data)
+        elif self._open:
+            text = data.strip()
+            if text:
+                self._current.append(text)
+
+    def _flush(self):
+        if not self._current:
+            return
+        chunk = "".join(self._current)
+        self._current = []
+        self.chunks.append(chunk)
+        self.text_length += len(chunk) + 1
+        if self.text_length >= self.text_budget:
+            self.done = True
+            raise _BudgetReached()
+
+    def feed(self, data):
+        if self.done:
+            return
+        try:
+            super().feed(data)
+        except _BudgetReached:
+            pass
+
+    def close(self):
+        if not self.done:
+            try:
+                super().close()
+                self._flush()
+            except _BudgetReached:
+                pass
+        if self._in_title and not self.title:
+            self.title = "".join(self._title_parts).strip()
+
+    @property
+    def text(self):
+        return "\n".join(self.chunks)[:self.text_budget]
+
+
+@timed("parse")
+def extract_page_content(source, text_budget=DEFAULT_TEXT_BUDGET):
+    """
+    Extract the title and visible text of a page in one parsing pass.
+
+    Args:
+        source (str | Iterable[str]): Full HTML document, or an iterable of
+            HTML chunks (e.g. a streamed response body).
+        text_budget (int): Stop parsing once this many characters of text
+            have been collected.
+
+    Returns:
+        tuple[str, str]: (title, visible_text)
+    """
+    extractor = PageExtractor(text_budget=text_budget)
+    if isinstance(source, str):
+        html = source
+        chunks = (html[i:i + FEED_CHUNK_SIZE] for i in range(0, len(html), FEED_CHUNK_SIZE))
+    else:
+        chunks = source
+
+    for chunk in chunks:
+        extractor.feed(chunk)
+        if extractor.done:
+            break
+    extractor.close()
+    return extractor.title, extractor.text
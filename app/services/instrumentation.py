@@ -0,0 +1,196 @@
+import os
+import time
+import random
+import bisect
+import logging
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Share of debug payloads (page text, raw model output) that are logged,
+# and how much of each
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", 0.01))
+LOG_PAYLOAD_CHARS = int(os.getenv("LOG_PAYLOAD_CHARS", 500))
+
+# Stage timings of the current request, for the Server-Timing header
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+class Histogram:
+    """
+    Prometheus-style histogram with one series per label tuple.
+    """
+
+    def __init__(self, name, help_text, label_names, buckets=BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, seconds):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += seconds
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {labels: (list(counts), total) for labels, (counts, total) in self._series.items()}
+        for labels, (counts, total) in sorted(series.items()):
+            base = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{base}}} {total:.6f}")
+            lines.append(f"{self.name}_count{{{base}}} {cumulative}")
+        return "\n".join(lines)
+
+
+class Counter:
+    """
+    Prometheus-style counter with one series per label tuple.
+    """
+
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+
+    def value(self, labels):
+        with self._lock:
+            return self._series.get(labels, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            series = dict(self._series)
+        for labels, count in sorted(series.items()):
+            base = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, labels))
+            lines.append(f"{self.name}{{{base}}} {count}")
+        return "\n".join(lines)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+stage_seconds = Histogram(
+    "app_stage_duration_seconds", "Time spent in each processing stage.", ["stage", "outcome"]
+)
+request_seconds = Histogram(
+    "app_request_duration_seconds", "HTTP request handling time, until the response is returned.",
+    ["method", "route", "status"],
+)
+single_flight_calls = Counter(
+    "app_single_flight_calls_total",
+    "Calls to coalesced upstream work by role: leader ran it, shared reused a concurrent call's "
+    "result (an upstream call saved), lease_wait waited for another process first.",
+    ["flight", "role"],
+)
+
+
+def observe_stage(name, seconds, outcome="ok"):
+    """
+    Record a stage duration in the histogram and in the current request's
+    Server-Timing list.
+    """
+    stage_seconds.observe((name, outcome), seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+
+@contextmanager
+def stage(name):
+    """
+    Time the enclosed block as stage `name` (outcome "error" if it raises).
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        observe_stage(name, time.perf_counter() - start, "error")
+        raise
+    observe_stage(name, time.perf_counter() - start)
+
+
+def timed(name):
+    """
+    Decorator form of stage().
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def start_request():
+    """
+    Start collecting stage timings for the current request.
+    """
+    _request_timings.set([])
+
+
+def request_timings():
+    """
+    Stage timings of the current request as [(stage, total seconds, calls)],
+    in order of first appearance.
+    """
+    totals = {}
+    for name, seconds in _request_timings.get() or ():
+        total, calls = totals.get(name, (0.0, 0))
+        totals[name] = (total + seconds, calls + 1)
+    return [(name, total, calls) for name, (total, calls) in totals.items()]
+
+
+def server_timing_header(total_seconds=None):
+    """
+    Server-Timing value for the current request, e.g.
+    'fetch;dur=212.4, llm;dur=803.1;desc="2 calls", total;dur=1030.2'.
+    """
+    parts = []
+    for name, seconds, calls in request_timings():
+        part = f"{name};dur={seconds * 1000:.1f}"
+        if calls > 1:
+            part += f';desc="{calls} calls"'
+        parts.append(part)
+    if total_seconds is not None:
+        parts.append(f"total;dur={total_seconds * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def render_metrics() -> str:
+    """
+    All metrics in the Prometheus text exposition format.
+    """
+    return "\n".join(m.render() for m in (stage_seconds, request_seconds, single_flight_calls)) + "\n"
+
+
+def log_payload(logger, label, payload):
+    """
+    Log a large payload at DEBUG for a sample of calls (LOG_SAMPLE_RATE),
+    cut to LOG_PAYLOAD_CHARS. Costs nothing when debug logging is off.
+    """
+    if not logger.isEnabledFor(logging.DEBUG) or random.random() >= LOG_SAMPLE_RATE:
+        return
+    text = payload if isinstance(payload, str) else repr(payload)
+    logger.debug("%s (%d chars, sampled): %s", label, len(text), text[:LOG_PAYLOAD_CHARS])
@@ -0,0 +1,202 @@
+import os
+import time
+import uuid
+import queue
+import threading
+import contextvars
+from collections import OrderedDict
+
+from app.services.deadline import is_timeout
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED_STATES = (SUCCEEDED, FAILED)
+
+
+class QueueFullError(Exception):
+    """
+    Raised when a job is submitted while the queue is at its depth limit.
+    """
+
+
+class Job:
+    def __init__(self, kind):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = QUEUED
+        self.stage = None
+        self.stages = []
+        self.result = None
+        self.error = None
+        # Failed with a timeout (see app.services.deadline.is_timeout)
+        self.timed_out = False
+        self.created_at = time.time()
+        self.finished_at = None
+        # Bumped on every change so subscribers can wait for "something new"
+        self.version = 0
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATES
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "stage": self.stage,
+            "stages": [dict(s) for s in self.stages],
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """
+    Runs jobs on a fixed pool of worker threads fed by a bounded queue.
+
+    submit() never blocks: when `max_queue_depth` jobs are already waiting it
+    raises QueueFullError so callers can push back (e.g. HTTP 503). Each job
+    function receives a `progress(stage)` callback; stage changes and the
+    final result are visible through get() / wait() / wait_for_change().
+    Finished jobs are kept for `retention_seconds` so clients can poll them.
+    """
+
+    def __init__(self, kind, workers=4, max_queue_depth=100, retention_seconds=3600):
+        self.kind = kind
+        self.workers = workers
+        self.max_queue_depth = max_queue_depth
+        self.retention_seconds = retention_seconds
+        self._queue = queue.Queue(maxsize=max_queue_depth)
+        self._jobs = OrderedDict()
+        self._changed = threading.Condition()
+        self._threads = []
+        self._start_lock = threading.Lock()
+
+    def _ensure_workers(self):
+        # Workers start on first use so importing the module stays cheap
+        if self._threads:
+            return
+        with self._start_lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"{self.kind}-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Queue `fn(*args, progress=..., **kwargs)` and return its Job at once.
+        The job runs in a copy of the caller's context, so a synchronous
+        route waiting on it still gets the job's stage timings.
+        """
+        self._ensure_workers()
+        self._prune()
+        job = Job(self.kind)
+        with self._changed:
+            self._jobs[job.id] = job
+        try:
+            self._queue.put_nowait((job, fn, args, kwargs, contextvars.copy_context()))
+        except queue.Full:
+            with self._changed:
+                del self._jobs[job.id]
+            raise QueueFullError(
+                f"Too many {self.kind} jobs queued ({self.max_queue_depth}); try again later."
+            )
+        return job
+
+    def get(self, job_id):
+        with self._changed:
+            return self._jobs.get(job_id)
+
+    def wait(self, job_id, timeout=None):
+        """
+        Block until the job finishes or `timeout` seconds pass. Returns the job.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._changed:
+            job = self._jobs.get(job_id)
+            while job and not job.finished:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._changed.wait(remaining)
+            return job
+
+    def wait_for_change(self, job_id, version, timeout=None):
+        """
+        Block until the job's version moves past `version` (or it finishes).
+        Returns a snapshot dict and the new version, or (None, version) if
+        the job is unknown.
+        """
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None, version
+            self._changed.wait_for(lambda: job.version > version or job.finished, timeout)
+            return job.to_dict(), job.version
+
+    def stats(self):
+        with self._changed:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+        return {
+            "workers": self.workers,
+            "queue_depth": self._queue.qsize(),
+            "max_queue_depth": self.max_queue_depth,
+            "jobs": counts,
+        }
+
+    def _update(self, job, **changes):
+        with self._changed:
+            for key, value in changes.items():
+                setattr(job, key, value)
+            job.version += 1
+            self._changed.notify_all()
+
+    def _progress(self, job, stage):
+        now = time.time()
+        with self._changed:
+            if job.stages and job.stages[-1]["finished_at"] is None:
+                job.stages[-1]["finished_at"] = now
+            job.stages.append({"name": stage, "started_at": now, "finished_at": None})
+            job.stage = stage
+            job.version += 1
+            self._changed.notify_all()
+
+    def _work(self):
+        while True:
+            job, fn, args, kwargs, ctx = self._queue.get()
+            self._update(job, status=RUNNING)
+            try:
+                result = ctx.run(fn, *args, progress=lambda stage: self._progress(job, stage), **kwargs)
+                changes = {"status": SUCCEEDED, "result": result}
+            except Exception as e:
+                changes = {"status": FAILED, "error": str(e), "timed_out": is_timeout(e)}
+            finally:
+                self._queue.task_done()
+
+            with self._changed:
+                if job.stages and job.stages[-1]["finished_at"] is None:
+                    job.stages[-1]["finished_at"] = time.time()
+            self._update(job, finished_at=time.time(), **changes)
+
+    def _prune(self):
+        cutoff = time.time() - self.retention_seconds
+        with self._changed:
+            for job_id in [j.id for j in self._jobs.values() if j.finished and j.finished_at < cutoff]:
+                del self._jobs[job_id]
+
+
+profile_jobs = JobManager(
+    "profile",
+    workers=int(os.getenv("PROFILE_JOB_WORKERS", 4)),
+    max_queue_depth=int(os.getenv("PROFILE_JOB_QUEUE_DEPTH", 100)),
+    retention_seconds=int(os.getenv("PROFILE_JOB_RETENTION", 3600)),
+)
@@ -0,0 +1,197 @@
+import re
+import json
+
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?")
+_WORD = re.compile(r"[A-Za-z_$][\w$-]*")
+_LITERALS = {"true": True, "false": False, "null": None, "True": True, "False": False, "None": None}
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f", "/": "/", "\\": "\\", '"': '"', "'": "'"}
+# A quote only closes a string when one of these follows it, so quotes
+# inside a value ("Joe's", 'the "best" pizza') are kept as text
+_CLOSERS = ",:}]"
+# ...or when a line break and then one of these follows it: the next
+# member starts on a new line and the comma before it is missing
+_LINE_CLOSERS = "\"'}]"
+
+
+class _Truncated(Exception):
+    """
+    Input ended inside a value; `partial` holds what was complete.
+    """
+
+    def __init__(self, partial=None):
+        super().__init__("truncated")
+        self.partial = partial
+
+
+class _Parser:
+    def __init__(self, text, pos):
+        self.text = text
+        self.pos = pos
+
+    def skip_space(self):
+        text, pos = self.text, self.pos
+        while pos < len(text) and text[pos].isspace():
+            pos += 1
+        self.pos = pos
+        return text[pos] if pos < len(text) else None
+
+    def value(self):
+        char = self.skip_space()
+        if char is None:
+            raise _Truncated()
+        if char == "{":
+            return self.object()
+        if char == "[":
+            return self.array()
+        if char in "\"'":
+            return self.string(char)
+        if char == "-" or char.isdigit():
+            return self.number()
+        match = _WORD.match(self.text, self.pos)
+        if match and match.group() in _LITERALS:
+            self.pos = match.end()
+            return _LITERALS[match.group()]
+        if match and match.end() == len(self.text) and any(
+            literal.startswith(match.group()) for literal in _LITERALS
+        ):
+            raise _Truncated()
+        raise ValueError(f"Unexpected {char!r} at position {self.pos}")
+
+    def object(self):
+        self.pos += 1
+        result = {}
+        while True:
+            char = self.skip_space()
+            if char is None:
+                raise _Truncated(result)
+            if char == "}":
+                self.pos += 1
+                return result
+            if char == ",":
+                # Also skips trailing and doubled commas
+                self.pos += 1
+                continue
+            try:
+                key = self.key()
+                if self.skip_space() is None:
+                    raise _Truncated()
+                if self.text[self.pos] != ":":
+                    raise ValueError(f"Expected ':' at position {self.pos}")
+                self.pos += 1
+                result[key] = self.value()
+            except _Truncated:
+                # The member being read is dropped; earlier ones are complete
+                raise _Truncated(result)
+
+    def key(self):
+        char = self.text[self.pos]
+        if char in "\"'":
+            return self.string(char)
+        match = _WORD.match(self.text, self.pos)
+        if not match:
+            raise ValueError(f"Expected a key at position {self.pos}")
+        if match.end() == len(self.text):
+            raise _Truncated()
+        self.pos = match.end()
+        return match.group()
+
+    def array(self):
+        self.pos += 1
+        result = []
+        while True:
+            char = self.skip_space()
+            if char is None:
+                raise _Truncated(result)
+            if char == "]":
+                self.pos += 1
+                return result
+            if char == ",":
+                self.pos += 1
+                continue
+            try:
+                result.append(self.value())
+            except _Truncated:
+                raise _Truncated(result)
+
+    def string(self, quote):
+        text = self.text
+        pos = self.pos + 1
+        chars = []
+        while pos < len(text):
+            char = text[pos]
+            if char == "\\":
+                if pos + 1 >= len(text):
+                    break
+                escape = text[pos + 1]
+                if escape == "u":
+                    if pos + 6 > len(text):
+                        break
+                    chars.append(chr(int(text[pos + 2:pos + 6], 16)))
+                    pos += 6
+                else:
+                    chars.append(_ESCAPES.get(escape, escape))
+                    pos += 2
+                continue
+            if char == quote:
+                after = text[pos + 1:pos + 64]
+                rest = after.lstrip()
+                if not rest or rest[0] in _CLOSERS or (
+                    rest[0] in _LINE_CLOSERS and "\n" in after[:len(after) - len(rest)]
+                ):
+                    self.pos = pos + 1
+                    return "".join(chars)
+            chars.append(char)
+            pos += 1
+        raise _Truncated()
+
+    def number(self):
+        match = _NUMBER.match(self.text, self.pos)
+        if not match:
+            raise ValueError(f"Invalid number at position {self.pos}")
+        if match.end() == len(self.text):
+            # More digits may have followed
+            raise _Truncated()
+        self.pos = match.end()
+        number = match.group()
+        return float(number) if any(c in number for c in ".eE") else int(number)
+
+
+def parse_partial_json(text: str):
+    """
+    Parse the first JSON object (or array) in LLM output, tolerating what
+    models get wrong: prose or code fences around it, single-quoted
+    strings, unquoted keys, missing or trailing commas, Python literals
+    and output cut off part-way.
+
+    Any prefix of a valid object parses to the members completed so far,
+    so the parser also works on a stream as it arrives. A member whose
+    value was cut off is dropped rather than guessed.
+
+    Args:
+        text (str): Raw model output.
+
+    Returns:
+        tuple: (value, complete). `complete` is False if the text ended
+        before the value was closed.
+
+    Raises:
+        ValueError: If there is no object or array, or it is malformed
+            beyond repair.
+    """
+    start = text.find("{")
+    if start < 0:
+        start = text.find("[")
+    if start < 0:
+        raise ValueError("No JSON object in the output")
+
+    # Fast path: well-formed JSON with only prose or fences around it
+    try:
+        value, _ = json.JSONDecoder().raw_decode(text, start)
+        return value, True
+    except ValueError:
+        pass
+
+    try:
+        return _Parser(text, start).value(), True
+    except _Truncated as e:
+        return e.partial, False
@@ -0,0 +1,359 @@
+import os
+import time
+import heapq
+import sqlite3
+import itertools
+import threading
+from collections import deque
+
+from app.services.instrumentation import stage
+from app.services.deadline import time_left, has_time, DeadlineExceeded
+
+# Provider budgets per rolling minute; 0 (the default) disables a limit.
+# Set them to the account's limits for the model, e.g. LLM_RPM=30 and
+# LLM_TPM=6000 on Groq's free tier for llama-3.1-8b-instant. A generation
+# call uses about 1,000 tokens, so that tier allows ~6 a minute: too few
+# for bulk generation to finish within its deadline.
+LLM_RPM = int(os.getenv("LLM_RPM", 0))
+LLM_TPM = int(os.getenv("LLM_TPM", 0))
+# Usage is recorded here so every worker process draws from the same budget
+LLM_GATEWAY_DB = os.getenv(
+    "LLM_GATEWAY_DB",
+    os.path.join(os.path.dirname(__file__), "../storage/llm_gateway.sqlite3")
+)
+# Completion tokens assumed for a call until its real usage is known
+DEFAULT_COMPLETION_TOKENS = 512
+# Retries of a call rejected with 429 by the provider
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 3))
+# Seconds one LLM request may take; less when the request's deadline is closer
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 60))
+# Used when a 429 response carries no Retry-After header
+DEFAULT_RETRY_AFTER_SECONDS = 5
+WINDOW_SECONDS = 60
+
+# Lower runs first
+INTERACTIVE = 0
+BULK = 10
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BULK: "bulk"}
+
+_encoding = None
+_encoding_failed = False
+
+
+def get_api_key() -> str:
+    """
+    GROQ_API_KEY from the environment. Read when the first LLM call is made,
+    so importing the services works without it.
+    """
+    key = os.getenv("GROQ_API_KEY")
+    if not key:
+        raise ValueError("GROQ_API_KEY must be set in your environment.")
+    return key
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count tokens in `text` with tiktoken's cl100k_base encoding. Llama
+    tokenizers differ slightly, which is fine for budgeting. Falls back to
+    ~4 characters per token when the encoding is unavailable (tiktoken
+    downloads it on first use).
+    """
+    global _encoding, _encoding_failed
+    if _encoding is None and not _encoding_failed:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding_failed = True
+
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def estimate_tokens(messages) -> int:
+    """
+    Estimate prompt tokens for chat messages (see count_tokens).
+    """
+    total = 0
+    for message in messages:
+        total += 4  # role and message framing
+        total += count_tokens(message.get("content") or "")
+    return total + 2
+
+
+def rate_limit_delay(error):
+    """
+    Seconds to wait if `error` is a 429 from the provider (requests or Groq
+    SDK exception), else None.
+    """
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    if status != 429:
+        return None
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER_SECONDS
+
+
+class LLMGateway:
+    """
+    Single entry point for LLM calls.
+
+    Every call is admitted against requests-per-minute and tokens-per-minute
+    budgets over a rolling window. Reservations live in a SQLite table, so
+    all processes sharing LLM_GATEWAY_DB share the budget; a 429 from the
+    provider pauses every process until its Retry-After has passed.
+
+    Callers waiting for budget are served strictly by priority (INTERACTIVE
+    before BULK), then arrival order, so a large bulk job cannot starve a
+    user waiting on a page. Priorities apply within a process; across
+    processes the budget is first come, first served.
+    """
+
+    def __init__(self, rpm=LLM_RPM, tpm=LLM_TPM, path=LLM_GATEWAY_DB, max_retries=LLM_MAX_RETRIES):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.path = path
+        self.max_retries = max_retries
+        self._local = threading.local()
+        self._cond = threading.Condition()
+        self._waiters = []
+        self._seq = itertools.count()
+        self._waits = {name: deque(maxlen=500) for name in PRIORITY_NAMES.values()}
+        self.calls = 0
+        self.rate_limited = 0
+        if self.limited:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with self._conn() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS llm_calls ("
+                    "id INTEGER PRIMARY KEY, ts REAL NOT NULL, tokens INTEGER NOT NULL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS llm_calls_ts ON llm_calls(ts)")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS llm_state (key TEXT PRIMARY KEY, value REAL NOT NULL)"
+                )
+
+    @property
+    def limited(self):
+        return self.rpm > 0 or self.tpm > 0
+
+    def _conn(self):
+        # sqlite3 connections cannot be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    # --- budget ------------------------------------------------------------
+
+    def _try_reserve(self, tokens):
+        """
+        Record a call if the budgets allow it. Returns (reservation_id, 0)
+        on success, or (None, seconds to wait) otherwise.
+        """
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM llm_calls WHERE ts <= ?", (now - WINDOW_SECONDS,))
+            row = conn.execute("SELECT value FROM llm_state WHERE key = 'paused_until'").fetchone()
+            if row and row[0] > now:
+                conn.execute("COMMIT")
+                return None, row[0] - now
+
+            calls = conn.execute("SELECT ts, tokens FROM llm_calls ORDER BY ts").fetchall()
+            wait = 0.0
+            if self.rpm > 0 and len(calls) >= self.rpm:
+                # The oldest calls that must drop out of the window first
+                wait = max(wait, calls[len(calls) - self.rpm][0] + WINDOW_SECONDS - now)
+            if self.tpm > 0:
+                excess = sum(t for _, t in calls) + tokens - self.tpm
+                for ts, used in calls:
+                    if excess <= 0:
+                        break
+                    excess -= used
+                    wait = max(wait, ts + WINDOW_SECONDS - now)
+            if wait > 0:
+                conn.execute("COMMIT")
+                return None, wait
+
+            cursor = conn.execute("INSERT INTO llm_calls (ts, tokens) VALUES (?, ?)", (now, tokens))
+            conn.execute("COMMIT")
+            return cursor.lastrowid, 0
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def acquire(self, tokens, priority=INTERACTIVE):
+        """
+        Block until the call may run. Returns a reservation id (None when
+        no limits are configured).
+
+        Raises:
+            DeadlineExceeded: If the current deadline passes while waiting,
+                or the budget frees up only after it.
+        """
+        if self.tpm > 0:
+            # A single call larger than the whole budget could never run
+            tokens = min(tokens, self.tpm)
+        started = time.monotonic()
+        entry = (priority, next(self._seq))
+        reservation = None
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            self._cond.notify_all()
+        try:
+            while self.limited:
+                left = time_left()
+                if left == 0:
+                    raise DeadlineExceeded("LLM queue: deadline exceeded")
+                with self._cond:
+                    if self._waiters[0] != entry:
+                        self._cond.wait(1.0 if left is None else min(left, 1.0))
+                        continue
+                # First in line. The database may be locked by another
+                # process for a while, so reserve without holding the
+                # condition that other waiters and stats() need.
+                reservation, wait = self._try_reserve(tokens)
+                if reservation is not None:
+                    break
+                if left is not None and wait >= left:
+                    # Waiting would only end in a timeout
+                    raise DeadlineExceeded(f"LLM budget frees up in {wait:.1f}s, after the deadline")
+                with self._cond:
+                    self._cond.wait(min(wait, 1.0))
+        finally:
+            with self._cond:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+        self._waits[PRIORITY_NAMES.get(priority, "bulk")].append(time.monotonic() - started)
+        return reservation
+
+    def settle(self, reservation, tokens):
+        """
+        Replace a reservation's estimate with the tokens actually used.
+        """
+        if reservation is None or not tokens:
+            return
+        with self._conn() as conn:
+            conn.execute("UPDATE llm_calls SET tokens = ? WHERE id = ?", (int(tokens), reservation))
+
+    def pause(self, seconds):
+        """
+        Stop admitting calls in every process for `seconds`.
+        """
+        if not self.limited:
+            time.sleep(seconds)
+            return
+        until = time.time() + seconds
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT INTO llm_state (key, value) VALUES ('paused_until', ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = MAX(value, excluded.value)",
+                (until,),
+            )
+
+    # --- calls -------------------------------------------------------------
+
+    def call(self, send, messages, priority=INTERACTIVE, completion_tokens=DEFAULT_COMPLETION_TOKENS,
+             usage=None):
+        """
+        Run one LLM request through the gateway.
+
+        Args:
+            send (callable): Performs the request and returns its result;
+                should raise on HTTP errors so 429s can be retried.
+            messages (list): Chat messages, used to estimate prompt tokens.
+            priority (int): INTERACTIVE or BULK.
+            completion_tokens (int): Expected completion length.
+            usage (callable): Optional; returns the total tokens used from
+                `send`'s result, to correct the estimate.
+
+        Returns:
+            Whatever `send` returned.
+        """
+        estimate = estimate_tokens(messages) + completion_tokens
+        for attempt in range(self.max_retries + 1):
+            with stage("llm_queue"):
+                reservation = self.acquire(estimate, priority)
+            try:
+                with stage("llm"):
+                    result = send()
+            except Exception as e:
+                delay = rate_limit_delay(e)
+                if delay is None or attempt == self.max_retries or not has_time(delay):
+                    raise
+                self.rate_limited += 1
+                self.pause(delay)
+                continue
+            self.calls += 1
+            if usage:
+                try:
+                    self.settle(reservation, usage(result))
+                except (AttributeError, KeyError, TypeError):
+                    pass
+            return result
+
+    # --- status ------------------------------------------------------------
+
+    def stats(self) -> dict:
+        with self._cond:
+            depth = {name: 0 for name in PRIORITY_NAMES.values()}
+            for priority, _ in self._waiters:
+                depth[PRIORITY_NAMES.get(priority, "bulk")] += 1
+
+        waits = {}
+        for name, samples in self._waits.items():
+            ordered = sorted(samples)
+            waits[name] = {
+                "samples": len(ordered),
+                "mean_ms": round(sum(ordered) / len(ordered) * 1000, 1) if ordered else 0,
+                "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 1) if ordered else 0,
+                "max_ms": round(ordered[-1] * 1000, 1) if ordered else 0,
+            }
+
+        window = {"requests": 0, "tokens": 0}
+        paused_for = 0
+        if self.limited:
+            conn = self._conn()
+            now = time.time()
+            count, tokens = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(tokens), 0) FROM llm_calls WHERE ts > ?",
+                (now - WINDOW_SECONDS,),
+            ).fetchone()
+            window = {"requests": count, "tokens": tokens}
+            row = conn.execute("SELECT value FROM llm_state WHERE key = 'paused_until'").fetchone()
+            paused_for = round(max(0.0, row[0] - now), 1) if row else 0
+
+        return {
+            "limits": {"rpm": self.rpm, "tpm": self.tpm},
+            "window": window,
+            "queue_depth": depth,
+            "wait": waits,
+            "calls": self.calls,
+            "rate_limited": self.rate_limited,
+            "paused_for_seconds": paused_for,
+        }
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    """
+    Process-wide LLMGateway.
+    """
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = LLMGateway()
+    return _gateway
@@ -1,4 +1,45 @@
-import feedparser
+import os
+import time
+import logging
+import contextvars
+from urllib.parse import quote_plus
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.cache import TTLCache, make_backend
+from app.services.instrumentation import stage
+from app.services.single_flight import SingleFlight
+from app.services.rss_reader import fetch_feed, FeedError, NEWS_FETCH_TIMEOUT
+from app.services.deadline import call_timeout, deadline_passed, is_timeout, DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+# Feed URL template; {query} is the URL-encoded search query
+GOOGLE_NEWS_RSS_URL = os.getenv(
+    "NEWS_RSS_URL", "https://news.google.com/rss/search?q={query}&hl=en-IN&gl=IN&ceid=IN:en"
+)
+# Headlines younger than this are served without touching the network
+NEWS_FRESH_SECONDS = int(os.getenv("NEWS_CACHE_TTL", 15 * 60))
+# Older entries are kept this long so they can be revalidated with a conditional GET
+NEWS_STALE_SECONDS = int(os.getenv("NEWS_CACHE_STALE_TTL", 24 * 3600))
+NEWS_BATCH_WORKERS = int(os.getenv("NEWS_BATCH_WORKERS", 8))
+# Headlines kept per industry
+NEWS_ITEMS = 5
+
+news_cache = TTLCache(
+    backend=make_backend(
+        os.getenv("NEWS_CACHE_BACKEND", "memory"),
+        path=os.getenv(
+            "NEWS_CACHE_PATH",
+            os.path.join(os.path.dirname(__file__), "../storage/news_cache.sqlite3")
+        ),
+        table="news",
+    ),
+    ttl=NEWS_STALE_SECONDS,
+    max_entries=int(os.getenv("NEWS_CACHE_MAX_ENTRIES", 2000)),
+)
+# Concurrent refreshes of the same query download the feed once (across
+# processes too when SINGLE_FLIGHT_DB is set and the cache is sqlite)
+news_flight = SingleFlight("news")
 
 def fetch_industry_name(business_profile: dict) -> str:
     """
@@ -13,10 +54,25 @@ def fetch_industry_name(business_profile: dict) -> str:
     # Safe extraction with fallback to empty string
     return business_profile.get("industry", "").strip()
 
+def normalize_news_query(industry: str) -> str:
+    """
+    Canonical form of an industry name used as the news search query and
+    cache key: trimmed, lower-cased, single-spaced.
+    """
+    return " ".join((industry or "").lower().split())
+
 def fetch_industry_news(industry: str):
     """
     Fetch the latest top 5 news headlines related to the given industry
-    from Google News RSS feed.
+    from Google News RSS feed, reading only as much of the feed as needed.
+    Results are cached per normalized query and revalidated with ETag /
+    Last-Modified once they go stale; concurrent callers asking for a
+    stale query share one download. An unavailable feed yields the
+    headlines cached earlier, or none.
+
+    Raises:
+        DeadlineExceeded: If the request's deadline passes before any
+            headline is available.
 
     Args:
         industry (str): Industry name to search news for.
@@ -24,22 +80,98 @@ def fetch_industry_news(industry: str):
     Returns:
         List[dict]: List of news items as dicts with 'headline' and 'url'.
     """
-    if not industry:
+    query = normalize_news_query(industry)
+    if not query:
         return []
 
-    # Prepare search query by replacing spaces with '+'
-    query = industry.replace(" ", "+")
-    rss_url = f"https://news.google.com/rss/search?q={query}&hl=en-IN&gl=IN&ceid=IN:en"
-    feed = feedparser.parse(rss_url)
-
-    headlines = []
-    for entry in feed.entries[:5]:
-        headlines.append({
-            "headline": entry.title,
-            "url": entry.link if 'link' in entry else None
-        })
+    cached = news_cache.get(query)
+    if cached and time.time() - cached["fetched_at"] < NEWS_FRESH_SECONDS:
+        return cached["headlines"]
+    return news_flight.do(query, _refresh_news, query)
+
+def _refresh_news(query):
+    # Fresh again if another process refreshed it while this one waited
+    cached = news_cache.get(query)
+    if cached and time.time() - cached["fetched_at"] < NEWS_FRESH_SECONDS:
+        return cached["headlines"]
+
+    # Revalidate a stale entry instead of downloading the whole feed again
+    rss_url = GOOGLE_NEWS_RSS_URL.format(query=quote_plus(query))
+    with stage("rss_fetch"):
+        try:
+            timeout = call_timeout(NEWS_FETCH_TIMEOUT, "News feed")
+            if cached:
+                feed = fetch_feed(rss_url, NEWS_ITEMS, etag=cached.get("etag"), modified=cached.get("modified"),
+                                  timeout=timeout)
+            else:
+                feed = fetch_feed(rss_url, NEWS_ITEMS, timeout=timeout)
+        except (FeedError, DeadlineExceeded) as e:
+            # A failed fetch should not overwrite headlines we already have,
+            # nor be cached in their place
+            logger.warning("News feed for %r unavailable: %s", query, e)
+            if cached:
+                return cached["headlines"]
+            if is_timeout(e) and deadline_passed():
+                raise DeadlineExceeded("News feed: deadline exceeded") from e
+            return []
+
+    if cached and feed["status"] == 304:
+        headlines = cached["headlines"]
+    else:
+        headlines = [{"headline": item["title"], "url": item["link"]} for item in feed["items"]]
+        # An empty feed should not overwrite headlines we already have
+        if not headlines and cached:
+            return cached["headlines"]
+
+    # Same headlines keep the same version, so clients' ETags stay valid
+    unchanged = cached and headlines == cached["headlines"]
+    news_cache.set(query, {
+        "headlines": headlines,
+        "etag": feed["etag"] or (cached or {}).get("etag"),
+        "modified": feed["modified"] or (cached or {}).get("modified"),
+        "fetched_at": time.time(),
+    }, version=news_cache.version(query) if unchanged else None)
     return headlines
 
+def fetch_industry_news_batch(industries, max_workers=NEWS_BATCH_WORKERS):
+    """
+    Fetch headlines for many industries at once.
+
+    Industries that normalize to the same query are fetched once, and feeds
+    that are not already fresh in the cache are downloaded concurrently.
+
+    Args:
+        industries (list[str]): Industry names.
+        max_workers (int): Maximum number of concurrent feed downloads.
+
+    Returns:
+        tuple[dict, dict]: ({industry: headlines}, {industry: error message})
+    """
+    queries = {}
+    for industry in industries:
+        query = normalize_news_query(industry)
+        if query:
+            queries.setdefault(query, []).append(industry)
+
+    results, errors = {}, {}
+    if not queries:
+        return results, errors
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(queries)))) as pool:
+        # Each download sees the caller's context (e.g. its request's deadline)
+        futures = {
+            query: pool.submit(contextvars.copy_context().run, fetch_industry_news, query) for query in queries
+        }
+        for query, future in futures.items():
+            try:
+                headlines = future.result()
+                for industry in queries[query]:
+                    results[industry] = headlines
+            except Exception as e:
+                for industry in queries[query]:
+                    errors[industry] = str(e)
+    return results, errors
+
 def fetch_news_from_business_profile(business_profile: dict):
     """
     Convenience function: Takes the business profile dict,
@@ -0,0 +1,200 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+
+# Where cached page bodies and the URL index live
+PAGE_CACHE_DIR = os.getenv(
+    "PAGE_CACHE_DIR",
+    os.path.join(os.path.dirname(__file__), "../storage/page_cache")
+)
+# Upper bound for the total size of cached bodies on disk (default 256 MB)
+PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+INDEX_FILE = "index.sqlite3"
+
+
+class PageCache:
+    """
+    Disk-backed, content-addressed cache for fetched HTML pages.
+
+    Bodies are stored once per SHA-256 digest, so several URLs serving the same
+    page share one file. A SQLite index, shared by every process using the
+    directory, maps each URL to its body digest plus the ETag / Last-Modified
+    validators needed for conditional GETs. When the total size of the bodies
+    exceeds `max_bytes`, least recently stored or revalidated URLs are evicted
+    and bodies no longer referenced by any URL are deleted.
+
+    Nothing touches the disk until the cache is first used.
+    """
+
+    def __init__(self, cache_dir=PAGE_CACHE_DIR, max_bytes=PAGE_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._ready = False
+        self._ready_lock = threading.Lock()
+
+    def _body_path(self, digest):
+        return os.path.join(self.cache_dir, digest[:2], digest)
+
+    def _create(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "url TEXT PRIMARY KEY, digest TEXT NOT NULL, etag TEXT, last_modified TEXT, "
+            "accessed_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS pages_digest ON pages(digest)")
+        conn.execute("CREATE INDEX IF NOT EXISTS pages_accessed ON pages(accessed_at)")
+        conn.execute("CREATE TABLE IF NOT EXISTS bodies (digest TEXT PRIMARY KEY, size INTEGER NOT NULL)")
+
+    def _connect(self):
+        # sqlite3 connections cannot be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.cache_dir, INDEX_FILE), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _conn(self):
+        if not self._ready:
+            with self._ready_lock:
+                if not self._ready:
+                    self._create()
+                    self._ready = True
+        return self._connect()
+
+    def _write(self, fn):
+        """
+        Run fn(conn) in one write transaction. Body files are written and
+        deleted inside it too, so no process drops a body another is adding.
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn)
+            conn.execute("COMMIT")
+            return result
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def lookup(self, url: str):
+        """
+        Return the cache entry for `url`, or None if it is missing or its body
+        file is gone.
+        """
+        row = self._conn().execute(
+            "SELECT digest, etag, last_modified, accessed_at FROM pages WHERE url = ?", (url,)
+        ).fetchone()
+        if row is None or not os.path.exists(self._body_path(row[0])):
+            return None
+        return {"digest": row[0], "etag": row[1], "last_modified": row[2], "accessed_at": row[3]}
+
+    def conditional_headers(self, entry) -> dict:
+        """
+        Build If-None-Match / If-Modified-Since headers from a cache entry.
+        """
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def read(self, url: str):
+        """
+        Return the cached body for `url`, or None if the page is not cached.
+        """
+        row = self._conn().execute("SELECT digest FROM pages WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        try:
+            with open(self._body_path(row[0]), "r", encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def revalidated(self, url: str, etag=None, last_modified=None):
+        """
+        Record a 304 Not Modified for `url`: the validators it carried
+        replace the stored ones, and the entry counts as recently used.
+        """
+        def update(conn):
+            conn.execute(
+                "UPDATE pages SET etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified), "
+                "accessed_at = ? WHERE url = ?",
+                (etag, last_modified, time.time(), url),
+            )
+        self._write(update)
+
+    def store(self, url: str, body: str, etag=None, last_modified=None):
+        """
+        Save `body` for `url` along with its validators, then evict old
+        entries if the cache grew past its size limit.
+        """
+        data = body.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._body_path(digest)
+
+        def update(conn):
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            conn.execute("INSERT OR IGNORE INTO bodies (digest, size) VALUES (?, ?)", (digest, len(data)))
+
+            previous = conn.execute("SELECT digest FROM pages WHERE url = ?", (url,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO pages (url, digest, etag, last_modified, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (url, digest, etag, last_modified, time.time()),
+            )
+            # The page changed: drop the old body unless another URL still uses it
+            if previous and previous[0] != digest:
+                self._drop_if_unused(conn, previous[0])
+            self._evict(conn)
+
+        self._write(update)
+
+    def _drop_if_unused(self, conn, digest):
+        if conn.execute("SELECT 1 FROM pages WHERE digest = ? LIMIT 1", (digest,)).fetchone():
+            return
+        conn.execute("DELETE FROM bodies WHERE digest = ?", (digest,))
+        try:
+            os.remove(self._body_path(digest))
+        except OSError:
+            pass
+
+    def _evict(self, conn):
+        # Total size counts every distinct body once, however many URLs share it
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM bodies").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for url, digest in conn.execute("SELECT url, digest FROM pages ORDER BY accessed_at").fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+            size = conn.execute("SELECT size FROM bodies WHERE digest = ?", (digest,)).fetchone()
+            self._drop_if_unused(conn, digest)
+            if size and not conn.execute("SELECT 1 FROM bodies WHERE digest = ?", (digest,)).fetchone():
+                total -= size[0]
+
+    def clear(self):
+        def update(conn):
+            for (digest,) in conn.execute("SELECT digest FROM bodies").fetchall():
+                try:
+                    os.remove(self._body_path(digest))
+                except OSError:
+                    pass
+            conn.execute("DELETE FROM pages")
+            conn.execute("DELETE FROM bodies")
+        self._write(update)
+
+
+page_cache = PageCache()
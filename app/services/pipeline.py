@@ -0,0 +1,209 @@
+import os
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from app.services.deadline import time_left, has_time, deadline_passed, is_timeout
+from app.services.scraper import fetch_site, merge_site_content, analyze_website_business_profile
+from app.services.news_scraper import fetch_industry_news
+from app.services.generator import generate_social_media_posts
+
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", 4))
+# Stages still running this long after the deadline are abandoned; their
+# own (deadline-bounded) timeouts normally end them first
+DEADLINE_GRACE_SECONDS = 0.5
+# Onboarding fetches news only with this much time left, enough for the
+# feed and the post generation that follows it
+ONBOARD_NEWS_MIN_SECONDS = float(os.getenv("ONBOARD_NEWS_MIN_SECONDS", 15))
+
+DONE = "done"
+FAILED = "failed"
+SKIPPED = "skipped"
+TIMED_OUT = "timed_out"
+
+
+class Stage:
+    """
+    One node of a pipeline DAG.
+
+    `fn` receives a dict with the results of the stages listed in `deps`.
+    When an optional stage fails, its dependents still run and see
+    `fallback` as its result; when a required stage fails, its dependents
+    are skipped. An optional stage is also skipped when less than
+    `min_seconds` are left before the deadline.
+    """
+
+    def __init__(self, name, fn, deps=(), optional=False, fallback=None, min_seconds=0):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.optional = optional
+        self.fallback = fallback
+        self.min_seconds = min_seconds
+
+
+def run_dag(stages, on_event=None, max_workers=PIPELINE_WORKERS):
+    """
+    Run stages concurrently, each one as soon as all of its dependencies
+    are done, so total latency is the critical path rather than the sum.
+
+    Under a deadline (see app.services.deadline) no stage starts once it
+    has passed, and stages still running shortly after it are reported as
+    timed out and left behind, so the results so far are returned on time.
+
+    Args:
+        stages (list[Stage]): The DAG; dependencies must refer to stages in the list.
+        on_event (callable): Optional callback, called with a dict for every
+            finished stage: {"stage", "status", "ms", "result" | "error"}.
+        max_workers (int): Maximum stages running at once.
+
+    Returns:
+        tuple[dict, dict]: ({stage: result}, {stage: {"status", "ms", ["error"]}}),
+        status being DONE, FAILED, SKIPPED or TIMED_OUT.
+    """
+    by_name = {stage.name: stage for stage in stages}
+    results, report = {}, {}
+    pending = dict(by_name)
+    running = {}
+    started = {}
+
+    def finish(name, status, ms, result=None, error=None):
+        report[name] = {"status": status, "ms": round(ms, 1)}
+        if error is not None:
+            report[name]["error"] = error
+        if status == DONE:
+            results[name] = result
+        elif by_name[name].optional:
+            results[name] = by_name[name].fallback
+        if on_event:
+            event = {"stage": name, "status": status, "ms": round(ms, 1)}
+            if status == DONE:
+                event["result"] = result
+            if error is not None:
+                event["error"] = error
+            on_event(event)
+
+    def timed(stage, inputs):
+        start = time.perf_counter()
+        try:
+            return stage.fn(inputs), DONE, None, (time.perf_counter() - start) * 1000
+        except Exception as e:
+            status = TIMED_OUT if is_timeout(e) else FAILED
+            return None, status, str(e), (time.perf_counter() - start) * 1000
+
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        while pending or running:
+            # Skip stages whose required dependency failed or was skipped
+            for name, stage in list(pending.items()):
+                blocked = [
+                    dep for dep in stage.deps
+                    if dep in report and report[dep]["status"] != DONE and not by_name[dep].optional
+                ]
+                if blocked:
+                    del pending[name]
+                    finish(name, SKIPPED, 0, error=f"Skipped because '{blocked[0]}' did not complete")
+
+            # Start every stage whose dependencies have all finished
+            for name, stage in list(pending.items()):
+                if all(dep in report for dep in stage.deps):
+                    del pending[name]
+                    if deadline_passed():
+                        finish(name, TIMED_OUT, 0, error="Not started: deadline exceeded")
+                        continue
+                    if stage.optional and not has_time(stage.min_seconds):
+                        finish(name, SKIPPED, 0, error=f"Skipped: less than {stage.min_seconds:g}s left")
+                        continue
+                    inputs = {dep: results.get(dep) for dep in stage.deps}
+                    # Each stage sees the caller's context (e.g. its request's timings)
+                    ctx = contextvars.copy_context()
+                    running[pool.submit(ctx.run, timed, stage, inputs)] = name
+                    started[name] = time.perf_counter()
+
+            if not running:
+                if pending:
+                    # Only reachable with a dependency that is not in the DAG
+                    for name in list(pending):
+                        del pending[name]
+                        finish(name, SKIPPED, 0, error="Unresolvable dependency")
+                break
+
+            left = time_left()
+            finished, _ = wait(
+                running, timeout=None if left is None else left + DEADLINE_GRACE_SECONDS,
+                return_when=FIRST_COMPLETED,
+            )
+            if not finished:
+                # Past the deadline; stop waiting for what is still running
+                for future, name in list(running.items()):
+                    del running[future]
+                    finish(name, TIMED_OUT, (time.perf_counter() - started[name]) * 1000,
+                           error="Deadline exceeded")
+                continue
+            for future in finished:
+                name = running.pop(future)
+                result, status, error, ms = future.result()
+                finish(name, status, ms, result=result, error=error)
+    finally:
+        # Abandoned stages finish in the background; nothing waits for them
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    return results, report
+
+
+def build_onboarding_stages(url, preferences, count, post_frequency, preferred_days, scheduler,
+                            include_news=True):
+    """
+    Onboarding DAG: profile a website, fetch news for its industry, generate
+    posts and write them into the weekly schedule.
+
+        fetch -> parse -> profile -> news -> posts -> schedule
+        days  ---------------------------------------^
+
+    Picking the schedule days does not depend on anything, so it runs
+    alongside the site fetch and fails fast on invalid input. News is
+    optional: if it fails, or less than ONBOARD_NEWS_MIN_SECONDS are left
+    before the deadline, posts are generated without trending topics.
+    """
+    def fetch(_):
+        return fetch_site(url)
+
+    def parse(inputs):
+        title, text = merge_site_content(inputs["fetch"])
+        return {"title": title, "text": text}
+
+    def profile(inputs):
+        page = inputs["parse"]
+        return analyze_website_business_profile(page["text"], title=page["title"], source_url=url)
+
+    def news(inputs):
+        if not include_news:
+            return []
+        return fetch_industry_news(inputs["profile"].get("industry", ""))
+
+    def posts(inputs):
+        business = inputs["profile"]
+        headlines = [item["headline"] for item in inputs["news"] or []]
+        business_profile = {"name": business.get("name", ""), "industry": business.get("industry", "")}
+        return generate_social_media_posts(
+            business_profile, headlines, preferences, count, tenant=scheduler.tenant
+        )
+
+    def days(_):
+        return scheduler.choose_days(post_frequency, preferred_days)
+
+    def schedule(inputs):
+        chosen_days, generated = inputs["days"], inputs["posts"]
+        if len(generated) < len(chosen_days):
+            raise ValueError("Not enough posts to schedule for chosen days/frequency.")
+        return scheduler.set_schedule(dict(zip(chosen_days, generated)))
+
+    return [
+        Stage("fetch", fetch),
+        Stage("days", days),
+        Stage("parse", parse, deps=["fetch"]),
+        Stage("profile", profile, deps=["parse"]),
+        Stage("news", news, deps=["profile"], optional=True, fallback=[], min_seconds=ONBOARD_NEWS_MIN_SECONDS),
+        Stage("posts", posts, deps=["profile", "news"]),
+        Stage("schedule", schedule, deps=["days", "posts"]),
+    ]
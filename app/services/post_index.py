@@ -0,0 +1,359 @@
+import os
+import re
+import json
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from app.services.schedule_store import SCHEDULE_DB, DEFAULT_TENANT, get_schedule_store
+
+# Estimated Jaccard similarity (of character 5-grams) at or above which two
+# posts count as near-duplicates
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", 0.7))
+# Set POST_DEDUPE=0 to turn near-duplicate filtering off
+POST_DEDUPE = os.getenv("POST_DEDUPE", "1") == "1"
+# Older post list; imported into the default tenant's history on first use
+LEGACY_POSTS_FILE = os.path.join(os.path.dirname(__file__), "../storage/posts.json")
+
+SHINGLE_SIZE = 5
+NUM_PERM = 64
+# 16 bands of 4 rows: posts at 0.7 similarity share a band with ~99% probability
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+# New posts are scanned linearly until this many accumulate, then merged
+# into the sorted band table
+MERGE_AT = 2048
+# Tenant indexes kept in memory per process; the least recently used are
+# dropped and rebuilt from the database when next needed
+POST_INDEX_MAX_TENANTS = int(os.getenv("POST_INDEX_MAX_TENANTS", 256))
+
+GENERATED = "generated"
+SCHEDULED = "scheduled"
+PUBLISHED = "published"
+SOURCES = {GENERATED: 0, SCHEDULED: 1, PUBLISHED: 2}
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+# Fixed seed: signatures are persisted and must stay comparable
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+_BAND_WEIGHTS = np.array([1, 0x9E3779B1, 0x85EBCA77 << 16, 0xC2B2AE3D << 24], dtype=np.uint64)[:ROWS]
+_BAND_OFFSETS = np.arange(BANDS, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+
+
+class NearDuplicateError(ValueError):
+    """
+    Raised when posts repeat earlier ones. `duplicates` maps each rejected
+    key (e.g. a weekday) to the earlier post it repeats.
+    """
+
+    def __init__(self, duplicates):
+        self.duplicates = duplicates
+        super().__init__(
+            "Near-duplicate of an earlier post: " + ", ".join(str(key) for key in duplicates)
+        )
+
+
+def normalize(text: str) -> str:
+    text = re.sub(r"https?://\S+", " ", text.lower())
+    text = re.sub(r"^\s*\d+\.\s*", "", text)
+    return " ".join(re.findall(r"[a-z0-9#@']+", text))
+
+
+def content_digest(text: str) -> bytes:
+    return hashlib.blake2b(normalize(text).encode("utf-8"), digest_size=8).digest()
+
+
+def minhash(text: str) -> np.ndarray:
+    """
+    MinHash signature (NUM_PERM uint32 values) of a post's character 5-grams.
+    """
+    # Normalized text is ASCII, so each 5-gram packs exactly into 40 bits
+    data = np.frombuffer(normalize(text).encode("ascii").ljust(SHINGLE_SIZE), dtype=np.uint8).astype(np.uint64)
+    count = len(data) - SHINGLE_SIZE + 1
+    shingles = np.zeros(count, dtype=np.uint64)
+    for offset in range(SHINGLE_SIZE):
+        shingles = (shingles << np.uint64(8)) | data[offset:offset + count]
+    shingles = np.unique(shingles)
+    with np.errstate(over="ignore"):
+        permuted = (np.outer(_PERM_A, shingles) + _PERM_B[:, None]) % _MERSENNE_PRIME
+    return (permuted.min(axis=1) & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+
+
+def band_keys(signatures: np.ndarray) -> np.ndarray:
+    """
+    One uint64 hash per LSH band for each signature row. The band number is
+    mixed in, so keys of all bands can share one sorted table.
+    """
+    bands = signatures.reshape(-1, BANDS, ROWS).astype(np.uint64)
+    with np.errstate(over="ignore"):
+        return (bands * _BAND_WEIGHTS).sum(axis=2, dtype=np.uint64) + _BAND_OFFSETS
+
+
+class _TenantIndex:
+    """
+    In-memory LSH index of one tenant's post history.
+
+    Signatures and band keys live in growable numpy arrays. The band keys of
+    all posts are also kept in one sorted table, so a lookup is a single
+    vectorized binary search; posts added since the last merge are compared
+    linearly, which stays cheap because merges happen every MERGE_AT posts.
+    `lock` guards the arrays: extend() replaces them as they grow.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.last_rowid = 0
+        self.rowids = np.zeros(0, dtype=np.int64)
+        self.sources = np.zeros(0, dtype=np.uint8)
+        self.digests = np.zeros(0, dtype="S8")
+        self.signatures = np.zeros((0, NUM_PERM), dtype=np.uint32)
+        self.keys = np.zeros((0, BANDS), dtype=np.uint64)
+        self.merged = 0
+        self.sorted_keys = np.zeros(0, dtype=np.uint64)
+        self.sorted_ids = np.zeros(0, dtype=np.int64)
+        self.lock = threading.Lock()
+
+    def _grow(self, extra):
+        needed = self.n + extra
+        if needed <= len(self.rowids):
+            return
+        size = max(needed, 2 * len(self.rowids), 256)
+        for name in ("rowids", "sources", "digests", "signatures", "keys"):
+            old = getattr(self, name)
+            new = np.zeros((size,) + old.shape[1:], dtype=old.dtype)
+            new[:self.n] = old[:self.n]
+            setattr(self, name, new)
+
+    def extend(self, rows):
+        """
+        Append (rowid, source, digest, signature_bytes) rows from the database.
+        """
+        if not rows:
+            return
+        self._grow(len(rows))
+        start, end = self.n, self.n + len(rows)
+        self.rowids[start:end] = [row[0] for row in rows]
+        self.sources[start:end] = [row[1] for row in rows]
+        self.digests[start:end] = [row[2] for row in rows]
+        self.signatures[start:end] = np.frombuffer(b"".join(row[3] for row in rows), dtype=np.uint32).reshape(-1, NUM_PERM)
+        self.keys[start:end] = band_keys(self.signatures[start:end])
+        self.n = end
+        self.last_rowid = max(self.last_rowid, int(rows[-1][0]))
+        if self.n - self.merged >= MERGE_AT:
+            self._merge()
+
+    def _merge(self):
+        keys = self.keys[:self.n].ravel()
+        order = np.argsort(keys, kind="stable")
+        self.sorted_keys = keys[order]
+        self.sorted_ids = order // BANDS
+        self.merged = self.n
+
+    def candidates(self, query_keys):
+        found = []
+        lo = np.searchsorted(self.sorted_keys, query_keys, side="left")
+        hi = np.searchsorted(self.sorted_keys, query_keys, side="right")
+        for start, end in zip(lo[hi > lo], hi[hi > lo]):
+            found.append(self.sorted_ids[start:end])
+        if self.n > self.merged:
+            recent = np.nonzero((self.keys[self.merged:self.n] == query_keys).any(axis=1))[0]
+            found.append(recent + self.merged)
+        if not found:
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate(found))
+
+    def best_match(self, signature, sources=None, ignore=()):
+        """
+        (similarity, rowid) of the most similar indexed post, or (0.0, None).
+        """
+        query_keys = band_keys(signature[None, :])[0]
+        with self.lock:
+            ids = self.candidates(query_keys)
+            if len(ids) and sources is not None:
+                ids = ids[np.isin(self.sources[ids], sources)]
+            if len(ids) and ignore:
+                ids = ids[~np.isin(self.digests[ids], list(ignore))]
+            if not len(ids):
+                return 0.0, None
+            similarity = (self.signatures[ids] == signature).mean(axis=1)
+            best = int(similarity.argmax())
+            return float(similarity[best]), int(self.rowids[ids[best]])
+
+
+class PostIndex:
+    """
+    Near-duplicate detection over each tenant's post history (posts that
+    were generated, scheduled or published), using MinHash signatures and LSH banding.
+
+    History is persisted in the schedule database, so every process sees
+    posts recorded by the others; each process keeps an in-memory index
+    for up to `max_tenants` recently used tenants and pulls in new rows
+    before answering. Lookups touch only
+    the posts that share an LSH band with the query, so they stay well
+    under a millisecond with hundreds of thousands of posts.
+    """
+
+    def __init__(self, path=SCHEDULE_DB, threshold=NEAR_DUPLICATE_THRESHOLD, max_tenants=POST_INDEX_MAX_TENANTS):
+        self.path = path
+        self.threshold = threshold
+        self.max_tenants = max_tenants
+        self._local = threading.local()
+        # LRU order; an evicted tenant is reloaded from the database
+        self._tenants = OrderedDict()
+        self._tenants_lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS post_history ("
+                "id INTEGER PRIMARY KEY, tenant TEXT NOT NULL, source INTEGER NOT NULL, "
+                "digest BLOB NOT NULL, signature BLOB NOT NULL, content TEXT NOT NULL, "
+                "UNIQUE (tenant, source, digest))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS post_history_tenant ON post_history(tenant, id)")
+
+    def _conn(self):
+        # One connection per thread; sqlite3 connections are not thread-safe
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _tenant(self, tenant):
+        """
+        The tenant's index, brought up to date with the database.
+        """
+        with self._tenants_lock:
+            index = self._tenants.get(tenant)
+            created = index is None
+            if created:
+                index = self._tenants[tenant] = _TenantIndex()
+                while len(self._tenants) > self.max_tenants:
+                    self._tenants.popitem(last=False)
+            else:
+                self._tenants.move_to_end(tenant)
+        with index.lock:
+            if created:
+                self._seed(tenant)
+            rows = self._conn().execute(
+                "SELECT id, source, digest, signature FROM post_history WHERE tenant = ? AND id > ? ORDER BY id",
+                (tenant, index.last_rowid),
+            ).fetchall()
+            index.extend(rows)
+        return index
+
+    def _seed(self, tenant):
+        # Start a tenant's history from its current schedule (and, for the
+        # default tenant, the legacy post list) the first time it is used
+        conn = self._conn()
+        if conn.execute("SELECT 1 FROM post_history WHERE tenant = ? LIMIT 1", (tenant,)).fetchone():
+            return
+        posts = list(get_schedule_store().get(tenant)[1].values())
+        if tenant == DEFAULT_TENANT and os.path.exists(LEGACY_POSTS_FILE):
+            try:
+                with open(LEGACY_POSTS_FILE, "r") as f:
+                    legacy = json.load(f)
+            except ValueError:
+                legacy = []
+            for item in legacy if isinstance(legacy, list) else legacy.values():
+                text = item.get("content") if isinstance(item, dict) else item
+                if isinstance(text, str):
+                    posts.append(text)
+        self._insert(tenant, posts, SCHEDULED)
+
+    def _insert(self, tenant, posts, source):
+        rows = [
+            (tenant, SOURCES[source], content_digest(text), minhash(text).tobytes(), text)
+            for text in posts if normalize(text)
+        ]
+        with self._conn() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO post_history (tenant, source, digest, signature, content) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def add(self, tenant, posts, source=GENERATED):
+        """
+        Record posts in a tenant's history.
+        """
+        self._tenant(tenant)
+        self._insert(tenant, posts, source)
+
+    def content(self, rowid):
+        row = self._conn().execute("SELECT content FROM post_history WHERE id = ?", (rowid,)).fetchone()
+        return row[0] if row else None
+
+    def find(self, tenant, text, sources=None, ignore=()):
+        """
+        Most similar earlier post at or above the threshold, as
+        (similarity, content), or None.
+
+        Args:
+            sources (list): Only match posts from these sources (GENERATED,
+                SCHEDULED, PUBLISHED); all by default.
+            ignore (iterable): Content digests (see content_digest) to skip.
+        """
+        index = self._tenant(tenant)
+        source_ids = None if sources is None else [SOURCES[s] for s in sources]
+        similarity, rowid = index.best_match(minhash(text), source_ids, set(ignore))
+        if rowid is None or similarity < self.threshold:
+            return None
+        return similarity, self.content(rowid)
+
+    def check(self, tenant, posts_by_key, sources=None, ignore=()):
+        """
+        Near-duplicates among `posts_by_key` ({key: text}), against the
+        tenant's history and each other. Returns {key: earlier post}.
+        """
+        index = self._tenant(tenant)
+        source_ids = None if sources is None else [SOURCES[s] for s in sources]
+        ignore = set(ignore)
+        duplicates, accepted = {}, []
+        for key, text in posts_by_key.items():
+            signature = minhash(text)
+            similarity, rowid = index.best_match(signature, source_ids, ignore)
+            if rowid is not None and similarity >= self.threshold:
+                duplicates[key] = self.content(rowid)
+                continue
+            twin = next((other for other, sig in accepted
+                         if (sig == signature).mean() >= self.threshold), None)
+            if twin is not None:
+                duplicates[key] = twin
+                continue
+            accepted.append((text, signature))
+        return duplicates
+
+    def filter_new(self, tenant, posts):
+        """
+        Split posts into (fresh, repeated) against the tenant's history and
+        each other.
+        """
+        duplicates = self.check(tenant, dict(enumerate(posts)))
+        fresh = [post for i, post in enumerate(posts) if i not in duplicates]
+        repeated = [post for i, post in enumerate(posts) if i in duplicates]
+        return fresh, repeated
+
+    def size(self, tenant):
+        return self._tenant(tenant).n
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_post_index():
+    """
+    Process-wide PostIndex over the schedule database.
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = PostIndex()
+    return _index
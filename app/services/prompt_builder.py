@@ -0,0 +1,241 @@
+import os
+import re
+import math
+from collections import Counter
+
+from app.services.llm_gateway import count_tokens
+
+# Tokens of page text sent with a profile request (the old 10,000-character
+# cut was ~2,500 tokens, mostly navigation and footer)
+PROFILE_PROMPT_TOKENS = int(os.getenv("PROFILE_PROMPT_TOKENS", 1500))
+# Lines shorter than this many words (menu entries, buttons, headings) are
+# merged with their neighbours instead of forming chunks of their own
+MIN_LINE_WORDS = 6
+# Longer lines are split at sentence boundaries into chunks of at most this
+# (a longer sentence, or a block without punctuation, is cut at this length)
+MAX_CHUNK_WORDS = 120
+# A chunk that does not fit the budget left is cut to fit, unless less
+# than this many tokens are left
+MIN_CUT_TOKENS = 30
+# Short chunks matching these are site chrome, not business description
+BOILERPLATE = re.compile(
+    r"cookie|©|&copy;|copyright|all rights reserved|privacy policy|terms (?:of|and) (?:use|service|conditions)"
+    r"|skip to (?:main )?content|sign in|log in|sign up|subscribe|newsletter|follow us|javascript",
+    re.IGNORECASE,
+)
+BOILERPLATE_MAX_WORDS = 30
+# Chunks made of several merged short lines read like link lists
+LINK_LIST_PENALTY = 0.4
+# Earlier text (hero, intro) is slightly more telling than later text
+POSITION_WEIGHT = 0.3
+
+# Words that signal text about each profile field. Scored with BM25 against
+# the page's own chunks, so words common on the page count for little.
+FIELD_TERMS = {
+    "name": ["about", "welcome", "founded", "established", "since", "company", "brand", "team", "story"],
+    "industry": ["industry", "business", "leading", "provider", "agency", "store", "shop", "restaurant",
+                 "clinic", "studio", "firm", "platform", "manufacturer", "retailer", "specialists"],
+    "services": ["services", "service", "products", "product", "offer", "offers", "offering", "provide",
+                 "provides", "solutions", "specialize", "specialise", "menu", "range", "delivery", "deliver"],
+    "audience": ["customers", "clients", "families", "businesses", "people", "individuals", "teams",
+                 "students", "professionals", "community", "homeowners", "patients", "everyone"],
+    "tone_of_voice": ["passionate", "love", "believe", "friendly", "proud", "committed", "dedicated", "care"],
+    "unique_value_proposition": ["why", "choose", "only", "unique", "quality", "trusted", "award",
+                                 "guarantee", "mission", "promise", "fresh", "fast", "free", "experience",
+                                 "years", "expert", "expertise", "certified", "best"],
+}
+QUERY_TERMS = {term for terms in FIELD_TERMS.values() for term in terms}
+# Title words identify the business, so they weigh more than field terms
+TITLE_TERM_WEIGHT = 2.0
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+_WORD = re.compile(r"[a-z0-9']+")
+_DIGITS = re.compile(r"\d+")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def _words(text):
+    return _WORD.findall(text.lower())
+
+
+def _split_long(line):
+    """
+    Split a long line at sentence boundaries into pieces of at most
+    MAX_CHUNK_WORDS words. A longer sentence (or text without sentence
+    punctuation) is cut every MAX_CHUNK_WORDS words.
+    """
+    pieces, current, size = [], [], 0
+    for sentence in _SENTENCE_END.split(line):
+        words = sentence.split()
+        if len(words) > MAX_CHUNK_WORDS:
+            if current:
+                pieces.append(" ".join(current))
+                current, size = [], 0
+            for start in range(0, len(words), MAX_CHUNK_WORDS):
+                pieces.append(" ".join(words[start:start + MAX_CHUNK_WORDS]))
+            continue
+        if current and size + len(words) > MAX_CHUNK_WORDS:
+            pieces.append(" ".join(current))
+            current, size = [], 0
+        current.append(sentence)
+        size += len(words)
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+def _cut_to_tokens(text, tokens):
+    """
+    Longest prefix of `text`, in whole words, of at most `tokens` tokens.
+    """
+    words = text.split()
+    low, high = 0, len(words)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(" ".join(words[:middle])) <= tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return " ".join(words[:low])
+
+
+def _repeat_key(text):
+    # Product cards and listings often differ only in prices, SKUs or dates
+    return " ".join(_words(_DIGITS.sub("0", text)))
+
+
+def split_chunks(text: str):
+    """
+    Split extracted page text into chunks, dropping boilerplate and repeats
+    (chunks equal up to case, punctuation and numbers).
+
+    Runs of short lines are merged into one chunk (joined with " | "), each
+    distinct line kept once. A single short line just before a paragraph is
+    treated as its heading and kept with it.
+
+    Args:
+        text (str): Visible text, one block per line (as extract_page_content
+            returns it).
+
+    Returns:
+        list[tuple[str, int]]: (chunk, number of merged short lines), in page
+        order.
+    """
+    chunks, seen = [], set()
+
+    def emit(chunk, merged):
+        if len(chunk.split()) <= BOILERPLATE_MAX_WORDS and BOILERPLATE.search(chunk):
+            return
+        key = _repeat_key(chunk)
+        if not key or key in seen:
+            return
+        seen.add(key)
+        chunks.append((chunk, merged))
+
+    short, seen_short = [], set()
+    for line in text.split("\n"):
+        line = " ".join(line.split())
+        if not line:
+            continue
+        if len(line.split()) < MIN_LINE_WORDS:
+            key = _repeat_key(line)
+            if key in seen_short:
+                continue
+            seen_short.add(key)
+            short.append(line)
+            if sum(len(s.split()) for s in short) >= MAX_CHUNK_WORDS:
+                emit(" | ".join(short), len(short))
+                short = []
+            continue
+
+        heading = ""
+        if len(short) == 1:
+            heading = short[0]
+        elif short:
+            emit(" | ".join(short), len(short))
+        short = []
+        for i, piece in enumerate(_split_long(line)):
+            emit(f"{heading}: {piece}" if heading and i == 0 else piece, 0)
+    if short:
+        emit(" | ".join(short), len(short))
+    return chunks
+
+
+def rank_chunks(chunks, title: str = "", fields=None):
+    """
+    Score chunks by how much they say about the business: BM25 of the
+    profile field terms and the title's words, a penalty for link lists and
+    a small bonus for appearing early on the page. `fields` limits the
+    terms to those of some profile fields.
+
+    Returns:
+        list[float]: One score per chunk.
+    """
+    docs = [Counter(_words(chunk)) for chunk, _ in chunks]
+    if not docs:
+        return []
+    terms = QUERY_TERMS if fields is None else {t for field in fields for t in FIELD_TERMS.get(field, ())}
+    weights = {term: 1.0 for term in terms}
+    for term in _words(title):
+        if len(term) > 2:
+            weights[term] = TITLE_TERM_WEIGHT
+
+    n = len(docs)
+    avg_len = sum(sum(doc.values()) for doc in docs) / n or 1
+    df = Counter(term for doc in docs for term in doc.keys() & weights.keys())
+    idf = {term: math.log(1 + (n - count + 0.5) / (count + 0.5)) for term, count in df.items()}
+
+    scores = []
+    for position, (doc, (_, merged)) in enumerate(zip(docs, chunks)):
+        length = sum(doc.values())
+        norm = K1 * (1 - B + B * length / avg_len)
+        score = sum(
+            weights[term] * idf[term] * doc[term] * (K1 + 1) / (doc[term] + norm)
+            for term in idf if term in doc
+        )
+        if merged > 2:
+            score *= LINK_LIST_PENALTY
+        scores.append(score * (1 + POSITION_WEIGHT * (1 - position / n)))
+    return scores
+
+
+def build_profile_prompt(content: str, title: str = "", token_budget: int = PROFILE_PROMPT_TOKENS,
+                         fields=None) -> str:
+    """
+    Build the user prompt of a profile request from a page's visible text.
+
+    Chunks are ranked by rank_chunks and packed best first into
+    `token_budget` tokens (counted with the gateway's tokenizer), then
+    written out in page order so the model reads them in context. Chunks
+    that match no profile term are only used when none do. A chunk larger
+    than the budget left is cut to fit it.
+
+    Args:
+        content (str): Visible page text.
+        title (str): Page title, sent first to help business name detection.
+        token_budget (int): Maximum tokens of the prompt, title included.
+        fields (list[str]): Rank for these profile fields only (default all).
+
+    Returns:
+        str: The prompt.
+    """
+    header = f"Website Title: {title}\n\n" if title else ""
+    remaining = token_budget - count_tokens(header)
+
+    chunks = split_chunks(content)
+    scores = rank_chunks(chunks, title, fields)
+    relevant = [i for i in range(len(chunks)) if scores[i] > 0] or range(len(chunks))
+    chosen = {}
+    for index in sorted(relevant, key=lambda i: -scores[i]):
+        chunk = chunks[index][0]
+        cost = count_tokens(chunk) + 1  # + newline
+        if cost > remaining:
+            if remaining < MIN_CUT_TOKENS:
+                continue
+            chunk = _cut_to_tokens(chunk, remaining - 1)
+            cost = count_tokens(chunk) + 1
+        chosen[index] = chunk
+        remaining -= cost
+    return header + "\n".join(chosen[i] for i in sorted(chosen))
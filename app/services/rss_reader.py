@@ -0,0 +1,197 @@
+import os
+import time
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import HTTPError as URLLibError
+from xml.etree.ElementTree import XMLPullParser, ParseError
+
+from app.services.deadline import is_timeout
+
+logger = logging.getLogger(__name__)
+
+# Seconds to open a connection, and to wait for each read from the socket
+NEWS_CONNECT_TIMEOUT = float(os.getenv("NEWS_CONNECT_TIMEOUT", 3))
+NEWS_READ_TIMEOUT = float(os.getenv("NEWS_READ_TIMEOUT", 5))
+# Wall-clock limit for downloading one feed; a feed trickling in slowly
+# never trips the read timeout, but does trip this one
+NEWS_FETCH_TIMEOUT = float(os.getenv("NEWS_FETCH_TIMEOUT", 8))
+# Feed bytes read at most (after decompression); items found by then are kept
+NEWS_MAX_BYTES = int(os.getenv("NEWS_MAX_BYTES", 2 * 1024 * 1024))
+CHUNK_BYTES = 16 * 1024
+USER_AGENT = "Mozilla/5.0 (compatible; AISocialMediaManager/1.0)"
+
+# One shared session so feed downloads reuse connections; sized for the
+# batch route's concurrent downloads
+session = requests.Session()
+session.mount("https://", HTTPAdapter(pool_maxsize=int(os.getenv("NEWS_BATCH_WORKERS", 8))))
+session.mount("http://", HTTPAdapter(pool_maxsize=int(os.getenv("NEWS_BATCH_WORKERS", 8))))
+
+
+class FeedError(Exception):
+    """
+    The feed could not be downloaded, or held no readable item.
+    """
+
+
+class FeedTimeout(FeedError, TimeoutError):
+    """
+    The feed did not arrive in time.
+    """
+
+
+def _local_name(tag):
+    # "{http://www.w3.org/2005/Atom}entry" -> "entry"
+    return tag.rsplit("}", 1)[-1]
+
+
+def _item(element):
+    """
+    (title, link) of an RSS <item> or Atom <entry>.
+    """
+    title = link = None
+    for child in element:
+        name = _local_name(child.tag)
+        if name == "title":
+            title = " ".join((child.text or "").split())
+        elif name == "link" and link is None:
+            # RSS puts the URL in the text, Atom in href
+            link = (child.text or "").strip() or child.get("href")
+    return title, link
+
+
+def _body_chunks(response):
+    """
+    Response body as it arrives. iter_content() waits for whole chunks,
+    which would hide items already received from a feed that then stalls;
+    read1() (urllib3 2.3+) returns whatever bytes are available.
+    """
+    raw = response.raw
+    if not hasattr(raw, "read1"):
+        yield from response.iter_content(CHUNK_BYTES)
+        return
+    while True:
+        chunk = raw.read1(CHUNK_BYTES, decode_content=True)
+        if not chunk:
+            return
+        yield chunk
+
+
+def read_items(chunks, limit, max_bytes=NEWS_MAX_BYTES, deadline=None):
+    """
+    Parse feed items from a stream of bytes, reading no further than needed.
+
+    Parsing stops as soon as `limit` items are complete, so the cost does
+    not depend on how long the feed is. It also stops after `max_bytes`
+    or at `deadline` (time.monotonic()), keeping the items read so far.
+
+    Args:
+        chunks (iterable[bytes]): Feed body, e.g. response.iter_content().
+        limit (int): Items wanted.
+        max_bytes (int): Bytes to read at most.
+        deadline (float): Optional time.monotonic() value to stop at.
+
+    Returns:
+        tuple[list[dict], bool]: Items as {"title", "link"} dicts, in feed
+        order, and whether reading stopped before the feed or the limit
+        was reached (size cap, deadline or malformed XML).
+
+    Raises:
+        FeedError: If reading stopped early before any item was complete
+            (FeedTimeout when `deadline` stopped it).
+    """
+    parser = XMLPullParser(events=("end",))
+    items = []
+    read = 0
+    reason = None
+    time_out = False
+    for chunk in chunks:
+        read += len(chunk)
+        try:
+            parser.feed(chunk)
+            for _, element in parser.read_events():
+                if _local_name(element.tag) not in ("item", "entry"):
+                    continue
+                title, link = _item(element)
+                # Items are done with once read; drop them from the tree
+                element.clear()
+                if title:
+                    items.append({"title": title, "link": link})
+                    if len(items) >= limit:
+                        return items, False
+        except ParseError as e:
+            reason = f"malformed feed: {e}"
+            break
+        if read >= max_bytes:
+            reason = f"feed larger than {max_bytes} bytes"
+            break
+        if deadline is not None and time.monotonic() >= deadline:
+            reason = "feed download timed out"
+            time_out = True
+            break
+
+    if reason is None:
+        return items, False
+    if not items:
+        error = FeedTimeout if time_out else FeedError
+        raise error(reason.capitalize())
+    logger.info("Kept %d feed items; stopped reading early: %s", len(items), reason)
+    return items, True
+
+
+def fetch_feed(url, limit, etag=None, modified=None, timeout=NEWS_FETCH_TIMEOUT):
+    """
+    Download the first `limit` items of an RSS or Atom feed, with a
+    conditional GET when validators from an earlier download are given.
+
+    The body is streamed into the parser and the connection dropped once
+    `limit` items are read, so long feeds cost no more than short ones.
+    Every read is bounded by NEWS_READ_TIMEOUT, the download by `timeout`
+    and its size by NEWS_MAX_BYTES.
+
+    Args:
+        url (str): Feed URL.
+        limit (int): Items wanted.
+        etag (str): ETag of the earlier download, if any.
+        modified (str): Last-Modified of the earlier download, if any.
+        timeout (float): Seconds for the whole download.
+
+    Returns:
+        dict: "status" (200 or 304), "items" (see read_items; empty on a
+        304), "truncated", and the response's "etag" and "modified".
+
+    Raises:
+        FeedError: On connection errors, timeouts (FeedTimeout), HTTP
+            errors, or a feed without any readable item.
+    """
+    deadline = time.monotonic() + timeout
+    headers = {"User-Agent": USER_AGENT}
+    if etag:
+        headers["If-None-Match"] = etag
+    if modified:
+        headers["If-Modified-Since"] = modified
+
+    try:
+        # Closing the response early discards its connection; the pool
+        # opens another one when needed
+        with session.get(url, headers=headers, stream=True,
+                         timeout=(min(NEWS_CONNECT_TIMEOUT, timeout), min(NEWS_READ_TIMEOUT, timeout))) as response:
+            result = {
+                "status": response.status_code,
+                "items": [],
+                "truncated": False,
+                "etag": response.headers.get("ETag"),
+                "modified": response.headers.get("Last-Modified"),
+            }
+            if response.status_code == 304:
+                return result
+            if response.status_code != 200:
+                raise FeedError(f"Feed request failed with status {response.status_code}")
+            result["items"], result["truncated"] = read_items(
+                _body_chunks(response), limit, deadline=deadline
+            )
+            return result
+    except (requests.RequestException, URLLibError) as e:
+        # read1() raises urllib3's errors (e.g. a read timeout) unwrapped
+        error = FeedTimeout if is_timeout(e) else FeedError
+        raise error(f"Feed request failed: {e}") from e
@@ -0,0 +1,325 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from app.services.instrumentation import stage
+
+WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+DAY_ORDER = {day: i for i, day in enumerate(WEEKDAYS)}
+
+SCHEDULE_DB = os.getenv(
+    "SCHEDULE_DB",
+    os.path.join(os.path.dirname(__file__), "../storage/schedules.sqlite3")
+)
+# Pre-database schedule file; imported into the default tenant on first use
+LEGACY_SCHEDULE_FILE = "weekly_schedule.json"
+# Tenant used when a request does not name a Facebook page
+DEFAULT_TENANT = "default"
+# Publishing time given to posts that were scheduled without one
+DEFAULT_POST_TIME = os.getenv("DEFAULT_POST_TIME", "10:00")
+DEFAULT_TIMEZONE = os.getenv("DEFAULT_TIMEZONE", "UTC")
+
+
+class ScheduleStore:
+    """
+    Weekly schedules for many tenants (Facebook page ids) in one SQLite
+    database running in WAL mode.
+
+    Every write runs in its own IMMEDIATE transaction, touches only the rows
+    it changes and bumps the tenant's version number, so concurrent writers
+    in different threads or gunicorn workers never lose each other's
+    updates. Reads are served from an in-process cache that is refreshed
+    whenever the tenant's version in the database has moved on (i.e. after
+    a write from any process).
+    """
+
+    def __init__(self, path=SCHEDULE_DB):
+        self.path = path
+        self._local = threading.local()
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS posts ("
+                "tenant TEXT NOT NULL, day TEXT NOT NULL, content TEXT NOT NULL, "
+                "PRIMARY KEY (tenant, day)) WITHOUT ROWID"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS tenants ("
+                "tenant TEXT PRIMARY KEY, version INTEGER NOT NULL) WITHOUT ROWID"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(posts)")}
+            if "post_time" not in columns:
+                conn.execute(f"ALTER TABLE posts ADD COLUMN post_time TEXT NOT NULL DEFAULT '{DEFAULT_POST_TIME}'")
+            if "timezone" not in columns:
+                conn.execute(f"ALTER TABLE posts ADD COLUMN timezone TEXT NOT NULL DEFAULT '{DEFAULT_TIMEZONE}'")
+            # Position in the tenant's template rotation (see bulk_planner)
+            if "template_cursor" not in {row[1] for row in conn.execute("PRAGMA table_info(tenants)")}:
+                conn.execute("ALTER TABLE tenants ADD COLUMN template_cursor INTEGER NOT NULL DEFAULT 0")
+            # One row per publish attempt of a post occurrence; the primary key
+            # makes claiming an occurrence idempotent across restarts
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS publications ("
+                "tenant TEXT NOT NULL, day TEXT NOT NULL, due_at INTEGER NOT NULL, "
+                "status TEXT NOT NULL, post_id TEXT, error TEXT, updated_at REAL NOT NULL, "
+                "PRIMARY KEY (tenant, day, due_at)) WITHOUT ROWID"
+            )
+        self._import_legacy_file()
+
+    def _conn(self):
+        # One connection per thread; sqlite3 connections are not thread-safe
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")
+            self._local.conn = conn
+        return conn
+
+    def _import_legacy_file(self):
+        if not os.path.exists(LEGACY_SCHEDULE_FILE):
+            return
+        conn = self._conn()
+        if conn.execute("SELECT 1 FROM tenants WHERE tenant = ?", (DEFAULT_TENANT,)).fetchone():
+            return
+        try:
+            with open(LEGACY_SCHEDULE_FILE, "r") as f:
+                legacy = json.load(f)
+        except ValueError:
+            return
+        posts = {day: content for day, content in legacy.items() if day in WEEKDAYS}
+        self.replace(DEFAULT_TENANT, posts)
+
+    def _transaction(self, tenant, apply):
+        """
+        Run `apply(conn)` in a write transaction and bump the tenant version.
+        Returns the tenant's schedule after the write.
+        """
+        conn = self._conn()
+        with stage("schedule_write"):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                apply(conn)
+                conn.execute(
+                    "INSERT INTO tenants (tenant, version) VALUES (?, 1) "
+                    "ON CONFLICT(tenant) DO UPDATE SET version = version + 1",
+                    (tenant,),
+                )
+                version, schedule = self._read(conn, tenant)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        with self._cache_lock:
+            self._cache[tenant] = (version, schedule)
+        return OrderedDict(schedule)
+
+    def _read(self, conn, tenant):
+        row = conn.execute("SELECT version FROM tenants WHERE tenant = ?", (tenant,)).fetchone()
+        rows = conn.execute("SELECT day, content FROM posts WHERE tenant = ?", (tenant,)).fetchall()
+        schedule = OrderedDict(sorted(rows, key=lambda r: DAY_ORDER[r[0]]))
+        return (row[0] if row else 0), schedule
+
+    def version(self, tenant=DEFAULT_TENANT) -> int:
+        row = self._conn().execute(
+            "SELECT version FROM tenants WHERE tenant = ?", (tenant,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get(self, tenant=DEFAULT_TENANT):
+        """
+        Return (version, schedule) for a tenant. The schedule is a copy.
+        """
+        current = self.version(tenant)
+        with self._cache_lock:
+            cached = self._cache.get(tenant)
+        if cached is None or cached[0] != current:
+            conn = self._conn()
+            conn.execute("BEGIN")
+            try:
+                cached = self._read(conn, tenant)
+            finally:
+                conn.execute("COMMIT")
+            with self._cache_lock:
+                self._cache[tenant] = cached
+        return cached[0], OrderedDict(cached[1])
+
+    def replace(self, tenant, posts_by_day):
+        """
+        Replace a tenant's whole schedule with {day: content}.
+        """
+        def apply(conn):
+            conn.execute("DELETE FROM posts WHERE tenant = ?", (tenant,))
+            conn.executemany(
+                "INSERT INTO posts (tenant, day, content) VALUES (?, ?, ?)",
+                [(tenant, day, content) for day, content in posts_by_day.items()],
+            )
+        return self._transaction(tenant, apply)
+
+    def replace_many(self, tenants, rows, template_cursors):
+        """
+        Replace the schedules of many tenants in one transaction.
+
+        Args:
+            tenants (list[str]): Tenants whose schedules are replaced.
+            rows (list[tuple]): (tenant, day, content, post_time, timezone).
+            template_cursors (list[int]): New rotation cursor per tenant.
+        """
+        conn = self._conn()
+        with stage("schedule_write"):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany("DELETE FROM posts WHERE tenant = ?", [(t,) for t in tenants])
+                conn.executemany(
+                    "INSERT INTO posts (tenant, day, content, post_time, timezone) VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+                conn.executemany(
+                    "INSERT INTO tenants (tenant, version, template_cursor) VALUES (?, 1, ?) "
+                    "ON CONFLICT(tenant) DO UPDATE SET version = version + 1, "
+                    "template_cursor = excluded.template_cursor",
+                    zip(tenants, template_cursors),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        # Versions moved on; cached schedules are reloaded on next read
+        with self._cache_lock:
+            for tenant in tenants:
+                self._cache.pop(tenant, None)
+
+    def template_cursors(self) -> dict:
+        """
+        Template rotation cursor of every tenant that has one.
+        """
+        return dict(self._conn().execute(
+            "SELECT tenant, template_cursor FROM tenants WHERE template_cursor > 0"
+        ))
+
+    def bulk_update(self, tenant, posts_by_day):
+        """
+        Update several existing days at once, all or nothing.
+        Raises KeyError if any day has no scheduled post.
+        """
+        def apply(conn):
+            for day, content in posts_by_day.items():
+                cursor = conn.execute(
+                    "UPDATE posts SET content = ? WHERE tenant = ? AND day = ?",
+                    (content, tenant, day),
+                )
+                if cursor.rowcount == 0:
+                    raise KeyError(f"No scheduled post for {day}")
+        return self._transaction(tenant, apply)
+
+    def update(self, tenant, day, content):
+        return self.bulk_update(tenant, {day: content})
+
+    def delete(self, tenant, day):
+        def apply(conn):
+            cursor = conn.execute("DELETE FROM posts WHERE tenant = ? AND day = ?", (tenant, day))
+            if cursor.rowcount == 0:
+                raise KeyError(f"No scheduled post for {day}")
+        return self._transaction(tenant, apply)
+
+    def reset(self, tenant):
+        return self._transaction(
+            tenant, lambda conn: conn.execute("DELETE FROM posts WHERE tenant = ?", (tenant,))
+        )
+
+    def set_post_time(self, tenant, day, post_time, timezone):
+        """
+        Set when a day's post is published: "HH:MM" in an IANA time zone.
+        """
+        def apply(conn):
+            cursor = conn.execute(
+                "UPDATE posts SET post_time = ?, timezone = ? WHERE tenant = ? AND day = ?",
+                (post_time, timezone, tenant, day),
+            )
+            if cursor.rowcount == 0:
+                raise KeyError(f"No scheduled post for {day}")
+        return self._transaction(tenant, apply)
+
+    def post_times(self, tenant=DEFAULT_TENANT):
+        rows = self._conn().execute(
+            "SELECT day, post_time, timezone FROM posts WHERE tenant = ?", (tenant,)
+        ).fetchall()
+        return OrderedDict(
+            (day, {"time": post_time, "timezone": timezone})
+            for day, post_time, timezone in sorted(rows, key=lambda r: DAY_ORDER[r[0]])
+        )
+
+    def timed_post(self, tenant, day):
+        """
+        Return (content, post_time, timezone) for one post, or None.
+        """
+        return self._conn().execute(
+            "SELECT content, post_time, timezone FROM posts WHERE tenant = ? AND day = ?",
+            (tenant, day),
+        ).fetchone()
+
+    def iter_timed_posts(self, tenant=None):
+        """
+        Yield (tenant, day, post_time, timezone) for every scheduled post,
+        or for one tenant's posts.
+        """
+        conn = self._conn()
+        if tenant is None:
+            cursor = conn.execute("SELECT tenant, day, post_time, timezone FROM posts")
+        else:
+            cursor = conn.execute(
+                "SELECT tenant, day, post_time, timezone FROM posts WHERE tenant = ?", (tenant,)
+            )
+        yield from cursor
+
+    def claim_publication(self, tenant, day, due_at) -> bool:
+        """
+        Record that an occurrence is being published. Returns False if it
+        was already claimed, by this or any other process.
+        """
+        conn = self._conn()
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO publications (tenant, day, due_at, status, updated_at) "
+            "VALUES (?, ?, ?, 'pending', ?)",
+            (tenant, day, int(due_at), time.time()),
+        )
+        return cursor.rowcount == 1
+
+    def finish_publication(self, tenant, day, due_at, status, post_id=None, error=None):
+        self._conn().execute(
+            "UPDATE publications SET status = ?, post_id = ?, error = ?, updated_at = ? "
+            "WHERE tenant = ? AND day = ? AND due_at = ?",
+            (status, post_id, error, time.time(), tenant, day, int(due_at)),
+        )
+
+    def publications(self, tenant, limit=50):
+        rows = self._conn().execute(
+            "SELECT day, due_at, status, post_id, error FROM publications "
+            "WHERE tenant = ? ORDER BY due_at DESC LIMIT ?",
+            (tenant, limit),
+        ).fetchall()
+        return [
+            {"day": day, "due_at": due_at, "status": status, "post_id": post_id, "error": error}
+            for day, due_at, status, post_id, error in rows
+        ]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_schedule_store():
+    """
+    Process-wide ScheduleStore, opened on first use.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ScheduleStore()
+    return _store
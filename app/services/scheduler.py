@@ -1,11 +1,13 @@
 # scheduler.py
 
 import random
-import json
-from collections import OrderedDict
-import os
+from zoneinfo import ZoneInfo
 
-WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+from app.services.schedule_store import WEEKDAYS, DEFAULT_TENANT, get_schedule_store
+from app.services.dispatcher import get_dispatcher, parse_post_time
+from app.services.post_index import (
+    get_post_index, content_digest, NearDuplicateError, POST_DEDUPE, SCHEDULED, PUBLISHED
+)
 
 # Removed emoji prefixes from templates
 POST_TEMPLATES = [
@@ -21,59 +23,137 @@ POST_TEMPLATES = [
     "Poll: What type of content do you want next?"
 ]
 
-SCHEDULE_FILE = "weekly_schedule.json"
-
 class WeeklyScheduler:
-    def __init__(self):
-        self.weekly_schedule = self.load_schedule()
-
-    def load_schedule(self):
-        if os.path.exists(SCHEDULE_FILE):
-            with open(SCHEDULE_FILE, 'r') as f:
-                return OrderedDict(json.load(f))
-        return OrderedDict()
-
-    def save_schedule(self):
-        with open(SCHEDULE_FILE, 'w') as f:
-            json.dump(self.weekly_schedule, f)
-
-    def generate_schedule(self, post_frequency, preferred_days):
+    """
+    Weekly schedule of one tenant (Facebook page), backed by the shared
+    ScheduleStore. Instances are cheap; create one per request.
+    """
+
+    def __init__(self, tenant=DEFAULT_TENANT, store=None):
+        self.tenant = tenant
+        self.store = store or get_schedule_store()
+
+    @property
+    def weekly_schedule(self):
+        return self.store.get(self.tenant)[1]
+
+    @property
+    def version(self):
+        return self.store.version(self.tenant)
+
+    def choose_days(self, post_frequency, preferred_days):
+        """
+        Pick `post_frequency` of the preferred days, in weekday order.
+        """
         preferred_days = [day for day in WEEKDAYS if day in preferred_days]
         if post_frequency > len(preferred_days):
             raise ValueError("Post frequency exceeds number of preferred days.")
+        # Sampling indices keeps the weekday order without sorting by name
+        picked = sorted(random.sample(range(len(preferred_days)), post_frequency))
+        return [preferred_days[i] for i in picked]
 
+    def generate_schedule(self, post_frequency, preferred_days):
         # Choose days and templates
-        chosen_days = random.sample(preferred_days, post_frequency)
+        chosen_days = self.choose_days(post_frequency, preferred_days)
         chosen_templates = random.sample(POST_TEMPLATES, post_frequency)
 
-        # Build a fresh schedule dict (no update)
-        schedule = {day: msg for day, msg in zip(chosen_days, chosen_templates)}
-
-        # Sort by weekday order and assign
-        self.weekly_schedule = OrderedDict(
-            sorted(schedule.items(), key=lambda x: WEEKDAYS.index(x[0]))
-        )
-
-        self.save_schedule()
-        return self.weekly_schedule
+        # Build a fresh schedule (no update), already in weekday order.
+        # Templates are placeholders, so they are not checked for repeats.
+        return self.set_schedule(dict(zip(chosen_days, chosen_templates)), check_duplicates=False)
+
+    def set_schedule(self, posts_by_day, check_duplicates=True):
+        """
+        Replace the whole schedule with the given {day: content} mapping.
+        Raises NearDuplicateError if a post repeats an earlier published one.
+        """
+        unknown = [day for day in posts_by_day if day not in WEEKDAYS]
+        if unknown:
+            raise ValueError(f"Unknown weekday(s): {', '.join(unknown)}")
+        if check_duplicates:
+            self._check_duplicates(posts_by_day, replacing=True)
+        schedule = self.store.replace(self.tenant, posts_by_day)
+        if check_duplicates:
+            self._record(posts_by_day)
+        self._notify_dispatcher()
+        return schedule
+
+    def _check_duplicates(self, posts_by_day, replacing=False):
+        """
+        Reject posts that nearly repeat ones already published (or each
+        other). Posts that were only generated or scheduled don't count, so
+        a post can be re-saved after the schedule is regenerated; neither
+        do the posts being replaced, so a day's post can be lightly edited.
+        """
+        if not POST_DEDUPE:
+            return
+        current = self.weekly_schedule
+        ignore = {
+            content_digest(content) for day, content in current.items()
+            if replacing or day in posts_by_day
+        }
+        duplicates = get_post_index().check(self.tenant, posts_by_day, sources=[PUBLISHED], ignore=ignore)
+        if duplicates:
+            raise NearDuplicateError(duplicates)
+
+    def _record(self, posts_by_day):
+        # Scheduled posts steer generation away from repeats; only published
+        # ones block scheduling
+        if POST_DEDUPE:
+            get_post_index().add(self.tenant, list(posts_by_day.values()), SCHEDULED)
+
+    def record_published(self, content):
+        """
+        Add a post that went out to the tenant's published history.
+        """
+        if POST_DEDUPE:
+            get_post_index().add(self.tenant, [content], PUBLISHED)
+
+    def set_post_time(self, day, post_time, timezone):
+        """
+        Set the local publishing time ("HH:MM") and IANA time zone of a post.
+        """
+        parse_post_time(post_time)
+        try:
+            ZoneInfo(timezone)
+        except Exception:
+            raise ValueError(f"Unknown time zone '{timezone}'")
+        self.store.set_post_time(self.tenant, day, post_time, timezone)
+        self._notify_dispatcher()
+        return self.get_post_times()
+
+    def get_post_times(self):
+        return self.store.post_times(self.tenant)
+
+    def _notify_dispatcher(self):
+        # Let a running auto-publisher pick up new days or times right away
+        dispatcher = get_dispatcher()
+        if dispatcher.running:
+            dispatcher.schedule_tenant(self.tenant)
 
     def get_schedule(self):
         return self.weekly_schedule
 
+    def get_versioned_schedule(self):
+        """
+        Return (version, schedule), read together.
+        """
+        return self.store.get(self.tenant)
+
     def update_post(self, day, content):
-        if day not in self.weekly_schedule:
-            raise KeyError(f"No scheduled post for {day}")
-        self.weekly_schedule[day] = content
-        self.save_schedule()
-        return self.weekly_schedule
+        return self.bulk_update({day: content})
+
+    def bulk_update(self, posts_by_day):
+        """
+        Update several scheduled days in one atomic write.
+        Raises NearDuplicateError if a post repeats an earlier published one.
+        """
+        self._check_duplicates(posts_by_day)
+        schedule = self.store.bulk_update(self.tenant, posts_by_day)
+        self._record(posts_by_day)
+        return schedule
 
     def delete_post(self, day):
-        if day not in self.weekly_schedule:
-            raise KeyError(f"No scheduled post for {day}")
-        del self.weekly_schedule[day]
-        self.save_schedule()
-        return self.weekly_schedule
+        return self.store.delete(self.tenant, day)
 
     def reset_schedule(self):
-        self.weekly_schedule = OrderedDict()
-        self.save_schedule()
+        self.store.reset(self.tenant)
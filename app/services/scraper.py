@@ -1,44 +1,164 @@
 import os
-import re
 import json
+import hashlib
+import logging
+import threading
 import requests
-from bs4 import BeautifulSoup
-from dotenv import load_dotenv
-from groq import Groq  # Groq SDK
 
-# Load environment variables (adjust .env path as needed)
-load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '../../.env'))
+from app.services.page_cache import page_cache
+from app.services.html_extractor import extract_page_content
+from app.services.prompt_builder import build_profile_prompt
+from app.services.json_repair import parse_partial_json
+from app.services.crawler import crawl_site, merge_site_content, PAGE_TIMEOUT
+from app.services.cache import TTLCache, make_backend
+from app.services.llm_gateway import get_gateway, get_api_key, INTERACTIVE, LLM_TIMEOUT
+from app.services.deadline import call_timeout
+from app.services.instrumentation import stage, timed, log_payload
+from app.services.single_flight import SingleFlight, normalize_url
+
+logger = logging.getLogger(__name__)
+
+# Concurrent requests for the same page or the same profile prompt share
+# one upstream call. Profiles are also coordinated across processes when
+# SINGLE_FLIGHT_DB is set, which pays off with the sqlite cache backend.
+page_flight = SingleFlight("page", lease_path="")
+profile_flight = SingleFlight("profile")
+
+# Groq SDK client, created on first use (the SDK is slow to import)
+_client = None
+_client_lock = threading.Lock()
+
+PROFILE_MODEL = "llama-3.1-8b-instant"
+PROFILE_FIELDS = ("name", "industry", "services", "audience", "tone_of_voice", "unique_value_proposition")
+PROFILE_SYSTEM_PROMPT = (
+    "You are a business analyst AI agent. "
+    "Given the text extracted from a company's website, infer the following fields: "
+    "name, industry, services, audience, tone_of_voice, unique_value_proposition. "
+    "services is a list of strings; every other field is a string. "
+    "Return only a JSON object with these keys and no additional explanation."
+)
+PROFILE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        field: {"type": "array", "items": {"type": "string"}} if field == "services" else {"type": "string"}
+        for field in PROFILE_FIELDS
+    },
+    "required": list(PROFILE_FIELDS),
+    "additionalProperties": False,
+}
+# How the model is asked for JSON: "object" (JSON mode, supported by
+# llama-3.1-8b-instant), "schema" (strict JSON-schema mode, for models that
+# support it) or "off"
+PROFILE_JSON_MODE = os.getenv("PROFILE_JSON_MODE", "object")
+# Page text sent when re-asking for fields that were missing or invalid
+PROFILE_FOLLOWUP_TOKENS = int(os.getenv("PROFILE_FOLLOWUP_TOKENS", 400))
+# Expected completion per re-asked field, for the gateway's token budget
+PROFILE_FIELD_COMPLETION_TOKENS = 60
+# Read the site's About/Services/Menu pages too, not just the given URL
+PROFILE_CRAWL = os.getenv("PROFILE_CRAWL", "1") == "1"
+# Typical size of the profile JSON, for the LLM gateway's token budget
+PROFILE_COMPLETION_TOKENS = 300
+
+# Cache of parsed profiles, keyed by a fingerprint of the exact LLM request.
+# PROFILE_CACHE_BACKEND is "memory" (per process) or "sqlite" (shared file).
+profile_cache = TTLCache(
+    backend=make_backend(
+        os.getenv("PROFILE_CACHE_BACKEND", "memory"),
+        path=os.getenv(
+            "PROFILE_CACHE_PATH",
+            os.path.join(os.path.dirname(__file__), "../storage/profile_cache.sqlite3")
+        ),
+        table="profiles",
+    ),
+    ttl=int(os.getenv("PROFILE_CACHE_TTL", 7 * 24 * 3600)),
+    max_entries=int(os.getenv("PROFILE_CACHE_MAX_ENTRIES", 5000)),
+)
+# Fingerprint of each URL's latest profile, kept apart so these lookups
+# neither count in profile_cache's hit rate nor push profiles out of it
+profile_urls = TTLCache(
+    backend=make_backend(
+        os.getenv("PROFILE_CACHE_BACKEND", "memory"),
+        path=os.getenv(
+            "PROFILE_CACHE_PATH",
+            os.path.join(os.path.dirname(__file__), "../storage/profile_cache.sqlite3")
+        ),
+        table="profile_urls",
+    ),
+    ttl=profile_cache.ttl,
+    max_entries=profile_cache.max_entries,
+)
+
+
+def get_client():
+    """
+    Shared Groq client. 429 retries are left to the LLM gateway, which
+    shares rate-limit state with the post generator.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from groq import Groq
+                _client = Groq(api_key=get_api_key(), max_retries=0)
+    return _client
 
-# Load Groq API key from env variable GROQ_API_KEY
-groq_api_key = os.getenv("GROQ_API_KEY")
-if not groq_api_key:
-    raise ValueError("GROQ_API_KEY not found in environment variables")
 
-# Initialize Groq client with your API key
-client = Groq(api_key=groq_api_key)
+@timed("fetch")
+def fetch_html(url: str) -> str:
+    """
+    Fetch a page, revalidating against the on-disk page cache.
 
+    A cached copy is revalidated with If-None-Match / If-Modified-Since and
+    served from disk when the server answers 304 Not Modified. Concurrent
+    fetches of the same URL share one request.
+    """
+    return page_flight.do(normalize_url(url), _fetch_html, url)
+
+
+def _fetch_html(url):
+    headers = {"User-Agent": "Mozilla/5.0"}
+    cached = page_cache.lookup(url)
+    if cached:
+        headers.update(page_cache.conditional_headers(cached))
+
+    response = requests.get(url, headers=headers, timeout=call_timeout(PAGE_TIMEOUT, "Page fetch"))
+    if response.status_code == 304 and cached:
+        body = page_cache.read(url)
+        if body is not None:
+            page_cache.revalidated(url, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+            return body
+        # Body vanished between lookup and read; fall back to a plain fetch
+        response = requests.get(url, headers={"User-Agent": "Mozilla/5.0"},
+                                timeout=call_timeout(PAGE_TIMEOUT, "Page fetch"))
 
-def fetch_html(url: str) -> str:
-    response = requests.get(url, headers={"User-Agent": "Mozilla/5.0"})
     if response.status_code != 200:
         raise Exception(f"Failed to fetch URL {url} — Status code: {response.status_code}")
+
+    page_cache.store(
+        url,
+        response.text,
+        etag=response.headers.get("ETag"),
+        last_modified=response.headers.get("Last-Modified"),
+    )
     return response.text
 
 
+@timed("parse")
 def extract_visible_content(html: str) -> str:
+    from bs4 import BeautifulSoup
     soup = BeautifulSoup(html, "html.parser")
     for tag in soup(["script", "style", "meta", "noscript", "iframe"]):
         tag.decompose()
     tags = soup.find_all(["h1", "h2", "h3", "h4", "h5", "h6", "p", "ul", "ol", "li"])
     text_chunks = [tag.get_text(strip=True) for tag in tags if tag.get_text(strip=True)]
     extracted_text = "\n".join(text_chunks)
-    print("==== Extracted Visible Content (first 2000 chars) ====")
-    print(extracted_text[:2000])
-    print("==== End of Extracted Content ====")
+    log_payload(logger, "Extracted visible content", extracted_text)
     return extracted_text
 
 
+@timed("title")
 def fetch_html_title(html: str) -> str:
+    from bs4 import BeautifulSoup
     soup = BeautifulSoup(html, "html.parser")
     if soup.title and soup.title.string:
         return soup.title.string.strip()
@@ -47,83 +167,300 @@ def fetch_html_title(html: str) -> str:
 
 def clean_json_response(response_text: str) -> dict:
     """
-    Clean and parse JSON from LLM output by removing markdown code fences.
+    Parse the JSON object in LLM output, repairing code fences, trailing
+    prose, single quotes and truncation (see parse_partial_json).
 
     Args:
-        response_text (str): Raw response content from LLM including markdown code fences.
+        response_text (str): Raw response content from LLM.
 
     Returns:
-        dict: Parsed JSON object.
+        dict: Parsed JSON object; fields cut off by truncation are missing.
 
     Raises:
-        json.JSONDecodeError: If JSON parsing fails.
+        ValueError: If the output holds no repairable JSON object.
     """
-    # Remove possible opening `````` and trailing ```
-    cleaned = re.sub(r"^```(?:json)?\s*", "", response_text)  # Remove leading ```
-    cleaned = re.sub(r"\s*```$", "", cleaned)  # Remove trailing ```
-    cleaned = cleaned.strip()
-    return json.loads(cleaned)
+    value, _ = parse_partial_json(response_text)
+    if not isinstance(value, dict):
+        raise ValueError("Expected a JSON object")
+    return value
 
 
-def analyze_website_business_profile(content: str, title: str = "") -> dict:
+def validate_profile(data):
+    """
+    Keep the well-formed profile fields of parsed model output.
+
+    Returns:
+        tuple[dict, list[str]]: (valid fields, missing or invalid fields).
+    """
+    if not isinstance(data, dict):
+        return {}, list(PROFILE_FIELDS)
+    # Some replies wrap the profile, e.g. {"profile": {...}}
+    if not data.keys() & set(PROFILE_FIELDS):
+        data = next((v for v in data.values() if isinstance(v, dict)), data)
+
+    profile, invalid = {}, []
+    for field in PROFILE_FIELDS:
+        value = data.get(field)
+        if field == "services" and isinstance(value, str) and value.strip():
+            value = [item.strip() for item in value.split(",") if item.strip()]
+        if field == "services":
+            ok = isinstance(value, list) and value and all(isinstance(v, str) and v.strip() for v in value)
+        else:
+            ok = isinstance(value, str) and value.strip()
+        if ok:
+            profile[field] = value
+        else:
+            invalid.append(field)
+    return profile, invalid
+
+
+def parse_profile(response_text: str):
+    """
+    Parse and validate a profile reply. Never raises on bad output.
+
+    Returns:
+        tuple[dict, list[str]]: (valid fields, missing or invalid fields).
+    """
+    try:
+        return validate_profile(clean_json_response(response_text))
+    except ValueError:
+        return {}, list(PROFILE_FIELDS)
+
+
+def _response_format(fields):
+    if PROFILE_JSON_MODE == "schema":
+        schema = dict(PROFILE_SCHEMA, properties={f: PROFILE_SCHEMA["properties"][f] for f in fields},
+                      required=list(fields))
+        return {"type": "json_schema", "json_schema": {"name": "business_profile", "schema": schema, "strict": True}}
+    if PROFILE_JSON_MODE == "object":
+        return {"type": "json_object"}
+    return None
+
+
+def _failed_generation(error):
+    """
+    Output the provider rejected in JSON mode (Groq 400 json_validate_failed),
+    so it can still be repaired; None for other errors.
+    """
+    body = getattr(error, "body", None)
+    if isinstance(body, dict):
+        body = body.get("error", body)
+        if isinstance(body, dict) and body.get("code") == "json_validate_failed":
+            return body.get("failed_generation") or ""
+    return None
+
+
+def _request_profile(messages, fields, priority, completion_tokens) -> str:
+    """
+    Send a profile request through the gateway and return the raw reply.
+    """
+    options = {}
+    response_format = _response_format(fields)
+    if response_format:
+        options["response_format"] = response_format
+    try:
+        completion = get_gateway().call(
+            lambda: get_client().chat.completions.create(
+                model=PROFILE_MODEL, messages=messages, timeout=call_timeout(LLM_TIMEOUT, "Profile request"),
+                **options,
+            ),
+            messages,
+            priority=priority,
+            completion_tokens=completion_tokens,
+            usage=lambda result: result.usage.total_tokens,
+        )
+    except Exception as e:
+        failed = _failed_generation(e)
+        if failed is None:
+            raise
+        return failed
+    return completion.choices[0].message.content or ""
+
+
+def followup_messages(profile, missing, content, title):
+    """
+    Short follow-up request for the `missing` fields only: the fields known
+    so far and a PROFILE_FOLLOWUP_TOKENS excerpt of the page ranked for the
+    missing fields, instead of the whole profile prompt.
+    """
+    excerpt = build_profile_prompt(content, title=title, token_budget=PROFILE_FOLLOWUP_TOKENS, fields=missing)
+    system = (
+        "You are a business analyst AI agent. "
+        f"Given an excerpt of a company's website and what is already known about it, infer: {', '.join(missing)}. "
+        + ("services is a list of strings; every other field is a string. " if "services" in missing
+           else "Every field is a string. ")
+        + "Return only a JSON object with these keys and no additional explanation."
+    )
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": f"Known: {json.dumps(profile)}\n\n{excerpt}"},
+    ]
+
+
+def complete_profile(profile, missing, content, title, priority=INTERACTIVE):
+    """
+    Fill in the `missing` fields of a profile with one follow-up request
+    (see followup_messages).
+
+    Raises:
+        ValueError: If fields are still missing afterwards.
+    """
+    messages = followup_messages(profile, missing, content, title)
+    result_text = _request_profile(
+        messages, missing, priority, completion_tokens=PROFILE_FIELD_COMPLETION_TOKENS * len(missing)
+    )
+    log_payload(logger, "Raw profile follow-up output", result_text)
+
+    with stage("json_parse"):
+        extra, _ = parse_profile(result_text)
+    profile = dict(profile, **{field: extra[field] for field in missing if field in extra})
+    still_missing = [field for field in PROFILE_FIELDS if field not in profile]
+    if still_missing:
+        raise ValueError(f"JSON parse error: no valid {', '.join(still_missing)} in the model output")
+    # Same field order as a complete reply
+    return {field: profile[field] for field in PROFILE_FIELDS}
+
+
+def profile_cache_key(prompt_content: str) -> str:
+    """
+    Fingerprint of a profile request: model, system prompt and user prompt.
+    """
+    digest = hashlib.sha256()
+    for part in (PROFILE_MODEL, PROFILE_SYSTEM_PROMPT, prompt_content):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def profile_url_key(url: str) -> str:
+    """
+    Key under which profile_urls keeps the fingerprint of a URL's latest
+    profile.
+    """
+    return "url:" + url.strip().rstrip("/")
+
+
+def latest_profile_version(url: str):
+    """
+    Cache version of the last profile built for `url`, or None.
+    """
+    cache_key = profile_urls.get(profile_url_key(url))
+    return profile_cache.version(cache_key) if cache_key else None
+
+
+def latest_profile(url: str):
+    """
+    Last profile built for `url` while it is still cached, or None.
+    """
+    cache_key = profile_urls.get(profile_url_key(url))
+    return profile_cache.get(cache_key) if cache_key else None
+
+
+def analyze_website_business_profile(content: str, title: str = "", priority: int = INTERACTIVE,
+                                     source_url: str = None) -> dict:
     """
     Use Groq llama-3.1-8b-instant model to analyze website content.
-    Pass the page title explicitly to help business name detection.
+    Pass the page title explicitly to help business name detection, and
+    the site's URL to make the profile available through latest_profile().
     """
 
-    prompt_content = content
-    if title:
-        prompt_content = f"Website Title: {title}\n\n{content}"
+    # Most relevant text that fits the prompt token budget
+    prompt_content = build_profile_prompt(content, title=title)
+
+    # Identical model + prompts always yield the same cached profile
+    cache_key = profile_cache_key(prompt_content)
+    profile = profile_cache.get(cache_key)
+    if profile is None:
+        # Callers profiling the same content at the same time wait for one
+        # LLM request
+        profile = profile_flight.do(cache_key, _analyze_profile, cache_key, prompt_content, content, title,
+                                    priority)
+    if source_url:
+        profile_urls.set(profile_url_key(source_url), cache_key)
+    return profile
+
+
+def _analyze_profile(cache_key, prompt_content, content, title, priority):
+    # Another process may have finished the same profile while this one
+    # waited for the lease
+    cached = profile_cache.get(cache_key)
+    if cached is not None:
+        return cached
 
     messages = [
         {
             "role": "system",
-            "content": (
-                "You are a business analyst AI agent. "
-                "Given the text extracted from a company's website, infer the following fields: "
-                "name, industry, services, audience, tone_of_voice, unique_value_proposition. "
-                "Return only a JSON object with these keys and no additional explanation."
-            )
+            "content": PROFILE_SYSTEM_PROMPT
         },
         {
             "role": "user",
-            "content": prompt_content[:10000]  # Limit content length per request
+            "content": prompt_content
         }
     ]
 
-    completion = client.chat.completions.create(
-        model="llama-3.1-8b-instant",
-        messages=messages,
-    )
-
-    result_text = completion.choices[0].message.content
-    print("==== Raw Model Output ====")
-    print(result_text)
-    print("==== End Raw Output ====")
+    result_text = _request_profile(messages, PROFILE_FIELDS, priority, PROFILE_COMPLETION_TOKENS)
+    log_payload(logger, "Raw profile model output", result_text)
 
-    # Parse JSON from the model response
-    try:
-        profile = clean_json_response(result_text)
-    except Exception as e:
-        print("==== ERROR: Failed JSON parsing ====")
-        print(result_text)
-        raise ValueError(f"JSON parse error: {e}")
+    # Parse JSON from the model response, repairing what can be repaired
+    with stage("json_parse"):
+        profile, missing = parse_profile(result_text)
+    if missing:
+        logger.warning("Profile output lacks valid %s; asking for those only. Output starts %r",
+                       ", ".join(missing), result_text[:200])
+        profile = complete_profile(profile, missing, content, title, priority)
 
+    profile_cache.set(cache_key, profile)
     return profile
 
 
+def fetch_site(url: str):
+    """
+    Fetch the pages a profile is built from: the crawled site, or only
+    `url` when PROFILE_CRAWL is off.
+
+    Returns:
+        list[tuple[str, str]]: (url, html) pairs, `url` first.
+    """
+    if PROFILE_CRAWL:
+        return crawl_site(url)
+    return [(url, fetch_html(url))]
+
+
+def build_business_profile(url: str, progress=None) -> dict:
+    """
+    Run the whole fetch -> parse -> LLM chain for a website URL.
+
+    Args:
+        url (str): Website to profile.
+        progress (callable): Optional callback, called with the name of each
+            stage ("fetch", "parse", "analyze") as it starts.
+
+    Returns:
+        dict: Parsed business profile.
+    """
+    report = progress or (lambda stage: None)
+
+    report("fetch")
+    pages = fetch_site(url)
+
+    report("parse")
+    title, text_content = merge_site_content(pages)
+
+    report("analyze")
+    return analyze_website_business_profile(text_content, title=title, source_url=url)
+
+
 def main():
+    from dotenv import load_dotenv
+    load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '../../.env'))
     url = input("Enter website URL (e.g. https://www.dominos.co.in): ").strip()
 
     try:
         print("🌐 Fetching website content...")
         html = fetch_html(url)
 
-        print("🔍 Extracting visible text from HTML...")
-        text_content = extract_visible_content(html)
-
-        print("🔍 Extracting page title from HTML...")
-        title = fetch_html_title(html)
+        print("🔍 Extracting page title and visible text from HTML...")
+        title, text_content = extract_page_content(html)
 
         print("\n📝 Content preview (first 500 chars):\n")
         print(text_content[:500] + "...\n")
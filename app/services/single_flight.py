@@ -0,0 +1,334 @@
+import os
+import time
+import uuid
+import socket
+import sqlite3
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager, asynccontextmanager
+from urllib.parse import urlsplit, urlunsplit
+
+from app.services.instrumentation import single_flight_calls
+from app.services.deadline import time_left, deadline_passed, check_deadline, is_timeout, DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+# Set to 0 to run every call on its own (for comparisons and debugging)
+SINGLE_FLIGHT = os.getenv("SINGLE_FLIGHT", "1") == "1"
+# SQLite file through which worker processes coordinate; empty keeps
+# coalescing within each process
+SINGLE_FLIGHT_DB = os.getenv("SINGLE_FLIGHT_DB", "")
+# A lease not released within this time (its holder died or hung) is taken over
+SINGLE_FLIGHT_LEASE_SECONDS = float(os.getenv("SINGLE_FLIGHT_LEASE_SECONDS", 120))
+# How often a process waiting for another's lease checks again, at most
+LEASE_POLL_SECONDS = 0.1
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical form of a URL for use as a key: lower-case scheme and host,
+    no default port, no fragment, "/" for an empty path. The query is kept.
+    """
+    parts = urlsplit((url or "").strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    netloc = host if port in (None, _DEFAULT_PORTS.get(scheme)) else f"{host}:{port}"
+    return urlunsplit((scheme, netloc, parts.path or "/", parts.query, ""))
+
+
+class LeaseStore:
+    """
+    Named, expiring leases in a SQLite file shared by every process that
+    opens it. A lease is held by one owner until released or expired.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS leases ("
+                "key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def _conn(self):
+        # sqlite3 connections cannot be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def try_acquire(self, key, owner, seconds) -> bool:
+        """
+        Take the lease on `key` unless another owner holds an unexpired one.
+        """
+        conn = self._conn()
+        now = time.time()
+        # IMMEDIATE takes the write lock up front, so check-and-set is atomic
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT owner, expires_at FROM leases WHERE key = ?", (key,)).fetchone()
+            if row and row[0] != owner and row[1] > now:
+                conn.execute("COMMIT")
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO leases (key, owner, expires_at) VALUES (?, ?, ?)",
+                (key, owner, now + seconds),
+            )
+            conn.execute("COMMIT")
+            return True
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def release(self, key, owner):
+        self._conn().execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner))
+
+
+_lease_stores = {}
+_lease_stores_lock = threading.Lock()
+
+
+def get_lease_store(path):
+    """
+    Process-wide LeaseStore for `path`.
+    """
+    store = _lease_stores.get(path)
+    if store is None:
+        with _lease_stores_lock:
+            store = _lease_stores.get(path)
+            if store is None:
+                store = _lease_stores[path] = LeaseStore(path)
+    return store
+
+
+class _Call:
+    """
+    One in-flight computation and the callers waiting for it.
+    """
+    __slots__ = ("done", "result", "error", "retry", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        # The leader failed for its own reasons (cancelled, out of time),
+        # which say nothing about the followers' calls
+        self.retry = False
+        # (event loop, future) of asyncio callers
+        self.waiters = []
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+def _outcome(call):
+    if call.error is not None:
+        raise call.error
+    return call.result
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key: the first caller (the
+    leader) runs the work and everyone who asks for the key meanwhile
+    waits and gets the same result, or the same exception. Waiting is
+    bounded by the waiter's own deadline, if any, and when the leader was
+    cancelled or ran out of its own time a waiter runs the work itself.
+
+    Thread callers use do(), coroutines use do_async(); both kinds can
+    wait on the same call, from any thread or event loop. Nothing is kept
+    once the call finishes, so caching stays the job of the wrapped
+    function. Results are shared between callers and must not be mutated.
+
+    With a lease store (SINGLE_FLIGHT_DB) the leader also takes a lease
+    named after the key, so one process at a time does the work. Leaders
+    in other processes wait for it and then run the work themselves,
+    which is expected to find the first process's result in a shared
+    cache (the page cache, a SQLite cache backend).
+
+    Args:
+        name (str): Metric label, and prefix of the lease names.
+        lease_path (str): SQLite file for cross-process leases; empty to
+            coalesce within the process only.
+        lease_seconds (float): Lease lifetime; should exceed the slowest
+            call it guards.
+    """
+
+    def __init__(self, name, lease_path=None, lease_seconds=SINGLE_FLIGHT_LEASE_SECONDS):
+        self.name = name
+        self.enabled = SINGLE_FLIGHT
+        lease_path = SINGLE_FLIGHT_DB if lease_path is None else lease_path
+        self.leases = get_lease_store(lease_path) if lease_path else None
+        self.lease_seconds = lease_seconds
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def _join(self, key):
+        """
+        (call, True) for the leader of `key`, (call, False) for the others.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                return call, False
+            call = self._calls[key] = _Call()
+            return call, True
+
+    def _finish(self, key, call, result=None, error=None):
+        with self._lock:
+            del self._calls[key]
+            call.result, call.error = result, error
+            # A timeout shortened to fit the leader's deadline is the leader's own
+            call.retry = isinstance(error, (asyncio.CancelledError, DeadlineExceeded)) or (
+                is_timeout(error) and deadline_passed()
+            )
+            call.done.set()
+            waiters, call.waiters = call.waiters, []
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, future)
+            except RuntimeError:
+                # The waiter's event loop has been closed
+                pass
+
+    def _count(self, role):
+        single_flight_calls.inc((self.name, role))
+
+    def do(self, key, fn, *args, **kwargs):
+        """
+        Run `fn(*args, **kwargs)` unless a call for `key` is in flight, in
+        which case wait for that call's result.
+        """
+        if not self.enabled:
+            return fn(*args, **kwargs)
+        call, leader = self._join(key)
+        while not leader:
+            if not call.done.wait(time_left()):
+                raise DeadlineExceeded(f"Waiting for {self.name}: deadline exceeded")
+            if not call.retry:
+                self._count("shared")
+                return _outcome(call)
+            call, leader = self._join(key)
+
+        try:
+            with self._lease(key):
+                result = fn(*args, **kwargs)
+        except BaseException as e:
+            self._finish(key, call, error=e)
+            raise
+        self._finish(key, call, result=result)
+        return result
+
+    async def do_async(self, key, fn, *args, **kwargs):
+        """
+        Coroutine form of do(): await `fn(*args, **kwargs)` unless a call
+        for `key` is in flight, in which case await that call's result.
+        """
+        if not self.enabled:
+            return await fn(*args, **kwargs)
+        call, leader = self._join(key)
+        while not leader:
+            loop = asyncio.get_running_loop()
+            woken = loop.create_future()
+            with self._lock:
+                if call.done.is_set():
+                    woken.set_result(None)
+                else:
+                    call.waiters.append((loop, woken))
+            # The future only signals completion and belongs to this caller,
+            # so cancelling the caller leaves the leader alone
+            try:
+                await asyncio.wait_for(woken, time_left())
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded(f"Waiting for {self.name}: deadline exceeded") from None
+            if not call.retry:
+                self._count("shared")
+                return _outcome(call)
+            call, leader = self._join(key)
+
+        try:
+            async with self._lease_async(key):
+                result = await fn(*args, **kwargs)
+        except BaseException as e:
+            self._finish(key, call, error=e)
+            raise
+        self._finish(key, call, result=result)
+        return result
+
+    def _new_lease(self, key):
+        return f"{self.name}:{key}", f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex}"
+
+    def _try_lease(self, name, owner) -> bool:
+        try:
+            return self.leases.try_acquire(name, owner, self.lease_seconds)
+        except sqlite3.Error as e:
+            # Coordination is an optimization; never fail the call over it
+            logger.warning("Single-flight lease %s unavailable: %s", name, e)
+            return True
+
+    def _release(self, name, owner):
+        try:
+            self.leases.release(name, owner)
+        except sqlite3.Error as e:
+            logger.warning("Could not release single-flight lease %s: %s", name, e)
+
+    @contextmanager
+    def _lease(self, key):
+        if self.leases is None:
+            self._count("leader")
+            yield
+            return
+        name, owner = self._new_lease(key)
+        delay = 0.01
+        if not self._try_lease(name, owner):
+            self._count("lease_wait")
+            while not self._try_lease(name, owner):
+                check_deadline(f"Waiting for {self.name}")
+                time.sleep(min(delay, time_left() or delay))
+                delay = min(delay * 2, LEASE_POLL_SECONDS)
+        self._count("leader")
+        try:
+            yield
+        finally:
+            self._release(name, owner)
+
+    @asynccontextmanager
+    async def _lease_async(self, key):
+        if self.leases is None:
+            self._count("leader")
+            yield
+            return
+        name, owner = self._new_lease(key)
+        delay = 0.01
+        if not self._try_lease(name, owner):
+            self._count("lease_wait")
+            while not self._try_lease(name, owner):
+                check_deadline(f"Waiting for {self.name}")
+                await asyncio.sleep(min(delay, time_left() or delay))
+                delay = min(delay * 2, LEASE_POLL_SECONDS)
+        self._count("leader")
+        try:
+            yield
+        finally:
+            self._release(name, owner)
+
+    def stats(self) -> dict:
+        """
+        Calls per role in this process: "leader" ran the work, "shared" got
+        another caller's result (an upstream call saved), "lease_wait"
+        waited for another process first.
+        """
+        return {role: single_flight_calls.value((self.name, role)) for role in ("leader", "shared", "lease_wait")}
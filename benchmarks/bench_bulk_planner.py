@@ -0,0 +1,139 @@
+"""
+Plan weekly schedules for many pages: the vectorized bulk planner against
+one WeeklyScheduler.generate_schedule call per page.
+
+Pages get random constraints (preferred days, posting windows, time zones,
+minimum spacing, some with their own templates). The report times parsing
+plus planning and the single-transaction write separately, then checks
+the plans: posts per page, spacing, posts inside the window, and no
+template repeated before a page's pool is used up, over several weeks.
+
+Usage:
+    python -m benchmarks.bench_bulk_planner [--pages N] [--weeks N] [--baseline-pages N]
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+from collections import defaultdict
+
+import numpy as np
+
+from app.services.schedule_store import ScheduleStore, WEEKDAYS
+from app.services.scheduler import WeeklyScheduler, POST_TEMPLATES
+from app.services.bulk_planner import PageConstraints, plan_week, plan_pages
+
+TIMEZONES = ["UTC", "Asia/Kolkata", "America/New_York", "Europe/Berlin", "Australia/Sydney"]
+
+
+def synthetic_pages(rng, count):
+    pages = []
+    for i in range(count):
+        days = rng.sample(WEEKDAYS, rng.randint(2, 7))
+        start = rng.randint(6, 14)
+        page = {
+            "page_id": f"page-{i}",
+            "post_frequency": rng.randint(1, len(days)),
+            "preferred_days": days,
+            "window_start": f"{start:02d}:00",
+            "window_end": f"{start + rng.randint(0, 8):02d}:30",
+            "timezone": rng.choice(TIMEZONES),
+            "min_gap_hours": rng.choice([0, 0, 24, 36, 48]),
+        }
+        if i % 10 == 0:
+            page["templates"] = [f"Page {i} story #{n}" for n in range(rng.randint(3, 12))]
+        pages.append(page)
+    return pages
+
+
+def check_plans(pages, weeks_of_plans):
+    """
+    Count violated constraints over consecutive weeks of plans.
+    """
+    by_id = {page["page_id"]: page for page in pages}
+    problems = defaultdict(int)
+    history = defaultdict(list)
+    for plans in weeks_of_plans:
+        for page_id, posts in plans.items():
+            page = by_id[page_id]
+            days = [WEEKDAYS.index(post["day"]) for post in posts]
+            if any(WEEKDAYS[d] not in page["preferred_days"] for d in days):
+                problems["outside preferred days"] += 1
+            if len(posts) > page["post_frequency"]:
+                problems["over frequency"] += 1
+            if len(days) > 1:
+                gaps = [(b - a) % 7 or 7 for a, b in zip(days, days[1:] + days[:1])]
+                if min(gaps) * 24 < page["min_gap_hours"]:
+                    problems["spacing"] += 1
+            for post in posts:
+                if not page["window_start"] <= post["time"] <= page["window_end"]:
+                    problems["outside window"] += 1
+            history[page_id].extend(post["content"] for post in posts)
+
+    for page_id, contents in history.items():
+        pool = len(by_id[page_id].get("templates") or POST_TEMPLATES)
+        for start in range(0, len(contents), pool):
+            cycle = contents[start:start + pool]
+            if len(set(cycle)) != len(cycle):
+                problems["template repeated within a rotation"] += 1
+                break
+    return dict(problems)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=10000)
+    parser.add_argument("--weeks", type=int, default=4)
+    parser.add_argument("--baseline-pages", type=int, default=500,
+                        help="pages planned one by one with WeeklyScheduler (extrapolated)")
+    args = parser.parse_args()
+
+    pages = synthetic_pages(random.Random(7), args.pages)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ScheduleStore(os.path.join(tmp, "bulk.sqlite3"))
+
+        start = time.perf_counter()
+        constraints = PageConstraints(pages, POST_TEMPLATES)
+        parsed = time.perf_counter()
+        plan = plan_week(constraints, np.zeros(len(constraints), dtype=np.int64))
+        planned = time.perf_counter()
+
+        weeks, call_times = [], []
+        for _ in range(args.weeks):
+            call_start = time.perf_counter()
+            result = plan_pages(pages, POST_TEMPLATES, store=store)
+            call_times.append(time.perf_counter() - call_start)
+            weeks.append(result["plans"])
+
+        # The write alone: replay the last call's rows
+        rows = [
+            (page_id, post["day"], post["content"], post["time"], post["timezone"])
+            for page_id, posts in weeks[-1].items() for post in posts
+        ]
+        write_start = time.perf_counter()
+        store.replace_many(list(weeks[-1]), rows, [0] * len(weeks[-1]))
+        write_time = time.perf_counter() - write_start
+
+        baseline_store = ScheduleStore(os.path.join(tmp, "baseline.sqlite3"))
+        baseline_start = time.perf_counter()
+        for page in pages[:args.baseline_pages]:
+            frequency = min(page["post_frequency"], len(page["preferred_days"]))
+            WeeklyScheduler(page["page_id"], store=baseline_store).generate_schedule(
+                frequency, page["preferred_days"]
+            )
+        per_page = (time.perf_counter() - baseline_start) / max(1, args.baseline_pages)
+
+    print(f"{args.pages} pages, {len(plan['page'])} posts per week")
+    print(f"{'step':<36}{'ms':>10}")
+    print(f"{'parse constraints':<36}{(parsed - start) * 1000:>10.1f}")
+    print(f"{'plan week (vectorized)':<36}{(planned - parsed) * 1000:>10.1f}")
+    print(f"{'write (one transaction)':<36}{write_time * 1000:>10.1f}")
+    print(f"{'plan_pages end to end (median)':<36}{sorted(call_times)[len(call_times) // 2] * 1000:>10.1f}")
+    print(f"{'per-page generate_schedule (est.)':<36}{per_page * args.pages * 1000:>10.1f}")
+    problems = check_plans(pages, weeks)
+    print(f"constraint violations over {args.weeks} weeks: {problems or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Measure crawl wall time against a single fetch and a sequential crawl.
+
+Runs the local site stub with a fixed per-request latency and compares:
+fetch_html on the home page alone, fetching the same pages one after the
+other, and crawl_site. The page cache is pointed at a temporary directory
+so every run goes to the network.
+
+Usage:
+    python -m benchmarks.bench_crawl [--latency-ms MS] [--runs N]
+"""
+import os
+import time
+import argparse
+import tempfile
+import statistics
+
+from benchmarks.stubs.site_stub import start_site_stub
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Imported after the cache location is set
+        os.environ["PAGE_CACHE_DIR"] = tmp
+        from app.services.page_cache import page_cache
+        from app.services.scraper import fetch_html
+        from app.services.crawler import crawl_site, merge_site_content
+
+        server, state = start_site_stub(latency=args.latency_ms / 1000)
+        home = f"http://127.0.0.1:{server.server_port}/"
+        try:
+            pages = [url for url, _ in crawl_site(home)]
+            title, text = merge_site_content(crawl_site(home))
+
+            def sequential():
+                for url in pages:
+                    fetch_html(url)
+
+            timings = {}
+            for label, fn in (
+                ("single fetch", lambda: fetch_html(home)),
+                (f"sequential x{len(pages)}", sequential),
+                (f"crawl_site x{len(pages)}", lambda: crawl_site(home)),
+            ):
+                runs = []
+                for _ in range(args.runs):
+                    page_cache.clear()
+                    start = time.perf_counter()
+                    fn()
+                    runs.append((time.perf_counter() - start) * 1000)
+                timings[label] = statistics.median(runs)
+        finally:
+            server.shutdown()
+
+    print(f"site latency {args.latency_ms:.0f} ms per request; crawled pages:")
+    for url in pages:
+        print(f"  {url}")
+    print(f"merged text: {len(text)} chars, title '{title}'")
+    print(f"{'mode':<18}{'median ms':>11}")
+    for label, ms in timings.items():
+        print(f"{label:<18}{ms:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark near-duplicate lookups against a large post history.
+
+Builds a tenant history of synthetic posts in a temporary database, then
+times PostIndex.find() for lightly edited copies of stored posts (which
+should be found) and for new posts (which should not).
+
+Usage:
+    python -m benchmarks.bench_dedupe [--posts N] [--queries N]
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+import statistics
+
+from app.services.post_index import PostIndex, GENERATED
+
+# A few thousand pseudo-words, roughly the working vocabulary of real posts
+_letters = random.Random(1)
+WORDS = ["".join(_letters.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(_letters.randint(3, 9)))
+         for _ in range(3000)]
+
+
+def make_post(rng):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(18, 40))]
+    tags = " ".join("#" + rng.choice(WORDS).capitalize() for _ in range(3))
+    return " ".join(words).capitalize() + ". " + tags
+
+
+def edit(rng, post):
+    words = post.split()
+    for _ in range(2):
+        words[rng.randrange(len(words))] = rng.choice(WORDS)
+    return " ".join(words)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    posts = [make_post(rng) for _ in range(args.posts)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = PostIndex(path=os.path.join(tmp, "history.sqlite3"))
+        start = time.perf_counter()
+        for i in range(0, len(posts), 10_000):
+            index.add("bench", posts[i:i + 10_000], GENERATED)
+        index.size("bench")
+        build = time.perf_counter() - start
+
+        results = {}
+        for label, queries in (
+            ("near-duplicate", [edit(rng, rng.choice(posts)) for _ in range(args.queries)]),
+            ("new post", [make_post(rng) + " " + str(i) for i in range(args.queries)]),
+        ):
+            timings, hits = [], 0
+            for text in queries:
+                t = time.perf_counter()
+                hits += index.find("bench", text) is not None
+                timings.append((time.perf_counter() - t) * 1e6)
+            results[label] = (hits, timings)
+
+    print(f"history: {args.posts} posts, indexed in {build:.1f} s")
+    print(f"{'query':<16}{'matched':>9}{'p50 us':>9}{'p99 us':>9}{'mean us':>9}")
+    for label, (hits, timings) in results.items():
+        print(f"{label:<16}{hits / args.queries:>9.1%}{percentile(timings, 0.5):>9.0f}"
+              f"{percentile(timings, 0.99):>9.0f}{statistics.mean(timings):>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
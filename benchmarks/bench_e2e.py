@@ -0,0 +1,290 @@
+"""
+Offline end-to-end benchmark of every API route.
+
+Starts local stand-ins for every upstream: a small-business website, a
+Google News RSS feed, an OpenAI-compatible LLM and the Facebook Graph API.
+Then it serves the app on a local port with every setting pointed at
+them, and all state in a temporary directory. Each scenario sends
+`--requests` requests to one route from `--concurrency` client threads.
+
+The report is JSON. For every route: throughput, errors and
+p50/p95/p99/mean latency. For every stage: the same latency percentiles,
+taken from the onboarding pipeline's stage report and from Server-Timing
+headers. Upstream call counts are included, so runs can be diffed to
+catch regressions or compare optimizations.
+
+Usage:
+    python -m benchmarks.bench_e2e [--concurrency N] [--requests N] [--distinct N]
+        [--only SCENARIO ...] [--llm-latency-ms MS] [--site-latency-ms MS]
+        [--rss-latency-ms MS] [--graph-latency-ms MS] [--out FILE]
+
+--distinct is the number of different websites, industries and businesses
+the requests cycle through (default: all different, so caches stay cold).
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import contextlib
+import tempfile
+import threading
+import statistics
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.stubs.llm_stub import start_llm_stub
+from benchmarks.stubs.site_stub import start_site_stub
+from benchmarks.stubs.rss_stub import start_rss_stub
+from benchmarks.stubs.graph_stub import start_graph_stub
+
+# Days planner.generate schedules; planner.update edits them
+PLANNED_DAYS = ["Mon", "Wed", "Fri"]
+WORDS = ["launch", "weekend", "fresh", "community", "offer", "story", "behind", "team", "season", "local",
+         "recipe", "favourite", "guide", "tips", "event", "thanks", "customers", "new", "classic", "spotlight"]
+SERVER_TIMING = re.compile(r"([\w.-]+);(?:[^,]*?)dur=([\d.]+)")
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def summarize(timings):
+    return {
+        "p50_ms": round(percentile(timings, 0.50), 1),
+        "p95_ms": round(percentile(timings, 0.95), 1),
+        "p99_ms": round(percentile(timings, 0.99), 1),
+        "mean_ms": round(statistics.mean(timings), 1),
+    }
+
+
+def unique_text(i, rng):
+    return f"Post {i}: " + " ".join(rng.choice(WORDS) for _ in range(16)) + f" #{i}"
+
+
+def build_scenarios(site_url, distinct):
+    """
+    Scenario name -> function(i, rng) returning (method, path, json body,
+    headers) for the i-th request.
+    """
+    # Each scenario gets its own inputs, so one can't warm caches for another
+    def site(tag, i):
+        return f"{site_url}?site={tag}{i % distinct}"
+
+    def industry(tag, i):
+        return f"{tag} industry {i % distinct}"
+
+    def business(tag, i):
+        return {"name": f"{tag} business {i % distinct}", "industry": industry(tag, i), "tone": "friendly",
+                "post_type": "promo", "count": 3}
+
+    return {
+        "business.profile": lambda i, rng: ("POST", "/api/business/profile", {"website_url": site("Profile", i)}, {}),
+        "business.cache_stats": lambda i, rng: ("GET", "/api/business/profile/cache-stats", None, {}),
+        "news.industry": lambda i, rng: ("POST", "/api/news/industry-news", {"industry": industry("single", i)}, {}),
+        "news.batch": lambda i, rng: (
+            "POST", "/api/news/industry-news/batch",
+            {"industries": [industry("batch", i * 5 + k) for k in range(5)]}, {},
+        ),
+        "content.generate": lambda i, rng: (
+            "POST", "/api/content/generate-posts", dict(business("generate", i), page_id=f"gen-{i}"), {},
+        ),
+        "content.stream": lambda i, rng: (
+            "POST", "/api/content/generate-posts", dict(business("stream", i), page_id=f"stream-{i}", stream=True), {},
+        ),
+        "content.bulk": lambda i, rng: (
+            "POST", "/api/content/generate-posts/bulk",
+            {"jobs": [dict(business("bulk", i * 5 + k), page_id=f"bulk-{i}-{k}") for k in range(5)]}, {},
+        ),
+        "planner.generate": lambda i, rng: (
+            "POST", "/api/weekly-planner/", {"post_frequency": 3, "preferred_days": PLANNED_DAYS},
+            {"X-Page-Id": f"plan-{i}"},
+        ),
+        "planner.get": lambda i, rng: ("GET", "/api/weekly-planner/", None, {"X-Page-Id": f"plan-{i}"}),
+        "planner.update": lambda i, rng: (
+            "PUT", f"/api/weekly-planner/{PLANNED_DAYS[i % 3]}", {"content": unique_text(i, rng)},
+            {"X-Page-Id": f"plan-{i}"},
+        ),
+        "facebook.publish": lambda i, rng: (
+            "POST", "/api/facebook/publish", {"day": "Mon", "message": unique_text(i, rng)},
+            # All to one page, so this shows the publisher's per-page pacing (FB_PAGE_RATE)
+            {"X-Page-Id": "bench-fb"},
+        ),
+        "pipeline.onboard": lambda i, rng: (
+            "POST", "/api/pipeline/onboard",
+            {"website_url": site("Onboard", i), "tone": "friendly", "post_type": "promo", "count": 3,
+             "post_frequency": 3, "preferred_days": ["Mon", "Wed", "Fri"]},
+            {"X-Page-Id": f"onboard-{i}"},
+        ),
+        "llm.status": lambda i, rng: ("GET", "/api/llm/status", None, {}),
+    }
+
+
+def configure_environment(tmp, llm, site, rss, graph):
+    """
+    Point every upstream at the stand-ins and all state at `tmp`. Must run
+    before the app modules are imported (they read settings on import).
+    """
+    llm_base = f"http://127.0.0.1:{llm.server_port}"
+    os.environ.update({
+        "GROQ_API_KEY": "stub-key",
+        "GROQ_BASE_URL": llm_base,
+        "GROQ_API_URL": f"{llm_base}/openai/v1/chat/completions",
+        "NEWS_RSS_URL": f"http://127.0.0.1:{rss.server_port}/rss/search?q={{query}}",
+        "GRAPH_API_URL": f"http://127.0.0.1:{graph.server_port}/v19.0",
+        "FB_PUBLISH_MODE": "live",
+        "SCHEDULE_DB": os.path.join(tmp, "schedule.sqlite3"),
+        "LLM_GATEWAY_DB": os.path.join(tmp, "llm_gateway.sqlite3"),
+        "PAGE_CACHE_DIR": os.path.join(tmp, "page_cache"),
+        # The stub has no provider quota to protect
+        "LLM_RPM": "0",
+        "LLM_TPM": "0",
+    })
+    os.environ.pop("AUTO_PUBLISH", None)
+    # Credentials and legacy JSON files are relative to the working directory
+    os.chdir(tmp)
+
+
+def serve_app():
+    from werkzeug.serving import make_server
+    from app import create_app
+
+    server = make_server("127.0.0.1", 0, create_app(), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def setup(base_url):
+    # Facebook publishing needs connected credentials and a scheduled post
+    requests.post(f"{base_url}/api/facebook/connect").raise_for_status()
+    requests.post(
+        f"{base_url}/api/weekly-planner/", json={"post_frequency": 1, "preferred_days": ["Mon"]},
+        headers={"X-Page-Id": "bench-fb"},
+    ).raise_for_status()
+
+
+def run_scenario(base_url, build, count, concurrency, stages):
+    local = threading.local()
+    timings, errors = [], []
+    lock = threading.Lock()
+
+    def one(i):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        method, path, body, headers = build(i, random.Random(i))
+        start = time.perf_counter()
+        try:
+            response = session.request(method, base_url + path, json=body, headers=headers, timeout=300)
+            content = response.content  # reads streamed bodies to the end
+            elapsed = (time.perf_counter() - start) * 1000
+            ok = response.status_code < 400
+        except requests.RequestException as e:
+            elapsed, ok, response, content = (time.perf_counter() - start) * 1000, False, None, str(e)
+
+        with lock:
+            timings.append(elapsed)
+            if not ok:
+                errors.append(response.status_code if response is not None else content)
+                return
+            for name, dur in SERVER_TIMING.findall(response.headers.get("Server-Timing", "")):
+                stages[name].append(float(dur))
+            if response.headers.get("Content-Type", "").startswith("application/json"):
+                data = json.loads(content)
+                for name, report in (data.get("stages") or {}).items() if isinstance(data, dict) else ():
+                    if isinstance(report, dict) and "ms" in report:
+                        stages[f"pipeline.{name}"].append(report["ms"])
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(count)))
+    wall = time.perf_counter() - start
+
+    result = {"requests": count, "errors": len(errors), "throughput_rps": round(count / wall, 2)}
+    result.update(summarize(timings))
+    if errors:
+        result["error_samples"] = [str(e)[:200] for e in errors[:3]]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=40, help="requests per scenario")
+    parser.add_argument("--distinct", type=int, default=0, help="distinct inputs per scenario (0: all)")
+    parser.add_argument("--only", nargs="*", help="scenario names to run (default: all)")
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--site-latency-ms", type=float, default=100)
+    parser.add_argument("--rss-latency-ms", type=float, default=100)
+    parser.add_argument("--graph-latency-ms", type=float, default=50)
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+    out_path = os.path.abspath(args.out) if args.out else None
+
+    llm, llm_state = start_llm_stub(latency=args.llm_latency_ms / 1000, ttft=args.llm_latency_ms / 2000,
+                                    chunk_delay=0.005)
+    site, site_state = start_site_stub(latency=args.site_latency_ms / 1000)
+    rss, rss_state = start_rss_stub(latency=args.rss_latency_ms / 1000)
+    graph, graph_state = start_graph_stub(latency=args.graph_latency_ms / 1000, app_limit=10**6,
+                                          page_limit=10**6)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = os.getcwd()
+        configure_environment(tmp, llm, site, rss, graph)
+        try:
+            with contextlib.redirect_stdout(sys.stderr):
+                server, base_url = serve_app()
+                setup(base_url)
+
+            scenarios = build_scenarios(f"http://127.0.0.1:{site.server_port}/", args.distinct or args.requests)
+            unknown = set(args.only or ()) - scenarios.keys()
+            if unknown:
+                parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+
+            routes, stages = {}, defaultdict(list)
+            # The app logs with print(); keep stdout for the report
+            with contextlib.redirect_stdout(sys.stderr):
+                for name, build in scenarios.items():
+                    if args.only and name not in args.only:
+                        continue
+                    print(f"running {name} ...")
+                    routes[name] = run_scenario(base_url, build, args.requests, args.concurrency, stages)
+            server.shutdown()
+        finally:
+            os.chdir(cwd)
+
+    report = {
+        "config": {
+            "concurrency": args.concurrency, "requests": args.requests,
+            "distinct": args.distinct or args.requests,
+            "latency_ms": {"llm": args.llm_latency_ms, "site": args.site_latency_ms,
+                           "rss": args.rss_latency_ms, "graph": args.graph_latency_ms},
+        },
+        "routes": routes,
+        "stages": {name: dict(samples=len(values), **summarize(values)) for name, values in sorted(stages.items())},
+        "upstream": {
+            "llm_requests": llm_state.requests,
+            "site_requests": sum(site_state.hits.values()),
+            "rss_requests": sum(rss_state.hits.values()),
+            "rss_not_modified": rss_state.not_modified,
+            "graph_requests": graph_state.requests,
+        },
+    }
+    text = json.dumps(report, indent=2)
+    if out_path:
+        with open(out_path, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    for server in (llm, site, rss, graph):
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark the single-pass extractor against the two BeautifulSoup passes.
+
+Usage:
+    python -m benchmarks.bench_extraction [CORPUS_DIR] [--repeat N] [--budget CHARS]
+
+CORPUS_DIR is a directory of saved HTML pages (any file inside it, recursively).
+The on-disk page cache (app/storage/page_cache) works as a corpus too. Without
+a corpus, synthetic pages from 50 KB to 4 MB are generated.
+"""
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+
+from app.services.html_extractor import extract_page_content, DEFAULT_TEXT_BUDGET
+from app.services.scraper import extract_visible_content, fetch_html_title
+
+
+def synthetic_page(size_bytes: int) -> str:
+    nav = "".join(f"<li><a href='/p{i}'>Link {i}</a></li>" for i in range(40))
+    block = (
+        "<div class='card'><h2>Our Services</h2>"
+        "<p>We bake fresh pizza with hand-picked ingredients every single day.</p>"
+        "<ul><li>Dine in</li><li>Takeaway</li><li>Delivery</li></ul>"
+        "<script>var tracking = {id: 42, events: []};</script></div>"
+    )
+    head = f"<html><head><title>Synthetic Pizza Co</title><style>body{{margin:0}}</style></head><body><nav><ul>{nav}</ul></nav>"
+    repeats = max(1, (size_bytes - len(head)) // len(block))
+    return head + block * repeats + "</body></html>"
+
+
+def load_corpus(corpus_dir):
+    pages = []
+    if corpus_dir:
+        for root, _, files in os.walk(corpus_dir):
+            for name in sorted(files):
+                if name.endswith((".json", ".tmp", ".sqlite3", ".sqlite3-wal", ".sqlite3-shm")):
+                    continue
+                with open(os.path.join(root, name), "r", encoding="utf-8", errors="replace") as f:
+                    pages.append((name, f.read()))
+    if not pages:
+        for size in (50_000, 250_000, 1_000_000, 4_000_000):
+            pages.append((f"synthetic-{size // 1000}KB", synthetic_page(size)))
+    return pages
+
+
+def two_pass(html, budget):
+    # Mirrors the old route: two full parses, then the analyzer's cut
+    text = extract_visible_content(html)
+    title = fetch_html_title(html)
+    return title, text[:budget]
+
+
+def measure(fn, html, budget, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(html, budget)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn(html, budget)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus_dir", nargs="?")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--budget", type=int, default=DEFAULT_TEXT_BUDGET)
+    args = parser.parse_args()
+
+    # The old extractor prints a preview of every page; keep the report readable
+    devnull = open(os.devnull, "w")
+
+    print(f"{'page':<28}{'size':>10}{'bs4 x2 ms':>12}{'single ms':>12}{'speedup':>9}{'bs4 peak':>11}{'single peak':>13}")
+    for name, html in load_corpus(args.corpus_dir):
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            old_time, old_peak = measure(two_pass, html, args.budget, args.repeat)
+        finally:
+            sys.stdout = stdout
+        new_time, new_peak = measure(
+            lambda h, b: extract_page_content(h, text_budget=b), html, args.budget, args.repeat
+        )
+        print(
+            f"{name[:27]:<28}{len(html) // 1024:>8}KB"
+            f"{old_time * 1000:>12.1f}{new_time * 1000:>12.1f}{old_time / new_time:>8.1f}x"
+            f"{old_peak / 2**20:>9.1f}MB{new_peak / 2**20:>11.1f}MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
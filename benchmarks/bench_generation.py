@@ -0,0 +1,53 @@
+"""
+Benchmark post generation against the local LLM stub, with and without the
+completion cache.
+
+Usage:
+    python -m benchmarks.bench_generation [--requests N] [--latency-ms MS] [--variants N]
+"""
+import os
+import time
+import argparse
+import statistics
+
+from benchmarks.stubs.llm_stub import start_llm_stub
+
+os.environ.setdefault("GROQ_API_KEY", "stub-key")
+
+
+def run(generator, requests_count):
+    profile = {"name": "Stub Pizza Co", "industry": "Food and Beverages"}
+    preferences = {"tone": "friendly", "post_type": "promo"}
+    timings = []
+    for _ in range(requests_count):
+        start = time.perf_counter()
+        generator.generate_social_media_posts(profile, ["Pizza week"], preferences, 3)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20, help="regenerate clicks per scenario")
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--variants", type=int, default=3)
+    args = parser.parse_args()
+
+    server, state = start_llm_stub(latency=args.latency_ms / 1000)
+    from app.services import generator
+    generator.GROQ_API_URL = f"http://127.0.0.1:{server.server_port}/openai/v1/chat/completions"
+
+    print(f"{'scenario':<16}{'upstream calls':>16}{'mean ms':>10}{'p95 ms':>10}")
+    for label, variants in (("no cache", 0), (f"variants={args.variants}", args.variants)):
+        generator.GENERATION_CACHE_VARIANTS = variants
+        generator.completion_cache.clear()
+        before = state.requests
+        timings = sorted(run(generator, args.requests))
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        print(f"{label:<16}{state.requests - before:>16}{statistics.mean(timings) * 1000:>10.1f}{p95 * 1000:>10.1f}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+How many malformed profile replies the repairing parser saves, and what
+the follow-up for the remaining fields costs compared to a full retry.
+
+Each reply in the corpus is a valid profile damaged in one of the ways
+models get it wrong. The old parser (strip code fences, json.loads) either
+accepts a reply or fails the whole profile, which means repeating the
+scrape and the full LLM request. The new parser repairs what it can, and
+the remaining fields are re-asked with the short follow-up prompt. Prompt
+tokens are counted for the synthetic sites of bench_prompt, padded with
+more on-topic text so the full prompt fills its budget as on real sites.
+
+Usage:
+    python -m benchmarks.bench_profile_repair [--sites N]
+"""
+import re
+import json
+import time
+import random
+import argparse
+import statistics
+from collections import defaultdict
+
+from benchmarks.bench_prompt import BUSINESSES, synthetic_site
+from app.services.html_extractor import extract_page_content
+from app.services.llm_gateway import estimate_tokens
+from app.services.prompt_builder import build_profile_prompt, FIELD_TERMS
+from app.services.scraper import (
+    PROFILE_SYSTEM_PROMPT, PROFILE_COMPLETION_TOKENS, PROFILE_FIELD_COMPLETION_TOKENS, PROFILE_FIELDS,
+    parse_profile, followup_messages,
+)
+
+
+def old_parse(text):
+    cleaned = re.sub(r"^```(?:json)?\s*", "", text)
+    cleaned = re.sub(r"\s*```$", "", cleaned).strip()
+    return json.loads(cleaned)
+
+
+def on_topic_text(rng, sentences=150):
+    """
+    Paragraphs that use the profile field terms, as about/services pages do.
+    """
+    terms = [term for field_terms in FIELD_TERMS.values() for term in field_terms]
+    lines = []
+    for _ in range(sentences // 5):
+        words = [" ".join(rng.sample(terms, 6)) for _ in range(5)]
+        lines.append(". ".join(f"Our team {w} for every customer in the city" for w in words) + ".")
+    return "\n".join(lines)
+
+
+def profile_for(business):
+    name, industry, services, audience = business
+    return {
+        "name": name,
+        "industry": industry.title(),
+        "services": [s.strip() for s in re.split(r",| and ", services) if s.strip()],
+        "audience": audience.capitalize(),
+        "tone_of_voice": "Warm and professional",
+        "unique_value_proposition": f"The only {industry} in the region with a written guarantee",
+    }
+
+
+def damaged(profile):
+    """
+    (defect, reply) pairs for one profile.
+    """
+    text = json.dumps(profile)
+    python_style = repr(profile)
+    return [
+        ("clean", text),
+        ("code fence", f"```json\n{json.dumps(profile, indent=2)}\n```"),
+        ("prose around", f"Here is the business profile:\n{text}\nLet me know if you need more."),
+        ("single quotes", python_style),
+        ("trailing comma", text[:-1] + ",}"),
+        ("missing commas", re.sub(r'",\n', '"\n', json.dumps(profile, indent=2))),
+        ("unquoted keys", re.sub(r'"(\w+)":', r"\1:", text)),
+        ("truncated 90%", text[:int(len(text) * 0.9)]),
+        ("truncated 60%", text[:int(len(text) * 0.6)]),
+        ("truncated 30%", text[:int(len(text) * 0.3)]),
+        ("missing field", json.dumps({k: v for k, v in profile.items() if k != "audience"})),
+        ("wrong type", json.dumps(dict(profile, services=None, tone_of_voice=3))),
+        ("prose only", "I could not find enough information about this business."),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sites", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    stats = defaultdict(lambda: {"old_ok": 0, "new_ok": 0, "reasked": [], "full": [], "followup": [], "ms": []})
+    for i in range(args.sites):
+        business = BUSINESSES[i % len(BUSINESSES)]
+        title, text = extract_page_content(synthetic_site(rng, business)[0])
+        text += "\n" + on_topic_text(rng)
+        full_messages = [
+            {"role": "system", "content": PROFILE_SYSTEM_PROMPT},
+            {"role": "user", "content": build_profile_prompt(text, title=title)},
+        ]
+        full_cost = estimate_tokens(full_messages) + PROFILE_COMPLETION_TOKENS
+
+        for defect, reply in damaged(profile_for(business)):
+            row = stats[defect]
+            try:
+                old = old_parse(reply)
+                row["old_ok"] += isinstance(old, dict) and all(old.get(f) for f in PROFILE_FIELDS)
+            except ValueError:
+                pass
+
+            start = time.perf_counter()
+            profile, missing = parse_profile(reply)
+            row["ms"].append((time.perf_counter() - start) * 1000)
+            row["new_ok"] += not missing
+            row["reasked"].append(len(missing))
+            row["full"].append(full_cost)
+            if missing:
+                messages = followup_messages(profile, missing, text, title)
+                row["followup"].append(
+                    estimate_tokens(messages) + PROFILE_FIELD_COMPLETION_TOKENS * len(missing)
+                )
+            else:
+                row["followup"].append(0)
+
+    print(f"{args.sites} sites; tokens are prompt + expected completion of the extra request")
+    print(f"{'defect':<16}{'old ok':>8}{'repaired':>10}{'re-asked':>10}{'retry tok':>11}{'follow-up tok':>15}"
+          f"{'parse ms':>10}")
+    for defect, row in stats.items():
+        needed = [f for f in row["followup"] if f]
+        print(f"{defect:<16}{row['old_ok'] / args.sites:>8.0%}{row['new_ok'] / args.sites:>10.0%}"
+              f"{statistics.mean(row['reasked']):>10.1f}"
+              f"{statistics.mean(row['full']) if row['old_ok'] < args.sites else 0:>11.0f}"
+              f"{statistics.mean(needed) if needed else 0:>15.0f}{statistics.median(row['ms']):>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Compare profile prompts: the old first-10,000-characters cut against the
+token-budgeted, relevance-ranked prompt builder.
+
+Synthetic sites put navigation, cookie banners and product grids first and
+the text that identifies the business (about, services, audience, why us)
+further down, as many real sites do. For each site the report shows prompt
+tokens, build time and how many of the planted business facts made it into
+the prompt.
+
+Usage:
+    python -m benchmarks.bench_prompt [--sites N] [--budget TOKENS]
+"""
+import time
+import random
+import argparse
+import statistics
+
+from app.services.html_extractor import extract_page_content
+from app.services.llm_gateway import count_tokens
+from app.services.prompt_builder import build_profile_prompt, PROFILE_PROMPT_TOKENS
+
+OLD_PROMPT_CHARS = 10000
+
+BUSINESSES = [
+    ("Harbor Lane Bakery", "bakery", "sourdough, pastries and custom celebration cakes", "local families and cafes"),
+    ("Northwind Legal", "law firm", "employment, contract and immigration law", "small businesses and founders"),
+    ("Pulse Physio", "physiotherapy clinic", "sports rehab, dry needling and posture classes", "athletes and office workers"),
+    ("Brightpath Tutors", "tutoring service", "maths, science and exam preparation", "high school students and parents"),
+    ("Copperleaf Solar", "solar installer", "rooftop panels, batteries and maintenance", "homeowners and farms"),
+]
+
+
+def nav():
+    items = ["Home", "Shop", "Menu", "About", "Blog", "Careers", "Contact", "Login", "Cart", "Gift cards",
+             "Locations", "FAQ", "Press", "Partners", "Support"]
+    return "<nav><ul>" + "".join(f"<li><a href='#'>{item}</a></li>" for item in items * 3) + "</ul></nav>"
+
+
+def product_grid(rng, count):
+    cards = []
+    for i in range(count):
+        cards.append(
+            f"<div class='card'><h3>Item {i} bundle</h3><p>SKU {rng.randint(10000, 99999)} in stock, "
+            f"ships in {rng.randint(1, 9)} days, add to cart now to get it with the next order.</p></div>"
+        )
+    return "".join(cards)
+
+
+def synthetic_site(rng, business):
+    name, industry, services, audience = business
+    facts = [
+        f"{name} is an independent {industry} founded in {rng.randint(1985, 2018)} by a team who love what they do.",
+        f"We offer {services}, with every service delivered by certified experts.",
+        f"Our customers are {audience} who want quality they can trust.",
+        f"Why choose us? We are the only {industry} in the region with a written satisfaction guarantee.",
+    ]
+    html = (
+        f"<html><head><title>{name}</title></head><body>"
+        + nav()
+        + "<p>We use cookies to improve your experience. Accept all cookies or manage preferences.</p>"
+        + product_grid(rng, 120)
+        + "<h2>About us</h2>" + "".join(f"<p>{fact}</p>" for fact in facts[:1])
+        + "<h2>Our services</h2>" + f"<p>{facts[1]}</p>"
+        + product_grid(rng, 20)
+        + "<h2>Who we serve</h2>" + f"<p>{facts[2]}</p>"
+        + "<h2>Why us</h2>" + f"<p>{facts[3]}</p>"
+        + "<footer><p>© 2024 All rights reserved. Privacy policy. Terms of use.</p>"
+        + "<ul><li>Subscribe to our newsletter</li><li>Follow us</li></ul></footer>"
+        + "</body></html>"
+    )
+    return html, facts
+
+
+def old_prompt(text, title):
+    return f"Website Title: {title}\n\n{text}"[:OLD_PROMPT_CHARS]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sites", type=int, default=50)
+    parser.add_argument("--budget", type=int, default=PROFILE_PROMPT_TOKENS)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    results = {"first 10k chars": ([], [], []), "ranked builder": ([], [], [])}
+    for i in range(args.sites):
+        html, facts = synthetic_site(rng, BUSINESSES[i % len(BUSINESSES)])
+        title, text = extract_page_content(html)
+        for label, build in (
+            ("first 10k chars", lambda: old_prompt(text, title)),
+            ("ranked builder", lambda: build_profile_prompt(text, title=title, token_budget=args.budget)),
+        ):
+            start = time.perf_counter()
+            prompt = build()
+            elapsed = time.perf_counter() - start
+            tokens, times, recall = results[label]
+            tokens.append(count_tokens(prompt))
+            times.append(elapsed * 1000)
+            recall.append(sum(fact in prompt for fact in facts) / len(facts))
+
+    print(f"{args.sites} sites, builder budget {args.budget} tokens")
+    print(f"{'prompt':<18}{'tokens':>9}{'build ms':>10}{'facts kept':>12}")
+    for label, (tokens, times, recall) in results.items():
+        print(f"{label:<18}{statistics.mean(tokens):>9.0f}{statistics.median(times):>10.2f}"
+              f"{statistics.mean(recall):>12.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Load-test Facebook publishing against the local Graph API stand-in.
+
+Compares the old approach (one requests.post per post, fresh connection,
+no retries) with the batching, rate-limited publisher.
+
+Usage:
+    python -m benchmarks.bench_publisher [--posts N] [--pages N] [--latency-ms MS]
+                                         [--page-limit N] [--app-limit N] [--window S]
+"""
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.stubs.graph_stub import start_graph_stub
+from app.services.fb_publisher import FacebookPublisher
+
+
+def naive_publish(base_url, message, page_id, token):
+    resp = requests.post(f"{base_url}/{page_id}/feed", data={"message": message, "access_token": token})
+    resp.raise_for_status()
+    return resp.json()["id"]
+
+
+def run_naive(base_url, posts, workers):
+    ok = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for future in [pool.submit(naive_publish, base_url, *post) for post in posts]:
+            try:
+                future.result()
+                ok += 1
+            except requests.RequestException:
+                pass
+    return ok
+
+
+def run_publisher(base_url, posts, page_rate, app_rate):
+    publisher = FacebookPublisher(base_url=base_url, page_rate=page_rate, app_rate=app_rate)
+    results = publisher.publish_many(posts)
+    return sum(r["success"] for r in results), publisher.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=500)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=40)
+    parser.add_argument("--page-limit", type=int, default=20, help="stub calls per page per window")
+    parser.add_argument("--app-limit", type=int, default=2000, help="stub calls per app per window")
+    parser.add_argument("--window", type=float, default=5, help="stub quota window in seconds")
+    parser.add_argument("--workers", type=int, default=8, help="threads for the naive publisher")
+    args = parser.parse_args()
+
+    posts = [(f"Post {i} for page {i % args.pages}", f"page{i % args.pages}", "stub-token")
+             for i in range(args.posts)]
+    # Budget the publisher at 80% of the stub's quotas
+    page_rate = 0.8 * args.page_limit / args.window
+    app_rate = 0.8 * args.app_limit / args.window
+
+    print(f"{'publisher':<12}{'published':>11}{'failed':>8}{'http reqs':>11}{'throttled':>11}{'seconds':>9}{'posts/s':>9}")
+    for label in ("naive", "batched"):
+        server, state = start_graph_stub(latency=args.latency_ms / 1000, app_limit=args.app_limit,
+                                         page_limit=args.page_limit, window=args.window)
+        base_url = f"http://127.0.0.1:{server.server_port}/v19.0"
+        start = time.perf_counter()
+        if label == "naive":
+            ok = run_naive(base_url, posts, args.workers)
+        else:
+            ok, _ = run_publisher(base_url, posts, page_rate, app_rate)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<12}{ok:>11}{args.posts - ok:>8}{state.requests:>11}{state.throttled:>11}"
+              f"{elapsed:>9.2f}{ok / elapsed:>9.1f}")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Bytes and CPU per response for the read endpoints the frontend polls.
+
+Runs the app in-process against the offline stand-ins (see bench_e2e) and
+requests each endpoint repeatedly in five modes:
+
+    stdlib json   Flask's default JSON provider, no compression, no ETag
+                  (the old behaviour)
+    orjson        the orjson provider, no compression
+    gzip / zstd   orjson plus the negotiated Content-Encoding
+    304           a poll that sends back the ETag it was given
+
+Bytes are mean response body sizes; CPU is the median process time per
+request, which includes the test client's share, so compare modes rather
+than absolute numbers. Bodies under COMPRESS_MIN_BYTES are never
+compressed.
+
+Usage:
+    python -m benchmarks.bench_responses [--requests N] [--bulk-pages N]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import contextlib
+import statistics
+
+from benchmarks.bench_e2e import configure_environment
+from benchmarks.stubs.llm_stub import start_llm_stub
+from benchmarks.stubs.site_stub import start_site_stub
+from benchmarks.stubs.rss_stub import start_rss_stub
+from benchmarks.stubs.graph_stub import start_graph_stub
+
+MODES = ["stdlib json", "orjson", "gzip", "zstd", "304"]
+
+
+def endpoints(site_url, job_id, bulk_pages):
+    """
+    (name, method, path, json body or None, conditional) per endpoint.
+    """
+    pages = [{"page_id": f"bulk-{i}", "post_frequency": 4} for i in range(bulk_pages)]
+    return [
+        ("planner.schedule", "GET", "/api/weekly-planner/?page_id=bench", None, True),
+        ("planner.times", "GET", "/api/weekly-planner/times?page_id=bench", None, True),
+        ("news.industry", "GET", "/api/news/industry-news?industry=coffee%20shops", None, True),
+        ("business.profile", "GET", f"/api/business/profile?website_url={site_url}", None, True),
+        ("business.job", "GET", f"/api/business/profile/jobs/{job_id}", None, True),
+        ("planner.bulk (dry run)", "POST", "/api/weekly-planner/bulk",
+         {"pages": pages, "dry_run": True}, False),
+    ]
+
+
+def measure(client, method, path, body, headers, count):
+    sizes, cpu = [], []
+    for _ in range(count):
+        start = time.process_time()
+        response = client.open(path, method=method, json=body, headers=headers)
+        cpu.append(time.process_time() - start)
+        if response.status_code not in (200, 304):
+            raise RuntimeError(f"{method} {path}: {response.status_code} {response.data[:200]!r}")
+        sizes.append(len(response.data))
+    return sum(sizes) / count, statistics.median(cpu) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint and mode")
+    parser.add_argument("--bulk-pages", type=int, default=500)
+    args = parser.parse_args()
+
+    llm, _ = start_llm_stub(latency=0.01)
+    site, _ = start_site_stub(latency=0)
+    rss, _ = start_rss_stub(latency=0)
+    graph, _ = start_graph_stub(latency=0)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = os.getcwd()
+        configure_environment(tmp, llm, site, rss, graph)
+        try:
+            with contextlib.redirect_stdout(sys.stderr):
+                from flask.json.provider import DefaultJSONProvider
+                from app import create_app
+                from app.responses import OrjsonProvider
+
+                app = create_app()
+                client = app.test_client()
+                site_url = f"http://127.0.0.1:{site.server_port}/"
+                client.post("/api/weekly-planner/?page_id=bench", json={
+                    "post_frequency": 7, "preferred_days": ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"],
+                })
+                client.post("/api/business/profile", json={"website_url": site_url})
+                job_id = client.post("/api/business/profile/jobs", json={"website_url": site_url}).json["job_id"]
+                while client.get(f"/api/business/profile/jobs/{job_id}").json["status"] not in ("succeeded", "failed"):
+                    time.sleep(0.05)
+
+                for name, method, path, body, conditional in endpoints(site_url, job_id, args.bulk_pages):
+                    etag = client.open(path, method=method, json=body).headers.get("ETag")
+                    for mode in MODES:
+                        if mode == "304" and not (conditional and etag):
+                            continue
+                        app.json = DefaultJSONProvider(app) if mode == "stdlib json" else OrjsonProvider(app)
+                        headers = {}
+                        if mode in ("gzip", "zstd", "304"):
+                            headers["Accept-Encoding"] = "zstd, gzip" if mode != "gzip" else "gzip"
+                        if mode == "304":
+                            headers["If-None-Match"] = etag
+                        results[(name, mode)] = measure(client, method, path, body, headers, args.requests)
+        finally:
+            os.chdir(cwd)
+
+    print(f"{args.requests} requests per endpoint and mode")
+    print(f"{'endpoint':<24}{'mode':<13}{'bytes':>10}{'cpu us':>10}{'bytes saved':>13}{'cpu saved':>11}")
+    for (name, mode), (size, cpu) in results.items():
+        base_size, base_cpu = results[(name, "stdlib json")]
+        print(f"{name:<24}{mode:<13}{size:>10.0f}{cpu:>10.0f}"
+              f"{1 - size / base_size:>13.0%}{1 - cpu / base_cpu:>11.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Cost of reading industry headlines: feedparser (the old path) against the
+streaming reader in app/services/rss_reader.py.
+
+Three measurements, for feeds of several lengths:
+
+    parse   CPU time to get the first 5 items out of a recorded feed
+            already in memory
+    fetch   wall time to download a feed from the local RSS stand-in and
+            get its first 5 items
+    hung    wall time until a feed that stops sending part-way through
+            returns: feedparser has no timeout; the reader returns the
+            items it has, or gives up after --timeout seconds
+
+Recorded feeds are rendered by the RSS stand-in; pass --feed FILE (any
+number of times) to add real captures, e.g. saved Google News feeds.
+
+Usage:
+    python -m benchmarks.bench_rss [--items N ...] [--feed FILE ...] [--runs N]
+        [--stall S] [--timeout S]
+"""
+import time
+import argparse
+import statistics
+
+from benchmarks.stubs.rss_stub import render_feed, start_rss_stub
+from app.services.rss_reader import read_items, fetch_feed, FeedError, CHUNK_BYTES
+
+LIMIT = 5
+
+
+def chunked(body):
+    return (body[i:i + CHUNK_BYTES] for i in range(0, len(body), CHUNK_BYTES))
+
+
+def median_ms(fn, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--feed", action="append", default=[], help="recorded feed file")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--stall", type=float, default=10, help="seconds the hung feed stalls")
+    parser.add_argument("--timeout", type=float, default=2, help="reader timeout for the hung feed")
+    args = parser.parse_args()
+
+    import feedparser
+
+    feeds = [(f"{n} items", render_feed("coffee shops", n, 1).encode()) for n in args.items]
+    for path in args.feed:
+        with open(path, "rb") as f:
+            feeds.append((path, f.read()))
+
+    print(f"parse: first {LIMIT} items from a feed in memory, median of {args.runs} runs")
+    print(f"{'feed':<28}{'KB':>9}{'feedparser ms':>15}{'reader ms':>11}{'speedup':>9}  same items")
+    for name, body in feeds:
+        old_ms, old = median_ms(lambda: feedparser.parse(body).entries[:LIMIT], args.runs)
+        new_ms, (new, _) = median_ms(lambda: read_items(chunked(body), LIMIT), args.runs)
+        same = [(e.title, e.link) for e in old] == [(i["title"], i["link"]) for i in new]
+        print(f"{name[-28:]:<28}{len(body) / 1024:>9.0f}{old_ms:>15.1f}{new_ms:>11.2f}{old_ms / new_ms:>8.0f}x  {same}")
+
+    server, state = start_rss_stub()
+    try:
+        print(f"\nfetch: first {LIMIT} items from the local stand-in, median of {args.runs} runs")
+        print(f"{'feed':<28}{'feedparser ms':>15}{'reader ms':>11}")
+        for n in args.items:
+            state.items = n
+            url = f"http://127.0.0.1:{server.server_port}/rss/search?q=coffee+shops"
+            old_ms, _ = median_ms(lambda: feedparser.parse(url).entries[:LIMIT], args.runs)
+            new_ms, _ = median_ms(lambda: fetch_feed(url, LIMIT)["items"], args.runs)
+            print(f"{f'{n} items':<28}{old_ms:>15.1f}{new_ms:>11.1f}")
+
+        # Large enough that the first items are not the whole feed
+        state.items, state.stall = 1000, args.stall
+        print(f"\nhung: feed stalls {args.stall:.0f} s part-way through")
+        for where, stall_after in (("after the first items", 4096), ("before the first item", 200)):
+            state.stall_after = stall_after
+            url = f"http://127.0.0.1:{server.server_port}/rss/search?q=hung+feed"
+            start = time.perf_counter()
+            feedparser.parse(url)
+            old_s = time.perf_counter() - start
+            start = time.perf_counter()
+            try:
+                outcome = f"{len(fetch_feed(url, LIMIT, timeout=args.timeout)['items'])} items"
+            except FeedError as e:
+                outcome = f"gave up: {type(e.__cause__ or e).__name__}"
+            new_s = time.perf_counter() - start
+            print(f"{where:<24}feedparser {old_s:5.1f} s   reader {new_s:5.1f} s ({outcome})")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Upstream calls saved by coalescing concurrent requests for the same work.
+
+Runs against the offline stand-ins (see bench_e2e). Each scenario starts
+`--callers` callers at once, asking for the same thing, first with
+coalescing off (SingleFlight.enabled = False) and then on. Every round
+uses a new site or industry, so the caches start cold.
+
+    profile       threads building the profile of one website
+    news          threads fetching headlines for one industry
+    robots        threads crawling different pages of one host, whose
+                  robots.txt is fetched on each crawl's event loop
+    news (procs)  worker processes fetching headlines for one industry,
+                  coordinating through the SINGLE_FLIGHT_DB lease and a
+                  sqlite news cache
+
+Usage:
+    python -m benchmarks.bench_single_flight [--callers N] [--processes N]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+import contextlib
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.bench_e2e import configure_environment
+from benchmarks.stubs.llm_stub import start_llm_stub
+from benchmarks.stubs.site_stub import start_site_stub
+from benchmarks.stubs.rss_stub import start_rss_stub
+from benchmarks.stubs.graph_stub import start_graph_stub
+
+
+def run_together(callers, fn):
+    """
+    Call fn(i) from `callers` threads released at the same moment; wall seconds.
+    """
+    barrier = threading.Barrier(callers)
+
+    def call(i):
+        barrier.wait()
+        return fn(i)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        list(pool.map(call, range(callers)))
+    return time.perf_counter() - start
+
+
+def news_worker(environ, industry, barrier):
+    os.environ.update(environ)
+    from app.services.news_scraper import fetch_industry_news
+    barrier.wait()
+    fetch_industry_news(industry)
+
+
+def run_processes(processes, environ, industry):
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(processes + 1)
+    workers = [context.Process(target=news_worker, args=(environ, industry, barrier)) for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    # Timed from the moment every worker has imported the app
+    barrier.wait()
+    start = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--callers", type=int, default=20)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--site-latency-ms", type=float, default=150)
+    parser.add_argument("--rss-latency-ms", type=float, default=150)
+    args = parser.parse_args()
+
+    llm, llm_state = start_llm_stub(latency=args.llm_latency_ms / 1000)
+    site, site_state = start_site_stub(latency=args.site_latency_ms / 1000)
+    rss, rss_state = start_rss_stub(latency=args.rss_latency_ms / 1000)
+    graph, _ = start_graph_stub(latency=0)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = os.getcwd()
+        configure_environment(tmp, llm, site, rss, graph)
+        try:
+            with contextlib.redirect_stdout(sys.stderr):
+                from app.services import crawler, scraper, news_scraper
+                flights = [scraper.page_flight, scraper.profile_flight, crawler.crawl_flight,
+                           crawler.robots_flight, news_scraper.news_flight]
+                home = f"http://127.0.0.1:{site.server_port}/"
+
+                def upstream():
+                    return {
+                        "site": sum(site_state.hits.values()),
+                        "robots": site_state.hits["/robots.txt"],
+                        "llm": llm_state.requests,
+                        "rss": sum(rss_state.hits.values()),
+                    }
+
+                scenarios = [
+                    ("profile", "site", lambda run: lambda i: scraper.build_business_profile(
+                        f"{home}?site=Flight{run}")),
+                    ("profile", "llm", None),
+                    ("news", "rss", lambda run: lambda i: news_scraper.fetch_industry_news(
+                        f"flight industry {run}")),
+                    ("robots", "robots", lambda run: lambda i: crawler.crawl_site(
+                        f"{home}?site=Robots{run}-{i}", max_pages=1)),
+                ]
+                for run, enabled in enumerate((False, True)):
+                    for flight in flights:
+                        flight.enabled = enabled
+                    for name, counter, make in scenarios:
+                        if make is None:
+                            # Same run as the row above, another upstream
+                            rows.append((name, counter, enabled, rows[-1][3], *counts[counter]))
+                            continue
+                        before = upstream()
+                        seconds = run_together(args.callers, make(run))
+                        after = upstream()
+                        counts = {key: (after[key] - before[key],) for key in after}
+                        rows.append((name, counter, enabled, seconds, *counts[counter]))
+
+                # Worker processes cannot share an in-process flight; only the lease helps
+                for run, lease in enumerate((False, True)):
+                    environ = {"NEWS_CACHE_BACKEND": "sqlite", "NEWS_CACHE_PATH": os.path.join(tmp, "news.sqlite3"),
+                               "SINGLE_FLIGHT_DB": os.path.join(tmp, "leases.sqlite3") if lease else ""}
+                    before = upstream()["rss"]
+                    seconds = run_processes(args.processes, environ, f"process industry {run}")
+                    rows.append(("news (procs)", "rss", lease, seconds, upstream()["rss"] - before))
+        finally:
+            os.chdir(cwd)
+
+    print(f"{args.callers} concurrent callers per thread scenario, {args.processes} processes")
+    print(f"{'scenario':<14}{'upstream':<10}{'coalesced':>10}{'calls':>8}{'wall s':>9}{'saved':>8}")
+    for i, (name, counter, enabled, seconds, calls) in enumerate(rows):
+        baseline = next(r[4] for r in rows if r[:2] == (name, counter) and not r[2])
+        print(f"{name:<14}{counter:<10}{'yes' if enabled else 'no':>10}{calls:>8}{seconds:>9.2f}"
+              f"{1 - calls / baseline if baseline else 0:>8.0%}")
+    print("\nin-process roles:", {flight.name: flight.stats() for flight in flights})
+
+
+if __name__ == "__main__":
+    main()
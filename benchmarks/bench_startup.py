@@ -0,0 +1,64 @@
+"""
+Measure cold startup: importing the services and building the Flask app,
+each in a fresh interpreter without GROQ_API_KEY set. Exits with status 1
+when the median time of either phase is over its budget, so it can gate CI.
+
+Usage:
+    python -m benchmarks.bench_startup [--runs N] [--import-budget-ms MS] [--create-budget-ms MS]
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+PROBE = """
+import json, time
+start = time.perf_counter()
+import app.services.scraper, app.services.generator, app.services.news_scraper
+imported = time.perf_counter()
+from app import create_app
+create_app()
+created = time.perf_counter()
+print(json.dumps({"import_ms": (imported - start) * 1000, "create_ms": (created - imported) * 1000}))
+"""
+
+
+def measure_once():
+    env = {k: v for k, v in os.environ.items() if k not in ("GROQ_API_KEY", "AUTO_PUBLISH")}
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=ROOT, env=env, capture_output=True, text=True, timeout=120
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Startup failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-budget-ms", type=float, default=300)
+    parser.add_argument("--create-budget-ms", type=float, default=500)
+    args = parser.parse_args()
+
+    # First run warms the bytecode cache so later runs measure imports, not compilation
+    measure_once()
+    runs = [measure_once() for _ in range(args.runs)]
+    import_ms = statistics.median(r["import_ms"] for r in runs)
+    create_ms = statistics.median(r["create_ms"] for r in runs)
+
+    failed = False
+    print(f"{'phase':<14}{'median ms':>11}{'budget ms':>11}")
+    for label, value, budget in (("import", import_ms, args.import_budget_ms),
+                                 ("create_app", create_ms, args.create_budget_ms)):
+        over = value > budget
+        failed |= over
+        print(f"{label:<14}{value:>11.1f}{budget:>11.0f}{'  OVER BUDGET' if over else ''}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
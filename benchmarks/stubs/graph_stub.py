@@ -0,0 +1,204 @@
+"""
+Local Facebook Graph API stand-in.
+
+Serves POST /<page_id>/feed and batch requests (POST / with a `batch`
+form field), with an optional version prefix such as /v19.0. Calls are
+counted against sliding-window app and per-page quotas. Usage is reported
+in X-App-Usage / X-Page-Usage headers like the real API, and calls over
+quota fail with Graph error codes 4 (app) and 32 (page). This lets
+throughput and throttling be load-tested offline.
+
+Usage:
+    python -m benchmarks.stubs.graph_stub --port 8002 --app-limit 600 --page-limit 30
+
+Then point the app at it:
+    GRAPH_API_URL=http://127.0.0.1:8002/v19.0
+"""
+import re
+import json
+import time
+import argparse
+import itertools
+import threading
+from collections import deque, defaultdict
+from urllib.parse import parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FEED_PATH = re.compile(r"^/(?:v\d+\.\d+/)?([^/?]+)/feed/?$")
+ROOT_PATH = re.compile(r"^/(?:v\d+\.\d+)?/?$")
+
+
+class GraphState:
+    def __init__(self, latency=0.0, app_limit=600, page_limit=30, window=60.0):
+        self.latency = latency
+        self.app_limit = app_limit
+        self.page_limit = page_limit
+        self.window = window
+        self.app_calls = deque()
+        self.page_calls = defaultdict(deque)
+        self.ids = itertools.count(1)
+        self.requests = 0
+        self.operations = 0
+        self.published = 0
+        self.throttled = 0
+        self.lock = threading.Lock()
+
+    def _trim(self, calls, now):
+        while calls and calls[0] <= now - self.window:
+            calls.popleft()
+
+    def usage(self, page_id):
+        now = time.monotonic()
+        self._trim(self.app_calls, now)
+        self._trim(self.page_calls[page_id], now)
+        app_pct = 100 * len(self.app_calls) // self.app_limit
+        page_pct = 100 * len(self.page_calls[page_id]) // self.page_limit
+        return app_pct, page_pct
+
+    def post(self, page_id, message):
+        """
+        Publish one post. Returns (status, body, headers).
+        """
+        with self.lock:
+            self.operations += 1
+            app_pct, page_pct = self.usage(page_id)
+            error = None
+            if app_pct >= 100:
+                error = {"code": 4, "message": "Application request limit reached"}
+            elif page_pct >= 100:
+                error = {"code": 32, "message": "Page request limit reached"}
+            elif not message:
+                error = {"code": 100, "message": "Invalid parameter: message"}
+            if error is None:
+                now = time.monotonic()
+                self.app_calls.append(now)
+                self.page_calls[page_id].append(now)
+                self.published += 1
+                app_pct, page_pct = self.usage(page_id)
+                status, body = 200, {"id": f"{page_id}_{next(self.ids)}"}
+            else:
+                if error["code"] in (4, 32):
+                    self.throttled += 1
+                status, body = 400, {"error": dict(error, type="OAuthException")}
+            regain = 0 if page_pct < 100 else round(self.window / 60, 3)
+            headers = {
+                "X-App-Usage": json.dumps({"call_count": app_pct, "total_cputime": 0, "total_time": 0}),
+                "X-Page-Usage": json.dumps({"call_count": page_pct, "total_cputime": 0, "total_time": 0,
+                                            "estimated_time_to_regain_access": regain}),
+            }
+            return status, body, headers
+
+    def app_usage_header(self):
+        with self.lock:
+            now = time.monotonic()
+            self._trim(self.app_calls, now)
+            pct = 100 * len(self.app_calls) // self.app_limit
+        return json.dumps({"call_count": pct, "total_cputime": 0, "total_time": 0})
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "operations": self.operations,
+            "published": self.published,
+            "throttled": self.throttled,
+        }
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send_json(self, status, body, headers=None):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip("/") == "/stats":
+                return self._send_json(200, state.stats())
+            self._send_json(404, {"error": {"code": 803, "message": "Unknown path"}})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            form = {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode()).items()}
+            path = self.path.split("?", 1)[0]
+            with state.lock:
+                state.requests += 1
+            if state.latency:
+                time.sleep(state.latency)
+
+            match = FEED_PATH.match(path)
+            if match:
+                status, body, headers = state.post(match.group(1), form.get("message"))
+                return self._send_json(status, body, headers)
+
+            if ROOT_PATH.match(path) and "batch" in form:
+                try:
+                    operations = json.loads(form["batch"])
+                except ValueError:
+                    return self._send_json(400, {"error": {"code": 100, "message": "Invalid batch"}})
+                if len(operations) > 50:
+                    return self._send_json(400, {"error": {"code": 100, "message": "Too many requests in batch"}})
+                results = []
+                for op in operations:
+                    op_match = FEED_PATH.match("/" + op.get("relative_url", "").lstrip("/"))
+                    if op.get("method", "GET").upper() != "POST" or not op_match:
+                        results.append({"code": 404, "headers": [], "body": json.dumps(
+                            {"error": {"code": 803, "message": "Unsupported operation"}})})
+                        continue
+                    body = {k: v[0] for k, v in parse_qs(op.get("body", "")).items()}
+                    status, payload, headers = state.post(op_match.group(1), body.get("message"))
+                    results.append({
+                        "code": status,
+                        "headers": [{"name": k, "value": v} for k, v in headers.items()],
+                        "body": json.dumps(payload),
+                    })
+                return self._send_json(200, results, {"X-App-Usage": state.app_usage_header()})
+
+            self._send_json(404, {"error": {"code": 803, "message": "Unknown path"}})
+
+    return Handler
+
+
+def start_graph_stub(port=0, latency=0.0, app_limit=600, page_limit=30, window=60.0):
+    """
+    Start the stand-in on a background thread.
+
+    Returns:
+        tuple[ThreadingHTTPServer, GraphState]: The server (call shutdown()
+        when done) and its counters.
+    """
+    state = GraphState(latency=latency, app_limit=app_limit, page_limit=page_limit, window=window)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8002)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--app-limit", type=int, default=600, help="calls per window for the whole app")
+    parser.add_argument("--page-limit", type=int, default=30, help="calls per window for each page")
+    parser.add_argument("--window", type=float, default=60, help="quota window in seconds")
+    args = parser.parse_args()
+
+    server, _ = start_graph_stub(args.port, args.latency_ms / 1000, args.app_limit, args.page_limit, args.window)
+    print(f"Graph API stub listening on http://127.0.0.1:{server.server_port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Local OpenAI-compatible chat-completions stand-in.
+
+Serves POST .../chat/completions (plain and streaming) with deterministic
+output and configurable latency, so the generator, the profile analyzer and
+their caches can be exercised offline.
+
+Usage:
+    python -m benchmarks.stubs.llm_stub --port 8001 --latency-ms 800
+
+Then point the app at it:
+    GROQ_API_URL=http://127.0.0.1:8001/openai/v1/chat/completions
+    GROQ_BASE_URL=http://127.0.0.1:8001
+"""
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PROFILE_RESPONSE = {
+    "name": "Stub Pizza Co",
+    "industry": "Food and Beverages",
+    "services": ["Dine-in", "Takeaway", "Delivery"],
+    "audience": "Families and young professionals",
+    "tone_of_voice": "Friendly",
+    "unique_value_proposition": "Fresh wood-fired pizza delivered in 30 minutes",
+}
+
+
+# Vocabulary for stub posts; each post draws its own words so posts differ
+# from each other the way real model output does
+POST_WORDS = (
+    "fresh oven crust cheese delivery weekend offer family order taste garden basil tomato "
+    "spicy classic combo deal friends party night lunch special menu chef local crispy slice "
+    "share love try flavour city outlet today week free garlic bread dessert drink healthy "
+    "veggie paneer mushroom onion pepper olive sauce dough stone baked hand tossed loaded "
+    "thin crust midnight craving student discount festive season celebrate team kitchen "
+    "secret recipe sourdough wood fired smoky grilled sweet corn jalapeno pineapple feta"
+).split()
+
+
+def fake_completion(messages, counter):
+    """
+    Build a deterministic reply: a profile JSON for the business analyst
+    prompt, numbered posts for anything else.
+    """
+    system = next((m["content"] for m in messages if m["role"] == "system"), "")
+    user = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+    if "business analyst" in system.lower():
+        return json.dumps(PROFILE_RESPONSE)
+
+    match = re.search(r"Generate (\d+)", user)
+    count = int(match.group(1)) if match else 5
+    posts = []
+    for i in range(count):
+        words = random.Random(counter * 1000 + i).sample(POST_WORDS, 14)
+        posts.append(f"{i + 1}. Stub post {i + 1} (variant {counter}): {' '.join(words)} #stub #local")
+    return "\n".join(posts)
+
+
+class StubState:
+    def __init__(self, latency=0.0, ttft=0.0, chunk_delay=0.0, status=200):
+        self.latency = latency
+        self.ttft = ttft
+        self.chunk_delay = chunk_delay
+        self.status = status
+        self.requests = 0
+        self.lock = threading.Lock()
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send_json(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip("/") == "/stats":
+                return self._send_json(200, {"requests": state.requests})
+            self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            if not self.path.endswith("/chat/completions"):
+                return self._send_json(404, {"error": "not found"})
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            with state.lock:
+                state.requests += 1
+                counter = state.requests
+
+            if state.status != 200:
+                time.sleep(state.latency)
+                return self._send_json(state.status, {"error": {"message": "stub error"}})
+
+            text = fake_completion(payload.get("messages", []), counter)
+            if not payload.get("stream"):
+                time.sleep(state.latency)
+                return self._send_json(200, {
+                    "id": f"stub-{counter}",
+                    "object": "chat.completion",
+                    "model": payload.get("model"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": length // 4, "completion_tokens": len(text) // 4,
+                              "total_tokens": (length + len(text)) // 4},
+                })
+
+            # Streaming: first token after `ttft`, then one word per `chunk_delay`
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            time.sleep(state.ttft)
+            try:
+                for word in re.findall(r"\S+\s*", text):
+                    chunk = {"id": f"stub-{counter}", "choices": [{"index": 0, "delta": {"content": word}}]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                    time.sleep(state.chunk_delay)
+                self.wfile.write(b"data: [DONE]\n\n")
+            except (BrokenPipeError, ConnectionResetError):
+                # Client stopped reading early, e.g. after enough posts
+                pass
+            self.close_connection = True
+
+    return Handler
+
+
+def start_llm_stub(port=0, latency=0.0, ttft=0.0, chunk_delay=0.0, status=200):
+    """
+    Start the stub in a background thread. Returns (server, state); the base
+    URL is http://127.0.0.1:<server.server_port>.
+    """
+    state = StubState(latency=latency, ttft=ttft, chunk_delay=chunk_delay, status=status)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible LLM stub")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency-ms", type=float, default=500, help="delay before a non-streamed reply")
+    parser.add_argument("--ttft-ms", type=float, default=150, help="delay before the first streamed token")
+    parser.add_argument("--chunk-ms", type=float, default=10, help="delay between streamed tokens")
+    parser.add_argument("--status", type=int, default=200, help="force an error status, e.g. 429")
+    args = parser.parse_args()
+
+    state = StubState(args.latency_ms / 1000, args.ttft_ms / 1000, args.chunk_ms / 1000, args.status)
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(state))
+    print(f"LLM stub listening on http://127.0.0.1:{args.port}/openai/v1/chat/completions")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
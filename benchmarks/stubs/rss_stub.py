@@ -0,0 +1,130 @@
+"""
+Local Google News RSS stand-in.
+
+Serves GET /rss/search?q=<query> with an RSS 2.0 feed of `items` headlines
+about the query, after `latency` seconds. Feeds carry an ETag that changes
+every `refresh` seconds, and conditional requests get 304 until it does.
+With `stall` set, the first `stall_after` bytes (4 KB) of each feed are
+sent and the rest only after `stall` seconds, like a hung upstream.
+
+Usage:
+    python -m benchmarks.stubs.rss_stub --port 8004 --latency-ms 150
+
+Then point the app at it:
+    NEWS_RSS_URL=http://127.0.0.1:8004/rss/search?q={query}
+"""
+import time
+import argparse
+import threading
+from collections import Counter
+from urllib.parse import urlsplit, parse_qs, quote_plus
+from xml.sax.saxutils import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class RSSState:
+    def __init__(self, latency=0.0, items=20, refresh=3600.0, stall=0.0):
+        self.latency = latency
+        self.items = items
+        self.refresh = refresh
+        self.stall = stall
+        self.stall_after = 4096
+        self.hits = Counter()
+        self.not_modified = 0
+        self.lock = threading.Lock()
+
+
+def render_feed(query, items, generation):
+    entries = "".join(
+        f"<item><title>{escape(query.title())} update {generation}.{i}: what it means for local businesses"
+        f"</title><link>https://news.example/{quote_plus(query)}/{generation}/{i}</link>"
+        f"<pubDate>Mon, 01 Jan 2024 {i % 24:02d}:00:00 GMT</pubDate>"
+        f"<description>Coverage of {escape(query)} trends, item {i}.</description></item>"
+        for i in range(items)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        f'<rss version="2.0"><channel><title>"{escape(query)}" - Google News</title>'
+        f"<link>https://news.example/</link><description>Stub feed</description>{entries}</channel></rss>"
+    )
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            if parts.path.rstrip("/") != "/rss/search":
+                return self.reply(404, b"Not found", "text/plain")
+            query = parse_qs(parts.query).get("q", [""])[0]
+            with state.lock:
+                state.hits[query] += 1
+            if state.latency:
+                time.sleep(state.latency)
+
+            generation = int(time.time() // state.refresh) if state.refresh else 0
+            etag = f'"{quote_plus(query)}-{generation}"'
+            if self.headers.get("If-None-Match") == etag:
+                with state.lock:
+                    state.not_modified += 1
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            body = render_feed(query, state.items, generation).encode()
+            self.reply(200, body, "application/rss+xml; charset=utf-8", {"ETag": etag}, state)
+
+        def reply(self, status, body, content_type, headers=None, stalling=None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            if stalling and stalling.stall:
+                self.wfile.write(body[:stalling.stall_after])
+                self.wfile.flush()
+                time.sleep(stalling.stall)
+                body = body[stalling.stall_after:]
+            try:
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                # The client stopped reading early
+                pass
+
+    return Handler
+
+
+def start_rss_stub(port=0, latency=0.0, items=20, refresh=3600.0, stall=0.0):
+    """
+    Start the stand-in on a background thread.
+
+    Returns:
+        tuple[ThreadingHTTPServer, RSSState]: The server (call shutdown()
+        when done) and its hit counters.
+    """
+    state = RSSState(latency=latency, items=items, refresh=refresh, stall=stall)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8004)
+    parser.add_argument("--latency-ms", type=float, default=150)
+    parser.add_argument("--items", type=int, default=20, help="headlines per feed")
+    parser.add_argument("--refresh", type=float, default=3600, help="seconds between feed changes")
+    parser.add_argument("--stall", type=float, default=0, help="seconds to hang part-way through each feed")
+    args = parser.parse_args()
+
+    server, _ = start_rss_stub(args.port, args.latency_ms / 1000, args.items, args.refresh, args.stall)
+    print(f"RSS stub listening on http://127.0.0.1:{server.server_port}/rss/search?q={{query}}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Local small-business website stand-in.
+
+Serves a home page linking to About, Services, Menu, Contact, a blog, a
+login page and legal pages, plus a robots.txt that disallows /private/.
+A `site` query parameter on the home page (/?site=acme) renames the
+business, so many distinct sites can be profiled without cache hits.
+Every response waits `latency` seconds first, like a slow shared host, so
+crawl wall time can be measured offline. Pages carry ETag and
+Last-Modified, and conditional requests get 304.
+
+Usage:
+    python -m benchmarks.stubs.site_stub --port 8003 --latency-ms 200
+
+Then profile http://127.0.0.1:8003/ .
+"""
+import time
+import argparse
+import threading
+from collections import Counter
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LAST_MODIFIED = "Mon, 01 Jan 2024 00:00:00 GMT"
+
+NAV = (
+    "<nav><ul><li><a href='/'>Home</a></li><li><a href='/about-us'>About us</a></li>"
+    "<li><a href='/services/'>Services</a></li><li><a href='/menu'>Menu</a></li>"
+    "<li><a href='/contact'>Contact</a></li><li><a href='/blog/2024/05/new-oven'>Blog</a></li>"
+    "<li><a href='/private/team-notes'>Our team</a></li><li><a href='/login'>Login</a></li>"
+    "<li><a href='/privacy-policy'>Privacy</a></li><li><a href='/img/logo.png'>Logo</a></li>"
+    "<li><a href='https://elsewhere.example/about'>Partner</a></li></ul></nav>"
+)
+
+PAGES = {
+    "/": ("Harbor Lane Bakery", "<h1>Fresh every morning</h1><p>Order online for pickup or delivery.</p>"),
+    "/about-us": ("About", "<h1>About us</h1><p>Harbor Lane Bakery is a family-run bakery founded in 1998 "
+                           "on the harbour front, baking everything on site before sunrise.</p>"),
+    "/services/": ("Services", "<h1>Our services</h1><p>We offer sourdough bread, pastries, custom "
+                               "celebration cakes and wholesale supply for local cafes.</p>"),
+    "/menu": ("Menu", "<h1>Menu</h1><ul><li>Country sourdough loaf</li><li>Almond croissant</li>"
+                      "<li>Cardamom bun</li></ul><p>Our customers are local families and cafes.</p>"),
+    "/contact": ("Contact", "<h1>Contact</h1><p>12 Harbor Lane. Open daily from 6am to 3pm.</p>"),
+    "/blog/2024/05/new-oven": ("Blog", "<p>We installed a new stone-deck oven this spring.</p>"),
+    "/private/team-notes": ("Private", "<p>Internal notes that robots.txt asks crawlers to skip.</p>"),
+    "/login": ("Login", "<form>Sign in</form>"),
+    "/privacy-policy": ("Privacy", "<p>Privacy policy.</p>"),
+}
+
+ROBOTS = "User-agent: *\nDisallow: /private/\n"
+
+
+class SiteState:
+    def __init__(self, latency=0.0, padding=0):
+        self.latency = latency
+        # Filler bytes appended to every page, to test byte budgets
+        self.padding = padding
+        self.hits = Counter()
+        self.lock = threading.Lock()
+
+
+def render(path, state, site=None):
+    title, body = PAGES[path]
+    if site:
+        title, body = title.replace("Harbor Lane", site), body.replace("Harbor Lane", site)
+    filler = "<!-- " + "x" * state.padding + " -->" if state.padding else ""
+    return f"<html><head><title>{title}</title></head><body>{NAV}{body}{filler}</body></html>"
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            path = parts.path
+            site = parse_qs(parts.query).get("site", [None])[0]
+            with state.lock:
+                state.hits[path] += 1
+            if state.latency:
+                time.sleep(state.latency)
+
+            if path == "/robots.txt":
+                return self.reply(200, ROBOTS.encode(), "text/plain")
+            if path not in PAGES:
+                return self.reply(404, b"Not found", "text/plain")
+            etag = f'"{path}-{site}-v1"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            self.reply(200, render(path, state, site).encode(), "text/html; charset=utf-8",
+                       {"ETag": etag, "Last-Modified": LAST_MODIFIED})
+
+        def reply(self, status, body, content_type, headers=None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+def start_site_stub(port=0, latency=0.0, padding=0):
+    """
+    Start the stand-in on a background thread.
+
+    Returns:
+        tuple[ThreadingHTTPServer, SiteState]: The server (call shutdown()
+        when done) and its hit counters.
+    """
+    state = SiteState(latency=latency, padding=padding)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8003)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--padding", type=int, default=0, help="filler bytes added to every page")
+    args = parser.parse_args()
+
+    server, _ = start_site_stub(args.port, args.latency_ms / 1000, args.padding)
+    print(f"Site stub listening on http://127.0.0.1:{server.server_port}/")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -122,14 +122,29 @@ export default function SocialMediaManager() {
         news: newsList.map((item) => item.headline || item),
         count: genPostCount,
       };
+      // Stream posts as server-sent events so each one shows up as soon as it is ready
       const genRes = await fetch(`${backendBaseUrl}/content/generate-posts`, {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify(payload),
+        headers: { "Content-Type": "application/json", Accept: "text/event-stream" },
+        body: JSON.stringify({ ...payload, stream: true }),
       });
       if (!genRes.ok) throw new Error((await genRes.json()).error || "Failed to generate posts");
-      const posts = (await genRes.json()).posts || [];
-      setGenPostsEditable(posts);
+      const reader = genRes.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split("\n\n");
+        buffer = events.pop();
+        for (const raw of events) {
+          const event = (raw.match(/^event: (.*)$/m) || [])[1];
+          const data = JSON.parse((raw.match(/^data: (.*)$/m) || [])[1] || "{}");
+          if (event === "post") setGenPostsEditable((prev) => [...prev, data.post]);
+          else if (event === "error") throw new Error(data.error || "Failed to generate posts");
+        }
+      }
     } catch (error) {
       if (error.message.toLowerCase().includes("profile")) setProfileError(error.message);
       else if (error.message.toLowerCase().includes("news")) setNewsError(error.message);
@@ -170,18 +185,20 @@ export default function SocialMediaManager() {
         setSchedLoading(false);
         return;
       }
-      // 2. PUT to update days with generated posts
-      const chosenDays = schedDays.slice(0, schedFrequency);
-      for (const [i, day] of chosenDays.entries()) {
-        await fetch(`${backendBaseUrl}/weekly-planner/${day}`, {
-          method: "PUT",
-          headers: { "Content-Type": "application/json" },
-          body: JSON.stringify({ content: genPostsEditable[i] }),
-        });
-      }
-      // 3. Get latest schedule
-      const schedRes = await fetch(`${backendBaseUrl}/weekly-planner/`);
+      // 2. One bulk PUT fills the scheduled days with generated posts and
+      // returns the updated schedule
+      const created = await res.json();
+      const posts = {};
+      Object.keys(created).forEach((day, i) => {
+        posts[day] = genPostsEditable[i];
+      });
+      const schedRes = await fetch(`${backendBaseUrl}/weekly-planner/`, {
+        method: "PUT",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ posts }),
+      });
       const schedData = await schedRes.json();
+      if (!schedRes.ok) throw new Error(schedData.error || "Failed to update schedule.");
       setSchedule(schedData);
     } catch (e) {
       setSchedError(e.message);
@@ -0,0 +1,36 @@
+"""
+Shared fixtures. Every upstream is replaced by the benchmark stand-ins and
+all state lives in a temporary directory; this has to happen before any
+app module is imported, since they read their settings on import.
+"""
+import tempfile
+
+import pytest
+
+from benchmarks.bench_e2e import configure_environment
+from benchmarks.stubs.llm_stub import start_llm_stub
+from benchmarks.stubs.site_stub import start_site_stub
+from benchmarks.stubs.rss_stub import start_rss_stub
+from benchmarks.stubs.graph_stub import start_graph_stub
+
+_llm, _llm_state = start_llm_stub()
+_site, _ = start_site_stub()
+_rss, _ = start_rss_stub()
+_graph, _ = start_graph_stub()
+configure_environment(tempfile.mkdtemp(prefix="tests-"), _llm, _site, _rss, _graph)
+
+
+@pytest.fixture
+def llm_state():
+    return _llm_state
+
+
+@pytest.fixture(scope="session")
+def app():
+    from app import create_app
+    return create_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,57 @@
+import pytest
+
+from app.services import generator
+from app.services.post_index import PostIndex
+
+PROFILE = {"name": "Dedupe Bakery", "industry": "Food"}
+PREFERENCES = {"tone": "Friendly", "post_type": "Promotional"}
+
+
+@pytest.fixture
+def everything_repeats(monkeypatch):
+    # Every generated post counts as a repeat of the tenant's history
+    monkeypatch.setattr(PostIndex, "filter_new", lambda self, tenant, posts: ([], list(posts)))
+
+
+def llm_calls(llm_state, run):
+    before = llm_state.requests
+    run()
+    return llm_state.requests - before
+
+
+def test_generate_allows_every_replacement_round(llm_state, everything_repeats):
+    calls = llm_calls(llm_state, lambda: generator.generate_social_media_posts(
+        PROFILE, [], PREFERENCES, 3, tenant="dedupe-generate"))
+    assert calls == 1 + generator.DEDUPE_MAX_ROUNDS
+
+
+def test_stream_allows_every_replacement_round(llm_state, everything_repeats):
+    calls = llm_calls(llm_state, lambda: list(generator.stream_social_media_posts(
+        PROFILE, [], PREFERENCES, 3, tenant="dedupe-stream")))
+    assert calls == 1 + generator.DEDUPE_MAX_ROUNDS
+
+
+def test_no_replacements_when_posts_are_new(llm_state):
+    calls = llm_calls(llm_state, lambda: generator.generate_social_media_posts(
+        PROFILE, [], PREFERENCES, 3, tenant="dedupe-fresh"))
+    assert calls == 1
+
+
+def test_requests_without_a_page_use_the_completion_cache(client, llm_state, monkeypatch):
+    monkeypatch.setattr(generator, "GENERATION_CACHE_VARIANTS", 1)
+    body = {"name": "Cached Bakery", "industry": "Food", "tone": "Friendly", "post_type": "Promotional", "count": 3}
+    calls = llm_calls(llm_state, lambda: [client.post("/api/content/generate-posts", json=body) for _ in range(3)])
+    assert calls == 1
+
+    calls = llm_calls(llm_state, lambda: client.post(
+        "/api/content/generate-posts", json=body, headers={"X-Page-Id": "cached-page"}))
+    assert calls == 1
+
+
+def test_deduplicated_completions_are_not_cached(monkeypatch):
+    monkeypatch.setattr(generator, "GENERATION_CACHE_VARIANTS", 1)
+    stored = []
+    monkeypatch.setattr(generator, "remember_completion", lambda payload, raw: stored.append(raw))
+    generator.generate_social_media_posts(PROFILE, [], PREFERENCES, 3, tenant="uncached")
+    list(generator.stream_social_media_posts(PROFILE, [], PREFERENCES, 3, tenant="uncached"))
+    assert stored == []
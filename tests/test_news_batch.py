@@ -0,0 +1,22 @@
+import time
+
+from app.services import news_scraper
+from benchmarks.stubs.rss_stub import start_rss_stub
+
+
+def test_batch_parses_each_feed_as_it_streams(monkeypatch):
+    # Every feed sends its first items, then hangs far longer than the test
+    server, state = start_rss_stub(stall=10)
+    monkeypatch.setattr(
+        news_scraper, "GOOGLE_NEWS_RSS_URL", f"http://127.0.0.1:{server.server_port}/rss/search?q={{query}}"
+    )
+    industries = ["stalled bakeries", "stalled florists", "stalled gyms"]
+
+    started = time.monotonic()
+    results, errors = news_scraper.fetch_industry_news_batch(industries)
+    elapsed = time.monotonic() - started
+    server.shutdown()
+
+    assert errors == {}
+    assert all(len(results[industry]) == news_scraper.NEWS_ITEMS for industry in industries)
+    assert elapsed < 2
@@ -0,0 +1,18 @@
+from app.services import scraper
+
+PAGE = "Stub Pizza Co bakes wood-fired pizza and delivers it across the city in 30 minutes."
+
+
+def lookups():
+    return scraper.profile_cache.hits + scraper.profile_cache.misses
+
+
+def test_latest_profile_pointers_stay_out_of_the_profile_cache():
+    size = len(scraper.profile_cache.backend)
+    profile = scraper.analyze_website_business_profile(PAGE, title="Stub Pizza Co", source_url="http://pizza.test/")
+    assert len(scraper.profile_cache.backend) == size + 1
+
+    before = lookups()
+    assert scraper.latest_profile_version("http://pizza.test") is not None
+    assert lookups() == before
+    assert scraper.latest_profile("http://pizza.test") == profile
@@ -0,0 +1,42 @@
+import pytest
+
+from app.services.scheduler import WeeklyScheduler
+from app.services.post_index import NearDuplicateError
+
+PLANNER = "/api/weekly-planner/"
+POSTS = {
+    "Mon": "Our autumn menu is here: pumpkin soup, roasted squash and warm apple pie all week long.",
+    "Wed": "Meet Sara, our head baker, who starts every morning at 4am so your bread is still warm at opening.",
+}
+
+
+def plan(client, page):
+    response = client.post(
+        PLANNER, json={"post_frequency": 2, "preferred_days": ["Mon", "Wed"]}, headers={"X-Page-Id": page}
+    )
+    assert response.status_code == 200
+
+
+def save(client, page):
+    return [
+        client.put(f"{PLANNER}{day}", json={"content": content}, headers={"X-Page-Id": page}).status_code
+        for day, content in POSTS.items()
+    ]
+
+
+def test_posts_can_be_saved_again_after_regenerating(client):
+    plan(client, "resave")
+    assert save(client, "resave") == [200, 200]
+    plan(client, "resave")
+    assert save(client, "resave") == [200, 200]
+
+
+def test_published_posts_are_not_scheduled_again():
+    scheduler = WeeklyScheduler("published")
+    scheduler.set_schedule({"Mon": POSTS["Mon"]})
+    scheduler.record_published(POSTS["Mon"])
+    scheduler.set_schedule({"Tue": "Something else entirely for Tuesday's followers."})
+
+    with pytest.raises(NearDuplicateError) as raised:
+        scheduler.update_post("Tue", POSTS["Mon"] + " See you there!")
+    assert list(raised.value.duplicates) == ["Tue"]